@@ -40,18 +40,181 @@ class Settings(BaseSettings):
     backblaze_key_name: str
     backblaze_bucket_name: str  # You'll need to add this
 
+    # Vector store backend
+    # "cloud": ChromaDB Cloud (needs the CHROMA_* credentials below)
+    # "local": embedded NumPy store at vector_store_path (memory-mapped
+    #   vectors, SQLite metadata) for single-node and offline use
+    vector_backend: str = "cloud"
+    vector_store_path: str = "./vector_store"
+
     # ChromaDB Cloud settings
-    chroma_tenant: str
-    chroma_database: str
-    chroma_api_key: str
+    chroma_tenant: str = ""
+    chroma_database: str = ""
+    chroma_api_key: str = ""
+
+    # Local embedding settings
+    # Queries and ingested chunks are embedded in-process with the same
+    # all-MiniLM-L6-v2 ONNX model Chroma uses by default, so vectors stay
+    # compatible with existing collections. Leave the path unset to use
+    # Chroma's model cache (downloaded on first use).
+    use_local_embeddings: bool = True
+    embedding_model_path: str | None = None
+    embedding_max_tokens: int = 256
+    # Ingestion batching: chunks are sorted by token length and embedded in
+    # batches of this size; 0 threads lets ONNX Runtime pick (one per core)
+    embedding_batch_size: int = 32
+    embedding_num_threads: int = 0
+    # Persistent chunk embedding cache (SQLite), keyed by model and
+    # whitespace-normalized chunk text; least recently used entries are
+    # evicted beyond the entry limit
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "./embedding_cache.db"
+    embedding_cache_max_entries: int = 100000
+
+    # Vector storage layout
+    # "per_file": one collection per uploaded file (file_<id>)
+    # "per_user": one shared collection per user (user_<id>); chunks carry a
+    #   file_id metadata field and queries filter on it
+    # Existing files can be re-homed with: python -m app.scripts.migrate_collections
+    chroma_collection_layout: str = "per_file"
+
+    # Concurrency settings
+    # Blocking SDK/database calls run on the I/O pool, CPU-heavy work
+    # (hashing, text extraction, embedding) on the CPU pool. Leave the CPU
+    # pool size unset to use one worker per core.
+    io_pool_max_workers: int = 32
+    cpu_pool_max_workers: int | None = None
+    # Process pool for parsing that holds the GIL (PDF page extraction)
+    process_pool_max_workers: int | None = None
+
+    # Retrieval settings
+    # Collections are queried concurrently on a bounded thread pool; a
+    # collection that has not answered within the timeout of its request
+    # starting (or that waits that long for a worker) is skipped and the
+    # query returns the results gathered so far.
+    chroma_query_max_workers: int = 8
+    chroma_query_timeout_seconds: float = 10.0
+
+    # Query response cache
+    # Stand-alone questions (no chat history) are answered from a per-user
+    # cache keyed by the normalized query and the user's file set. Semantic
+    # matching is opt-in: with a threshold above 0 (e.g. 0.95), a query whose
+    # embedding is at least that similar to a cached one also hits, even if
+    # the wording differs. Uploads and deletes invalidate it.
+    query_cache_enabled: bool = True
+    query_cache_ttl_seconds: float = 300.0
+    query_cache_max_entries: int = 1000
+    query_cache_similarity_threshold: float = 0.0
+
+    # Intent detection
+    # Queries are classified by keyword rules, then by similarity to example
+    # queries (the best intent must win by this margin); the LLM is only
+    # asked when both are unsure. Decisions are kept in an LRU cache.
+    intent_local_classifier_enabled: bool = True
+    intent_similarity_margin: float = 0.05
+    intent_cache_max_entries: int = 1024
+
+    # Prompt assembly
+    # Prompts are kept within prompt_max_tokens (input side): the system
+    # prompt and question always fit, history gets up to its own limit
+    # (older turns are condensed into a list of earlier questions) and the
+    # retrieved context fills the rest. Tokens are counted with the chat
+    # model's tokenizer.json if set, else the embedding model's tokenizer.
+    # With a conversation_id, history is loaded from the stored messages
+    # instead of the client-supplied chat_history.
+    prompt_max_tokens: int = 6000
+    prompt_history_max_tokens: int = 1500
+    prompt_history_from_messages: bool = True
+    prompt_history_max_messages: int = 20
+    prompt_tokenizer_path: str | None = None
+    prompt_context_max_tokens: int = 3000
+
+    # Context selection
+    # Retrieval gathers up to context_candidates chunks; the best
+    # context_max_chunks are picked by maximal marginal relevance (lambda 1.0
+    # = relevance only) and adjacent chunks of a file are merged before being
+    # packed into the prompt.
+    context_candidates_per_collection: int = 5
+    context_candidates: int = 20
+    context_max_chunks: int = 8
+    context_mmr_lambda: float = 0.7
+
+    # Hybrid retrieval
+    # Chunks are also indexed in a local per-user BM25 index (SQLite) at
+    # ingestion; its top results are fused with the vector results by
+    # reciprocal rank fusion. Existing files can be indexed with:
+    # python -m app.scripts.build_lexical_index
+    hybrid_search_enabled: bool = True
+    lexical_index_path: str = "./lexical_index.db"
+    lexical_top_k: int = 20
+    rrf_k: int = 60
+
+    # Warm vector index
+    # Optional. Active users' chunk vectors are held in memory after their
+    # first query and searched locally (exact cosine top-k), skipping the
+    # vector store; least recently used users are evicted beyond the memory
+    # budget. Users over the budget, or whose vectors failed to load, use
+    # the vector store for warm_index_retry_seconds before being retried.
+    warm_index_enabled: bool = False
+    warm_index_max_mb: int = 256
+    warm_index_retry_seconds: float = 600.0
 
     # File upload settings
     max_file_size_mb: int = 50
     allowed_extensions: str = "pdf,docx,doc,txt,csv,xlsx,xls"
+    # Files (including zip archive members) accepted by one batch upload
+    batch_upload_max_files: int = 500
+
+    # Background ingestion settings
+    # Uploads are spooled to disk and processed by a pool of ingestion
+    # workers; failed jobs are retried with exponential backoff.
+    upload_spool_dir: str = "./uploads"
+    ingestion_max_workers: int = 4
+    ingestion_max_attempts: int = 3
+    ingestion_retry_backoff_seconds: float = 5.0
+    ingestion_poll_interval_seconds: float = 2.0
+    # Extracted chunks are embedded and stored in batches of this size, so
+    # memory stays bounded however large the document is
+    ingestion_batch_size: int = 256
+    # Ingestion is pipelined: a file's B2 upload runs alongside its
+    # extraction, the next batch is extracted while the current one is
+    # embedded and stored, and workers' files overlap stage by stage. Each
+    # stage admits at most this many files or batches at once across all
+    # workers (extraction defaults to the CPU pool size)
+    ingestion_upload_concurrency: int = 4
+    ingestion_extract_concurrency: int | None = None
+    ingestion_embed_concurrency: int = 1
+    ingestion_store_concurrency: int = 4
+
+    # PDF extraction
+    # PDFs with at least pdf_parallel_min_pages pages are extracted in page
+    # ranges of pdf_pages_per_shard on the process pool; one document keeps
+    # at most pdf_max_workers_per_document ranges in flight so a large
+    # upload cannot take over the whole pool
+    pdf_parallel_min_pages: int = 32
+    pdf_pages_per_shard: int = 16
+    pdf_max_workers_per_document: int = 4
+
+    # Tabular ingestion
+    # CSV and XLSX files are chunked by rows: up to tabular_rows_per_chunk
+    # rows per chunk (fewer once they pass tabular_chunk_max_chars), each
+    # chunk repeating its sheet's header row
+    tabular_chunking_enabled: bool = True
+    tabular_rows_per_chunk: int = 20
+    tabular_chunk_max_chars: int = 1000
 
     # Text chunking settings
+    # chunk_unit "characters" sizes chunks by chunk_size / chunk_overlap
+    # characters; "tokens" sizes them by chunk_size_tokens /
+    # chunk_overlap_tokens tokens of the embedding model's tokenizer, so
+    # chunks fill its window instead of being truncated or underfilled
+    # (chunk_size_tokens defaults to embedding_max_tokens minus the two
+    # special tokens)
+    chunk_unit: str = "characters"
     chunk_size: int = 500
     chunk_overlap: int = 50
+    chunk_size_tokens: int | None = None
+    chunk_overlap_tokens: int = 25
 
     # CORS settings
     cors_origins: str = "http://localhost:5173,http://localhost:3000,https://atlas-ai-production.up.railway.app"
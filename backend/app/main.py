@@ -8,8 +8,15 @@ from pathlib import Path
 
 from app.config.settings import get_settings
 from app.models.database import init_db
+from app.services.concurrency import shutdown_executors
+from app.services.embedding_cache import get_embedding_cache
+from app.services.query_cache import get_query_cache
+from app.services.warm_index import get_warm_index
+from app.services.intent_service import get_intent_service
+from app.services.ingestion_service import get_ingestion_service
 from app.models import user as user_models  # noqa: F401 ensure models are imported
 from app.models import conversation as conversation_models  # noqa: F401 ensure models are imported
+from app.models import ingestion_job as ingestion_job_models  # noqa: F401 ensure models are imported
 from app.routers import files, query, conversations
 from app.routers import auth as auth_router
 
@@ -78,19 +85,37 @@ async def startup_event():
                     db.close()
         except Exception as se:
             logger.warning("Admin seeding skipped: %s", se)
+
+        get_ingestion_service().start()
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}")
         raise
 
 
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop ingestion workers and release worker pools on shutdown."""
+    logger.info("Shutting down application...")
+    get_ingestion_service().stop()
+    shutdown_executors()
+
+
 # Health check endpoint
 @app.get("/health", tags=["health"])
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (includes cache metrics)."""
+    embedding_cache = get_embedding_cache()
+    query_cache = get_query_cache()
+    warm_index = get_warm_index()
     return {
         "status": "healthy",
         "app_name": settings.app_name,
-        "version": settings.app_version
+        "version": settings.app_version,
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_cache": query_cache.stats() if query_cache else None,
+        "warm_index": warm_index.stats() if warm_index else None,
+        "intent_tiers": get_intent_service().stats()
     }
 
 
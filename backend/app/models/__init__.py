@@ -1,2 +1,3 @@
 from .file import File  # noqa: F401
+from .ingestion_job import IngestionJob  # noqa: F401
 from .user import User  # noqa: F401
\ No newline at end of file
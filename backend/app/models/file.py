@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.database import Base
@@ -16,14 +16,34 @@ class File(Base):
     file_size = Column(Integer, nullable=False)
     backblaze_url = Column(String, nullable=False)
     backblaze_file_id = Column(String, nullable=False)
+    # B2 object name when it differs from filename (object shared with a duplicate upload)
+    backblaze_file_name = Column(String, nullable=True)
+    # SHA-256 of the uploaded content, used to reuse B2 objects and chunk vectors
+    content_hash = Column(String(64), nullable=True, index=True)
     chroma_collection_id = Column(String, nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
     is_processed = Column(Boolean, default=False)
+    # Ingestion stage: 'queued', 'extracting', 'embedding', 'completed' or
+    # 'failed' (NULL for files processed before stages existed); the B2 upload
+    # runs alongside extraction and embedding rather than as its own stage
+    processing_status = Column(String, nullable=True, default="queued")
+    processing_error = Column(Text, nullable=True)
+    # Chunk statistics recorded when processing completes; tokens are
+    # counted with the embedding model's tokenizer
+    chunk_count = Column(Integer, nullable=True)
+    token_count = Column(Integer, nullable=True)
+    max_chunk_tokens = Column(Integer, nullable=True)
+    truncated_chunk_count = Column(Integer, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"),
                      nullable=False, index=True)
 
     # Relationship to User
     user = relationship("User", backref="files")
 
+    @property
+    def storage_name(self) -> str:
+        """Name of the B2 object holding this file's content."""
+        return self.backblaze_file_name or self.filename
+
     def __repr__(self):
         return f"<File(id={self.id}, filename={self.filename}, original_name={self.original_name}, user_id={self.user_id})>"
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.models.database import Base
+
+
+class IngestionJob(Base):
+    """Ingestion job model for background file processing."""
+
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id"),
+                     nullable=False, index=True)
+    # 'queued', 'running', 'succeeded' or 'failed'
+    status = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    # 'process' (new upload) or 'replace' (new content for a processed
+    # file); NULL for jobs created before replacement existed
+    operation = Column(String, nullable=True, default="process")
+    # Local copy of the upload, removed once the job finishes
+    spool_path = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    # Name and SHA-256 of the replacement content (replace jobs only)
+    original_name = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    # Relationship to File
+    file = relationship("File", backref="ingestion_jobs")
+
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, file_id={self.file_id}, status={self.status}, attempts={self.attempts})>"
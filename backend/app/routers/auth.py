@@ -10,7 +10,9 @@ from app.services.auth_service import (
     verify_password,
     decode_token,
     create_user,
+    hash_password,
 )
+from app.services.concurrency import run_cpu, run_io
 from app.config.settings import get_settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -21,15 +23,16 @@ async def register(payload: RegisterRequest, db: Session = Depends(get_db)):
     settings = get_settings()
 
     # Check if user already exists
-    existing_user = get_user_by_email(payload.email, db)
+    existing_user = await run_io(get_user_by_email, payload.email, db)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
-    # Create new user
-    user = create_user(payload.email, payload.password, db)
+    # Hash on the CPU pool, insert on the I/O pool
+    hashed_password = await run_cpu(hash_password, payload.password)
+    user = await run_io(create_user, payload.email, hashed_password, db)
 
     # Generate tokens
     access_token = create_access_token(subject=user.email)
@@ -46,8 +49,8 @@ async def register(payload: RegisterRequest, db: Session = Depends(get_db)):
 async def login(payload: LoginRequest, db: Session = Depends(get_db)):
     settings = get_settings()
 
-    user = get_user_by_email(payload.email, db)
-    if user is None or not verify_password(payload.password, user.hashed_password):
+    user = await run_io(get_user_by_email, payload.email, db)
+    if user is None or not await run_cpu(verify_password, payload.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
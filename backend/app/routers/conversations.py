@@ -1,12 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
 import logging
-import json
 
 from app.models.database import get_db
 from app.models.user import User
-from app.models.conversation import Conversation, Message
 from app.schemas.conversation import (
     ConversationCreate,
     ConversationResponse,
@@ -15,6 +13,8 @@ from app.schemas.conversation import (
     MessageResponse
 )
 from app.services.auth_service import get_current_user
+from app.services.concurrency import run_io
+from app.services.conversation_service import get_conversation_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/conversations", tags=["conversations"])
@@ -27,17 +27,14 @@ async def create_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """Create a new conversation for the authenticated user."""
-    conversation = Conversation(
-        user_id=current_user.id,
-        title=payload.title or "New Conversation"
-    )
-    db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    conversation_service = get_conversation_service()
+
+    def _create():
+        conversation = conversation_service.create_conversation(
+            db, current_user.id, payload.title)
+        return ConversationResponse.model_validate(conversation)
 
-    logger.info(
-        f"Created conversation {conversation.id} for user {current_user.id}")
-    return conversation
+    return await run_io(_create)
 
 
 @router.get("", response_model=ConversationListResponse)
@@ -46,24 +43,21 @@ async def list_conversations(
     current_user: User = Depends(get_current_user)
 ):
     """List all conversations for the authenticated user."""
-    conversations = db.query(Conversation).filter(
-        Conversation.user_id == current_user.id
-    ).order_by(Conversation.updated_at.desc()).all()
+    conversation_service = get_conversation_service()
+    conversations = await run_io(
+        conversation_service.list_conversations, db, current_user.id)
 
     # Build response with message counts
-    conversation_items = []
-    for conv in conversations:
-        message_count = db.query(Message).filter(
-            Message.conversation_id == conv.id
-        ).count()
-
-        conversation_items.append(ConversationListItem(
+    conversation_items = [
+        ConversationListItem(
             id=conv.id,
             title=conv.title,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
             message_count=message_count
-        ))
+        )
+        for conv, message_count in conversations
+    ]
 
     return ConversationListResponse(
         conversations=conversation_items,
@@ -78,18 +72,15 @@ async def get_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific conversation with all messages."""
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
+    conversation_service = get_conversation_service()
+
+    def _load():
+        conversation = conversation_service.get_conversation(
+            db, conversation_id, current_user.id)
+        # Serialize while still on the I/O pool so lazy loads don't hit the event loop
+        return ConversationResponse.model_validate(conversation)
 
-    return conversation
+    return await run_io(_load)
 
 
 @router.put("/{conversation_id}", response_model=ConversationResponse)
@@ -100,25 +91,14 @@ async def update_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """Update conversation title."""
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
+    conversation_service = get_conversation_service()
 
-    if payload.title:
-        conversation.title = payload.title
+    def _update():
+        conversation = conversation_service.update_conversation(
+            db, conversation_id, current_user.id, payload.title)
+        return ConversationResponse.model_validate(conversation)
 
-    db.commit()
-    db.refresh(conversation)
-
-    logger.info(f"Updated conversation {conversation_id}")
-    return conversation
+    return await run_io(_update)
 
 
 @router.delete("/{conversation_id}", status_code=204)
@@ -128,21 +108,9 @@ async def delete_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """Delete a conversation and all its messages."""
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-
-    db.delete(conversation)
-    db.commit()
-
-    logger.info(f"Deleted conversation {conversation_id}")
+    conversation_service = get_conversation_service()
+    await run_io(conversation_service.delete_conversation,
+                 db, conversation_id, current_user.id)
     return None
 
 
@@ -153,20 +121,6 @@ async def get_conversation_messages(
     current_user: User = Depends(get_current_user)
 ):
     """Get all messages for a conversation."""
-    # Verify conversation ownership
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.asc()).all()
-
-    return messages
+    conversation_service = get_conversation_service()
+    return await run_io(
+        conversation_service.get_messages, db, conversation_id, current_user.id)
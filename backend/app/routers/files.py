@@ -1,27 +1,41 @@
 from fastapi import APIRouter, Depends, UploadFile, File as FastAPIFile, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import asyncio
 import logging
 
 from app.models.database import get_db
-from app.schemas.file import FileUploadResponse, FileResponse, FileListResponse, FileDeleteResponse
+from app.schemas.file import FileUploadResponse, FileResponse, FileListResponse, FileDeleteResponse, FileStatusResponse, BatchUploadResponse, BatchUploadItem
 from app.services.file_service import get_file_service
 from app.services.backblaze_service import get_backblaze_service
 from app.services.auth_service import get_current_user
+from app.services.concurrency import run_io
+from app.services.ingestion_service import get_ingestion_service
 from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+# Progress reported for each ingestion stage
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "extracting": 0.5,
+    "embedding": 0.75,
+    "completed": 1.0,
+    "failed": 1.0,
+}
 
-def get_authorized_url(file_record, backblaze_service) -> str:
-    """Generate fresh authorized URL for a file."""
+
+def get_authorized_url(file_record, backblaze_service) -> Optional[str]:
+    """Generate fresh authorized URL for a file (None until its B2 object exists)."""
+    if not file_record.is_processed or not file_record.backblaze_file_id:
+        return None
     try:
-        return backblaze_service.get_download_url(file_record.filename)
+        return backblaze_service.get_download_url(file_record.storage_name)
     except Exception as e:
         logger.error(
-            f"Failed to generate authorized URL for {file_record.filename}: {str(e)}")
+            f"Failed to generate authorized URL for {file_record.storage_name}: {str(e)}")
         # Fallback to stored URL
         return file_record.backblaze_url
 
@@ -39,11 +53,16 @@ def get_file_response_with_auth_url(file_record, backblaze_service) -> FileRespo
         backblaze_url=authorized_url,
         chroma_collection_id=file_record.chroma_collection_id,
         upload_date=file_record.upload_date,
-        is_processed=file_record.is_processed
+        is_processed=file_record.is_processed,
+        processing_status=file_record.processing_status,
+        chunk_count=file_record.chunk_count,
+        token_count=file_record.token_count,
+        max_chunk_tokens=file_record.max_chunk_tokens,
+        truncated_chunk_count=file_record.truncated_chunk_count
     )
 
 
-@router.post("/upload", response_model=FileUploadResponse, status_code=201)
+@router.post("/upload", response_model=FileUploadResponse, status_code=202)
 async def upload_file(
     file: UploadFile = FastAPIFile(...),
     db: Session = Depends(get_db),
@@ -52,20 +71,81 @@ async def upload_file(
     """
     Upload a file.
 
-    The file will be:
-    1. Uploaded to Backblaze B2
-    2. Processed to extract text
-    3. Chunked and stored in ChromaDB for vector search
-    4. Metadata saved to database
+    The upload is saved and queued, and the response returns immediately with
+    is_processed=False. An ingestion worker then:
+    1. Uploads it to Backblaze B2
+    2. Processes it to extract text
+    3. Chunks and stores it in ChromaDB for vector search
 
-    Returns a fresh authorized download URL valid for 1 hour.
+    Poll GET /files/{file_id}/status for progress. backblaze_url is null
+    until the file is processed; GET /files/{file_id} then returns a fresh
+    authorized download URL.
+    """
+    file_service = get_file_service()
+    file_record = await run_io(file_service.upload_file, file, db, current_user.id)
+
+    return FileUploadResponse(
+        id=file_record.id,
+        filename=file_record.filename,
+        original_name=file_record.original_name,
+        file_type=file_record.file_type,
+        file_size=file_record.file_size,
+        backblaze_url=None,
+        upload_date=file_record.upload_date,
+        is_processed=file_record.is_processed,
+        processing_status=file_record.processing_status
+    )
+
+
+@router.post("/upload/batch", response_model=BatchUploadResponse, status_code=202)
+async def upload_files(
+    files: List[UploadFile] = FastAPIFile(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload several files at once, as separate parts and/or zip archives.
+
+    Archives are expanded and each file is validated and queued on its own;
+    the response lists every file with its ID, or the reason it was
+    rejected. Queued files are processed by the ingestion workers with
+    their stages (B2 upload, extraction, embedding, storage) overlapping
+    across files.
+
+    Poll GET /files/{file_id}/status for each queued file.
+    """
+    file_service = get_file_service()
+    manifest = await run_io(file_service.upload_files, files, db, current_user.id)
+
+    items = [BatchUploadItem(**entry) for entry in manifest]
+    queued = sum(1 for item in items if item.status == "queued")
+    return BatchUploadResponse(files=items, queued=queued, rejected=len(items) - queued)
+
+
+@router.put("/{file_id}", response_model=FileUploadResponse, status_code=202)
+async def replace_file(
+    file_id: int,
+    file: UploadFile = FastAPIFile(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Replace the content of a processed file.
+
+    The file keeps its ID, so conversations referring to it stay intact.
+    The new content is queued and an ingestion worker re-chunks it, embedding
+    only chunks whose text changed and removing chunks that no longer exist.
+    While it runs, new chunks become searchable as they are stored and removed
+    chunks disappear only at the end, so queries may see both versions.
+
+    Poll GET /files/{file_id}/status for progress.
+    Returns 409 while the file is still being processed.
     """
     file_service = get_file_service()
     backblaze_service = get_backblaze_service()
-    file_record = file_service.upload_file(file, db, current_user.id)
+    file_record = await run_io(file_service.replace_file, file_id, file, db, current_user.id)
 
-    # Generate fresh authorized URL
-    authorized_url = get_authorized_url(file_record, backblaze_service)
+    authorized_url = await run_io(get_authorized_url, file_record, backblaze_service)
 
     return FileUploadResponse(
         id=file_record.id,
@@ -75,7 +155,8 @@ async def upload_file(
         file_size=file_record.file_size,
         backblaze_url=authorized_url,
         upload_date=file_record.upload_date,
-        is_processed=file_record.is_processed
+        is_processed=file_record.is_processed,
+        processing_status=file_record.processing_status
     )
 
 
@@ -91,8 +172,40 @@ async def get_file(
     """
     file_service = get_file_service()
     backblaze_service = get_backblaze_service()
-    file_record = file_service.get_file(file_id, db, current_user.id)
-    return get_file_response_with_auth_url(file_record, backblaze_service)
+    file_record = await run_io(file_service.get_file, file_id, db, current_user.id)
+    return await run_io(get_file_response_with_auth_url, file_record, backblaze_service)
+
+
+@router.get("/{file_id}/status", response_model=FileStatusResponse)
+async def get_file_status(
+    file_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the ingestion status of a file."""
+    file_service = get_file_service()
+    ingestion_service = get_ingestion_service()
+
+    def _load_status():
+        file_record = file_service.get_file(file_id, db, current_user.id)
+        job = ingestion_service.get_latest_job(db, file_record.id)
+
+        # Files processed before ingestion stages existed have no status
+        processing_status = file_record.processing_status or (
+            "completed" if file_record.is_processed else "queued")
+
+        return FileStatusResponse(
+            id=file_record.id,
+            is_processed=file_record.is_processed,
+            processing_status=processing_status,
+            progress=STAGE_PROGRESS.get(processing_status, 0.0),
+            attempts=job.attempts if job else 0,
+            error=file_record.processing_error or (job.last_error if job else None),
+            chunk_count=file_record.chunk_count,
+            token_count=file_record.token_count
+        )
+
+    return await run_io(_load_status)
 
 
 @router.get("/", response_model=FileListResponse)
@@ -106,13 +219,13 @@ async def list_files(
     """
     file_service = get_file_service()
     backblaze_service = get_backblaze_service()
-    files = file_service.list_files(db, current_user.id)
+    files = await run_io(file_service.list_files, db, current_user.id)
 
-    # Convert each file to response with fresh authorized URL
-    file_responses = [
-        get_file_response_with_auth_url(file, backblaze_service)
+    # Convert each file to response with fresh authorized URL (generated concurrently)
+    file_responses = await asyncio.gather(*[
+        run_io(get_file_response_with_auth_url, file, backblaze_service)
         for file in files
-    ]
+    ])
 
     return FileListResponse(files=file_responses, total=len(file_responses))
 
@@ -130,9 +243,12 @@ async def delete_file(
     1. Delete the file from Backblaze B2
     2. Delete the ChromaDB collection
     3. Delete the database record
+
+    Queued ingestion is cancelled; while a worker is processing the file the
+    request fails with 409.
     """
     file_service = get_file_service()
-    file_record = file_service.delete_file(file_id, db, current_user.id)
+    file_record = await run_io(file_service.delete_file, file_id, db, current_user.id)
 
     return FileDeleteResponse(
         message="File deleted successfully",
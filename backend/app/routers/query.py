@@ -1,22 +1,291 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
 import logging
 
-from app.models.database import get_db
+from app.config.settings import get_settings
+from app.models.database import get_db, SessionLocal
 from app.models.file import File
 from app.models.user import User
-from app.models.conversation import Conversation, Message
 from app.schemas.query import QueryRequest, QueryResponse, Source
 from app.services.chroma_service import get_chroma_service
-from app.services.groq_service import get_groq_service
+from app.services.groq_service import get_groq_service, NO_CONTEXT_RESPONSE
+from app.services.intent_service import IntentService, get_intent_service
+from app.services.context_selector import get_context_selector
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
 from app.services.backblaze_service import get_backblaze_service
 from app.services.auth_service import get_current_user
-import json
+from app.routers.files import get_authorized_url
+from app.services.concurrency import run_cpu, run_io
+from app.services.conversation_service import get_conversation_service
+from app.services.query_cache import get_query_cache
+from app.services.warm_index import get_warm_index
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 router = APIRouter(prefix="/query", tags=["query"])
 
 
+def find_matching_file(target_file: str, user_files: List[File]) -> Optional[File]:
+    """Find the user's file whose name contains the LLM-identified target file."""
+    return next(
+        (f for f in user_files if target_file.lower() in f.original_name.lower()), None)
+
+
+def guess_target_file(query: str, user_files: List[File]) -> Optional[File]:
+    """Guess which file a query names, before intent detection has finished."""
+    target_file = IntentService.match_target_file(
+        query, [f.original_name for f in user_files])
+    return next((f for f in user_files if f.original_name == target_file), None)
+
+
+async def build_file_urls(
+    user_files: List[File],
+    target_file: Optional[str],
+    backblaze_service,
+    speculative: Optional[Tuple[File, asyncio.Future]] = None
+) -> Dict[str, str]:
+    """
+    Build a filename -> fresh authorized download URL mapping for file retrieval.
+
+    If a specific file was identified only its URL is generated, reusing the
+    speculatively started URL when it is for the same file. Otherwise URLs for
+    all of the user's files are generated concurrently.
+    """
+    matching_file = find_matching_file(
+        target_file, user_files) if target_file else None
+
+    if matching_file:
+        if speculative and speculative[0] is matching_file:
+            authorized_url = await speculative[1]
+        else:
+            authorized_url = await run_io(
+                get_authorized_url, matching_file, backblaze_service)
+        return {matching_file.original_name: authorized_url}
+
+    # Generate fresh authorized URLs (valid for 1 hour) for all files
+    authorized_urls = await asyncio.gather(*[
+        run_io(get_authorized_url, file, backblaze_service)
+        for file in user_files
+    ])
+    return {file.original_name: url for file, url in zip(user_files, authorized_urls)}
+
+
+def build_sources(results: List[Dict[str, Any]]) -> List[Source]:
+    """Build source information (only the most relevant source)."""
+    sources = []
+
+    if results:
+        # Only return the most relevant source
+        most_relevant = results[0]
+        metadata = most_relevant.get('metadata', {})
+        filename = metadata.get('filename', 'unknown')
+
+        sources.append(Source(
+            filename=filename,
+            chunk_id=most_relevant.get('id', ''),
+            relevance_score=1 - most_relevant.get('distance', 0)
+            if most_relevant.get('distance') is not None else None
+        ))
+
+    return sources
+
+
+async def load_user_files(db: Session, current_user: User) -> List[File]:
+    """Get the current user's processed files (404 if there are none)."""
+    user_files = await run_io(
+        lambda: db.query(File).filter(
+            File.user_id == current_user.id,
+            File.is_processed == True  # noqa: E712
+        ).all())
+    if not user_files:
+        raise HTTPException(
+            status_code=404,
+            detail="No processed files yet. Please upload files first or wait for processing to finish."
+        )
+    return user_files
+
+
+def load_chat_history(db: Session, request: QueryRequest, user_id: int) -> List[Dict[str, str]]:
+    """
+    Get the chat history for a query.
+
+    Uses the conversation's stored messages when a conversation_id is given
+    (so clients need not re-send history), else the request's chat_history.
+    """
+    if request.conversation_id and settings.prompt_history_from_messages:
+        history = get_conversation_service().get_recent_history(
+            db,
+            request.conversation_id,
+            user_id,
+            limit=settings.prompt_history_max_messages
+        )
+        if history is not None:
+            return history
+    return request.chat_history
+
+
+def search_vectors(
+    user_id: int,
+    file_refs: List[Tuple[str, int]],
+    query: str,
+    query_embedding: Optional[Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Find the chunks nearest to a query among a user's files.
+
+    Served from the in-memory warm index when possible, otherwise by
+    querying the user's ChromaDB collections.
+
+    Args:
+        user_id: Querying user
+        file_refs: List of (chroma_collection_id, file_id) tuples to search
+        query: Query text
+        query_embedding: Optional precomputed query vector
+
+    Returns:
+        Results with their embeddings, sorted by distance
+    """
+    warm_index = get_warm_index()
+    if warm_index and query_embedding is not None:
+        results = warm_index.search(
+            user_id, file_refs, query_embedding, settings.context_candidates)
+        if results is not None:
+            return results
+
+    chroma_service = get_chroma_service()
+    collection_filters = chroma_service.build_collection_filters(file_refs)
+    return chroma_service.query_specific_collections(
+        collection_ids=list(collection_filters),
+        query_text=query,
+        n_results_per_collection=settings.context_candidates_per_collection,
+        top_k=settings.context_candidates,
+        where_filters=collection_filters,
+        query_embedding=query_embedding,
+        include_embeddings=True
+    )
+
+
+async def retrieve_query_context(
+    request: QueryRequest,
+    db: Session,
+    current_user: User,
+    user_files: Optional[List[File]] = None,
+    query_embedding: Optional[Any] = None
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Run the retrieval half of the query pipeline.
+
+    Steps 1 and 2 run concurrently since retrieval does not depend on the intent.
+    Retrieval combines vector search (see search_vectors) with a local BM25
+    search, fused by reciprocal rank.
+    Retrieved candidates are then narrowed down to diverse, merged passages
+    by the context selector (MMR on the returned embeddings).
+
+    Args:
+        request: Query request
+        db: Database session
+        current_user: Querying user
+        user_files: The user's processed files (loaded if not given)
+        query_embedding: Optional precomputed query vector
+
+    Returns:
+        Tuple of (intent, selected context passages, file URLs for file retrieval)
+    """
+    chroma_service = get_chroma_service()
+    intent_service = get_intent_service()
+    backblaze_service = get_backblaze_service()
+
+    # Get only the current user's processed files for intent detection
+    if user_files is None:
+        user_files = await load_user_files(db, current_user)
+
+    file_names = [f.original_name for f in user_files]
+
+    # Embed once for intent detection, retrieval and reranking
+    if query_embedding is None:
+        query_embedding = await run_cpu(chroma_service.embed_query, request.query)
+
+    # Step 1: Detect query intent
+    logger.info(f"Detecting intent for query: {request.query}")
+    intent_task = asyncio.ensure_future(run_io(
+        intent_service.detect_query_intent, request.query, file_names, query_embedding))
+
+    # Step 2: Search the user's chunk vectors (warm index or ChromaDB)
+    logger.info("Searching for relevant content")
+    retrieval_task = asyncio.ensure_future(run_io(
+        search_vectors,
+        current_user.id,
+        [(f.chroma_collection_id, f.id) for f in user_files],
+        request.query,
+        query_embedding
+    ))
+
+    # Step 2b: Search the local lexical index (exact names, IDs, numbers)
+    lexical_index = get_lexical_index()
+    lexical_task = None
+    if lexical_index:
+        lexical_task = asyncio.ensure_future(run_io(
+            lexical_index.search,
+            current_user.id,
+            request.query,
+            top_k=settings.lexical_top_k,
+            file_ids=[f.id for f in user_files]
+        ))
+
+    # Speculatively start the download URL if the query names a file
+    speculative = None
+    guessed_file = guess_target_file(request.query, user_files)
+    if guessed_file:
+        speculative = (guessed_file, asyncio.ensure_future(run_io(
+            get_authorized_url, guessed_file, backblaze_service)))
+
+    try:
+        intent_result, results = await asyncio.gather(
+            intent_task, retrieval_task)
+    except Exception:
+        for task in (intent_task, retrieval_task, lexical_task):
+            if task:
+                task.cancel()
+        if speculative:
+            speculative[1].cancel()
+        raise
+
+    intent = intent_result.get('intent', 'information_query')
+    target_file = intent_result.get('target_file')
+
+    logger.info(f"Detected intent: {intent}, target_file: {target_file}")
+
+    if lexical_task:
+        try:
+            lexical_results = await lexical_task
+            results = reciprocal_rank_fusion(
+                [results, lexical_results],
+                k=settings.rrf_k,
+                top_k=settings.context_candidates
+            )
+        except Exception as e:
+            logger.warning(f"Lexical search failed, using vector results only: {str(e)}")
+
+    # Narrow the candidates down to the passages used as context
+    results = await run_cpu(
+        get_context_selector().select, results, query_embedding)
+
+    # Step 3: Prepare file URLs for response generation
+    file_urls = {}
+
+    if results and intent == "file_retrieval":
+        file_urls = await build_file_urls(
+            user_files, target_file, backblaze_service, speculative)
+    elif speculative:
+        speculative[1].cancel()
+
+    return intent, results, file_urls
+
+
 @router.post("", response_model=QueryResponse)
 async def query_documents(
     request: QueryRequest,
@@ -27,165 +296,87 @@ async def query_documents(
     Query documents using natural language.
 
     The system will:
-    1. Detect the intent (file retrieval vs information query)
+    1. Detect the intent (file retrieval vs information query) and, concurrently,
     2. Search ChromaDB for relevant content
     3. Use Groq LLM to generate a response
     4. Return markdown-formatted response with download links if applicable
+
+    Stand-alone questions (no chat history) that were answered recently for
+    the same set of files are served from the query cache, skipping steps 1-3.
     """
     try:
-        chroma_service = get_chroma_service()
         groq_service = get_groq_service()
-        backblaze_service = get_backblaze_service()
-
-        # Get only the current user's files for intent detection
-        user_files = db.query(File).filter(
-            File.user_id == current_user.id).all()
-        if not user_files:
-            raise HTTPException(
-                status_code=404,
-                detail="No files have been uploaded yet. Please upload files first."
-            )
+        user_files = await load_user_files(db, current_user)
+        chat_history = await run_io(
+            load_chat_history, db, request, current_user.id)
 
-        file_names = [f.original_name for f in user_files]
+        # Check the response cache (answers with chat history depend on it, so skip those)
+        query_cache = get_query_cache() if not chat_history else None
+        query_embedding = None
+        cached = None
+        if query_cache:
+            file_set_version = query_cache.file_set_version(user_files)
+            if query_cache.similarity_threshold > 0:
+                query_embedding = await run_cpu(
+                    get_chroma_service().embed_query, request.query)
+            cached = query_cache.lookup(
+                current_user.id, file_set_version, request.query, query_embedding)
 
-        # Step 1: Detect query intent
-        logger.info(f"Detecting intent for query: {request.query}")
-        intent_result = groq_service.detect_query_intent(
-            request.query, file_names)
-        intent = intent_result.get('intent', 'information_query')
-        target_file = intent_result.get('target_file')
+        if cached:
+            logger.info(f"Serving cached response for query: {request.query}")
+            intent = cached["intent"]
+            markdown_response = cached["markdown_response"]
+            sources = [Source(**source) for source in cached["sources"]]
+        else:
+            intent, results, file_urls = await retrieve_query_context(
+                request, db, current_user, user_files, query_embedding)
 
-        logger.info(f"Detected intent: {intent}, target_file: {target_file}")
-
-        # Step 2: Search ChromaDB for relevant chunks (only user's collections)
-        logger.info("Querying ChromaDB for relevant content")
-        user_collection_ids = [f.chroma_collection_id for f in user_files]
-        results = chroma_service.query_specific_collections(
-            collection_ids=user_collection_ids,
-            query_text=request.query,
-            n_results_per_collection=3
-        )
+            if not results:
+                return QueryResponse(
+                    markdown_response=NO_CONTEXT_RESPONSE,
+                    sources=[],
+                    intent=intent
+                )
 
-        if not results:
-            return QueryResponse(
-                markdown_response="I couldn't find any relevant information in your documents to answer that question.",
-                sources=[],
-                intent=intent
+            # Step 4: Generate response using Groq
+            logger.info("Generating RAG response")
+            markdown_response = await run_io(
+                groq_service.generate_rag_response,
+                query=request.query,
+                context_chunks=results,
+                intent=intent,
+                chat_history=chat_history,
+                file_urls=file_urls if intent == "file_retrieval" else None
             )
 
-        # Step 3: Prepare file URLs for response generation
-        file_urls = {}
-
-        if intent == "file_retrieval":
-            # Build URL mapping for user's files with fresh authorized URLs
-            for file in user_files:
-                try:
-                    # Generate fresh authorized URL (valid for 1 hour)
-                    authorized_url = backblaze_service.get_download_url(
-                        file.filename)
-                    file_urls[file.original_name] = authorized_url
-                except Exception as e:
-                    logger.error(
-                        f"Failed to generate URL for {file.filename}: {str(e)}")
-                    # Fallback to stored URL if generation fails
-                    file_urls[file.original_name] = file.backblaze_url
-
-            # If specific file was identified, prioritize it
-            if target_file:
-                matching_file = next(
-                    (f for f in user_files if target_file.lower() in f.original_name.lower()), None)
-                if matching_file:
-                    try:
-                        authorized_url = backblaze_service.get_download_url(
-                            matching_file.filename)
-                        file_urls = {
-                            matching_file.original_name: authorized_url}
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to generate URL for {matching_file.filename}: {str(e)}")
-                        file_urls = {
-                            matching_file.original_name: matching_file.backblaze_url}
-
-        # Step 4: Generate response using Groq
-        logger.info("Generating RAG response")
-        markdown_response = groq_service.generate_rag_response(
-            query=request.query,
-            context_chunks=results[:5],
-            intent=intent,
-            chat_history=request.chat_history,
-            file_urls=file_urls if intent == "file_retrieval" else None
-        )
-
-        # Step 5: Build source information (only most relevant source)
-        sources = []
-
-        if results:
-            # Only return the most relevant source
-            most_relevant = results[0]
-            metadata = most_relevant.get('metadata', {})
-            filename = metadata.get('filename', 'unknown')
+            # Step 5: Build source information (only most relevant source)
+            sources = build_sources(results)
 
-            sources.append(Source(
-                filename=filename,
-                chunk_id=most_relevant.get('id', ''),
-                relevance_score=1 - most_relevant.get('distance', 0)
-                if most_relevant.get('distance') is not None else None
-            ))
+            if query_cache:
+                query_cache.store(
+                    current_user.id,
+                    file_set_version,
+                    request.query,
+                    {
+                        "intent": intent,
+                        "markdown_response": markdown_response,
+                        "sources": [s.model_dump() for s in sources]
+                    },
+                    query_embedding
+                )
 
         # Step 6: Save to database if conversation_id provided or create new one
-        conversation_id = request.conversation_id
-
-        if conversation_id:
-            # Verify conversation belongs to user
-            conversation = db.query(Conversation).filter(
-                Conversation.id == conversation_id,
-                Conversation.user_id == current_user.id
-            ).first()
-
-            if not conversation:
-                logger.warning(
-                    f"Conversation {conversation_id} not found for user {current_user.id}")
-                conversation_id = None
-
-        # Create new conversation if none exists
-        if not conversation_id:
-            conversation = Conversation(
-                user_id=current_user.id,
-                title=request.query[:50] +
-                "..." if len(request.query) > 50 else request.query
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-            conversation_id = conversation.id
-            logger.info(f"Created new conversation {conversation_id}")
-
-        # Save user message
-        user_message = Message(
-            conversation_id=conversation_id,
-            role="user",
-            content=request.query
-        )
-        db.add(user_message)
-
-        # Save assistant message
-        sources_json = json.dumps([{
-            "filename": s.filename,
-            "chunk_id": s.chunk_id,
-            "relevance_score": s.relevance_score
-        } for s in sources]) if sources else None
-
-        assistant_message = Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=markdown_response,
-            sources=sources_json,
+        conversation_service = get_conversation_service()
+        conversation_id = await run_io(
+            conversation_service.save_exchange,
+            db,
+            user_id=current_user.id,
+            conversation_id=request.conversation_id,
+            query=request.query,
+            response=markdown_response,
+            sources=[s.model_dump() for s in sources],
             intent=intent
         )
-        db.add(assistant_message)
-        db.commit()
-
-        logger.info(f"Saved messages to conversation {conversation_id}")
 
         return QueryResponse(
             markdown_response=markdown_response,
@@ -202,3 +393,104 @@ async def query_documents(
             status_code=500,
             detail=f"Failed to process query: {str(e)}"
         )
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def query_documents_stream(
+    request: QueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Query documents and stream the answer as Server-Sent Events.
+
+    Retrieval runs before the stream starts, so missing files and retrieval
+    failures are still reported as regular HTTP errors. The stream then emits:
+    - `intent`: {"intent": ...}
+    - `sources`: list of sources
+    - `token`: {"content": ...} for each generated text delta
+    - `done`: {"conversation_id": ...} once the messages are saved
+    - `error`: {"detail": ...} if generation fails mid-stream
+    """
+    try:
+        intent, results, file_urls = await retrieve_query_context(
+            request, db, current_user)
+        chat_history = await run_io(
+            load_chat_history, db, request, current_user.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process query: {str(e)}"
+        )
+
+    groq_service = get_groq_service()
+    conversation_service = get_conversation_service()
+    sources = build_sources(results)
+    user_id = current_user.id
+
+    def _save_exchange(markdown_response: str) -> int:
+        # Own session: the request-scoped one may be closed before the stream ends
+        session = SessionLocal()
+        try:
+            return conversation_service.save_exchange(
+                session,
+                user_id=user_id,
+                conversation_id=request.conversation_id,
+                query=request.query,
+                response=markdown_response,
+                sources=[s.model_dump() for s in sources],
+                intent=intent
+            )
+        finally:
+            session.close()
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield format_sse("intent", {"intent": intent})
+        yield format_sse("sources", [s.model_dump() for s in sources])
+
+        if not results:
+            yield format_sse("token", {"content": NO_CONTEXT_RESPONSE})
+            yield format_sse("done", {"conversation_id": None})
+            return
+
+        try:
+            # Step 4: Stream response from Groq, pulling each delta on the I/O pool
+            logger.info("Streaming RAG response")
+            deltas = groq_service.stream_rag_response(
+                query=request.query,
+                context_chunks=results,
+                intent=intent,
+                chat_history=chat_history,
+                file_urls=file_urls if intent == "file_retrieval" else None
+            )
+            response_parts = []
+
+            while True:
+                delta = await run_io(next, deltas, None)
+                if delta is None:
+                    break
+                response_parts.append(delta)
+                yield format_sse("token", {"content": delta})
+
+            # Step 5: Save the completed exchange
+            conversation_id = await run_io(
+                _save_exchange, "".join(response_parts).strip())
+            yield format_sse("done", {"conversation_id": conversation_id})
+
+        except Exception as e:
+            logger.error(f"Error streaming query response: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": f"Failed to process query: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 
 class FileUploadResponse(BaseModel):
@@ -11,14 +11,32 @@ class FileUploadResponse(BaseModel):
     original_name: str
     file_type: str
     file_size: int
-    backblaze_url: str
+    backblaze_url: Optional[str] = None  # null until the file is processed
     upload_date: datetime
     is_processed: bool
+    processing_status: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class BatchUploadItem(BaseModel):
+    """Result for one file of a batch upload."""
+
+    filename: str  # archive members are named "<archive>/<path>"
+    status: str  # 'queued' or 'rejected'
+    file_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResponse(BaseModel):
+    """Response model for batch upload: a manifest of per-file results."""
+
+    files: List[BatchUploadItem]
+    queued: int
+    rejected: int
+
+
 class FileResponse(BaseModel):
     """Response model for file details."""
 
@@ -27,15 +45,33 @@ class FileResponse(BaseModel):
     original_name: str
     file_type: str
     file_size: int
-    backblaze_url: str
+    backblaze_url: Optional[str] = None  # null until the file is processed
     chroma_collection_id: str
     upload_date: datetime
     is_processed: bool
+    processing_status: Optional[str] = None
+    chunk_count: Optional[int] = None
+    token_count: Optional[int] = None
+    max_chunk_tokens: Optional[int] = None
+    truncated_chunk_count: Optional[int] = None  # chunks longer than the embedding window
 
     class Config:
         from_attributes = True
 
 
+class FileStatusResponse(BaseModel):
+    """Response model for file ingestion status."""
+
+    id: int
+    is_processed: bool
+    processing_status: str
+    progress: float  # 0.0 - 1.0, based on the ingestion stage
+    attempts: int = 0
+    error: Optional[str] = None
+    chunk_count: Optional[int] = None
+    token_count: Optional[int] = None
+
+
 class FileListResponse(BaseModel):
     """Response model for list of files."""
 
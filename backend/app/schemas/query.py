@@ -6,8 +6,9 @@ class QueryRequest(BaseModel):
     """Request model for query."""
 
     query: str
-    # List of {"role": "user"/"assistant", "content": "..."}
-    chat_history: List[Dict[str, str]]
+    # List of {"role": "user"/"assistant", "content": "..."}; ignored when the
+    # conversation's stored messages are used (see prompt_history_from_messages)
+    chat_history: List[Dict[str, str]] = []
     # Optional: link to existing conversation
     conversation_id: Optional[int] = None
 
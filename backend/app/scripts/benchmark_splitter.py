@@ -0,0 +1,141 @@
+"""
+Benchmark the text splitter against langchain's RecursiveCharacterTextSplitter.
+
+Documents are extracted with DocumentProcessor and split by both splitters
+with the configured CHUNK_SIZE / CHUNK_OVERLAP; throughput is the best of
+several runs and the chunks are checked to be identical. Without paths a
+synthetic corpus of paragraphs is used.
+
+Requires langchain-text-splitters, which the application itself no longer
+needs (pip install langchain-text-splitters).
+
+Usage:
+    python -m app.scripts.benchmark_splitter [PATH ...] [--repeat N] [--synthetic-mb MB]
+"""
+import argparse
+import logging
+import os
+import random
+import time
+from typing import Callable, List
+
+from app.config.settings import get_settings
+from app.services.document_processor import get_document_processor
+from app.services.text_splitter import SEPARATORS, TextSplitter
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def load_corpus(paths: List[str]) -> List[str]:
+    """Extract the text of every supported file under the given paths."""
+    processor = get_document_processor()
+    extensions = {f".{extension}" for extension in settings.allowed_extensions_list}
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in sorted(names))
+        else:
+            files.append(path)
+
+    texts = []
+    for file_path in files:
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in extensions:
+            continue
+        try:
+            texts.append(processor.extract_text(file_path, extension))
+        except Exception as e:
+            logger.warning(f"Skipping {file_path}: {str(e)}")
+    return texts
+
+
+def synthetic_corpus(megabytes: float, seed: int = 0) -> List[str]:
+    """Generate documents of random-length paragraphs of random words."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+             for _ in range(2000)]
+    texts, size = [], 0
+
+    while size < megabytes * 1024 * 1024:
+        paragraphs = []
+        for _ in range(rng.randint(20, 200)):
+            lines = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 25)))
+                     for _ in range(rng.randint(1, 8))]
+            paragraphs.append("\n".join(lines))
+        text = "\n\n".join(paragraphs)
+        texts.append(text)
+        size += len(text)
+    return texts
+
+
+def time_splitter(split: Callable[[str], List[str]], texts: List[str], repeat: int):
+    """Split the corpus `repeat` times; returns (best seconds, chunks of the last run)."""
+    best, chunks = float("inf"), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = [split(text) for text in texts]
+        best = min(best, time.perf_counter() - started)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the text splitter against langchain's recursive splitter.")
+    parser.add_argument("paths", nargs="*",
+                        help="Files or directories to use as the corpus")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per splitter (the best is reported)")
+    parser.add_argument("--synthetic-mb", type=float, default=20.0,
+                        help="Size of the synthetic corpus used without paths")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        raise SystemExit(
+            "langchain-text-splitters is required for the comparison: pip install langchain-text-splitters")
+    # langchain warns about every oversized chunk
+    logging.getLogger("langchain_text_splitters").setLevel(logging.ERROR)
+
+    texts = load_corpus(args.paths) if args.paths else synthetic_corpus(args.synthetic_mb)
+    megabytes = sum(len(text) for text in texts) / (1024 * 1024)
+    logger.info(
+        f"Corpus: {len(texts)} documents, {megabytes:.1f}M characters, "
+        f"chunk_size={settings.chunk_size}, chunk_overlap={settings.chunk_overlap}")
+
+    splitters = {
+        "langchain": RecursiveCharacterTextSplitter(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            length_function=len,
+            separators=SEPARATORS
+        ).split_text,
+        "native": TextSplitter(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap
+        ).split_text
+    }
+
+    results = {}
+    for name, split in splitters.items():
+        seconds, chunks = time_splitter(split, texts, args.repeat)
+        results[name] = (seconds, chunks)
+        logger.info(
+            f"{name:>10}: {sum(len(c) for c in chunks)} chunks in {seconds:.3f}s "
+            f"({megabytes / seconds:.1f}M characters/s)")
+
+    baseline, native = results["langchain"], results["native"]
+    logger.info(f"Speedup: {baseline[0] / native[0]:.2f}x")
+    logger.info(f"Identical chunks: {baseline[1] == native[1]}")
+
+
+if __name__ == "__main__":
+    main()
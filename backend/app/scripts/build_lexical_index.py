@@ -0,0 +1,110 @@
+"""
+Build the local BM25 index for files processed before hybrid search existed.
+
+Reads each file's chunks back from ChromaDB (nothing is re-extracted) and
+indexes them with their Chroma IDs.
+
+Usage:
+    python -m app.scripts.build_lexical_index [--user-id ID] [--rebuild]
+"""
+import argparse
+import logging
+from typing import Optional
+
+from app.models.database import SessionLocal
+from app.models import user as user_models  # noqa: F401 ensure models are imported
+from app.models.file import File
+from app.services.chroma_service import ChromaService, get_chroma_service
+from app.services.lexical_index import LexicalIndex, get_lexical_index
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks read per get round trip
+BATCH_SIZE = 500
+
+
+def index_file(chroma: ChromaService, lexical_index: LexicalIndex, file_record: File) -> int:
+    """Index one file's stored chunks."""
+    collection = file_record.chroma_collection_id
+    where = {"file_id": file_record.id} if chroma.is_shared_collection(
+        collection) else None
+    indexed = 0
+
+    while True:
+        page = chroma.get_documents(
+            collection, where=where, limit=BATCH_SIZE, offset=indexed)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+
+        metadatas = [{**(metadata or {}), "file_id": file_record.id}
+                     for metadata in page["metadatas"]]
+        lexical_index.add_chunks(
+            file_record.user_id, file_record.id, collection,
+            page["documents"], metadatas, ids)
+        indexed += len(ids)
+
+    return indexed
+
+
+def build_lexical_index(user_id: Optional[int] = None, rebuild: bool = False) -> int:
+    """
+    Index all (or one user's) processed files missing from the lexical index.
+
+    Returns:
+        Number of indexed files
+    """
+    chroma = get_chroma_service()
+    lexical_index = get_lexical_index()
+    if lexical_index is None:
+        raise RuntimeError("Hybrid search is disabled (HYBRID_SEARCH_ENABLED)")
+
+    db = SessionLocal()
+    indexed_files = 0
+
+    try:
+        query = db.query(File).filter(File.is_processed == True)  # noqa: E712
+        if user_id is not None:
+            query = query.filter(File.user_id == user_id)
+
+        for file_record in query.order_by(File.id).all():
+            if lexical_index.has_file(file_record.id):
+                if not rebuild:
+                    continue
+                lexical_index.remove_file(file_record.id)
+
+            try:
+                chunks = index_file(chroma, lexical_index, file_record)
+                indexed_files += 1
+                logger.info(f"Indexed {chunks} chunks of file {file_record.id}")
+            except Exception as e:
+                lexical_index.remove_file(file_record.id)
+                logger.error(
+                    f"Failed to index file {file_record.id}: {str(e)}")
+
+        return indexed_files
+
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the local BM25 index from stored ChromaDB chunks.")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="Only index files owned by this user")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-index files that are already indexed")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    indexed = build_lexical_index(user_id=args.user_id, rebuild=args.rebuild)
+    logger.info(f"Indexed {indexed} files")
+
+
+if __name__ == "__main__":
+    main()
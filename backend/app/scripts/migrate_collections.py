@@ -0,0 +1,205 @@
+"""
+Re-home existing ChromaDB chunks into a collection layout.
+
+Moves every file whose `File.chroma_collection_id` does not match the target
+layout, reusing the stored embeddings (nothing is re-embedded):
+
+- per_user: copies `file_<id>` collections into the owner's `user_<id>`
+  collection, tagging each chunk with `file_id`
+- per_file: splits chunks out of `user_<id>` collections into new
+  `file_<id>` collections
+
+Files that are still being ingested or replaced are skipped (run again once
+they have finished). The lexical index is pointed at the new collection.
+
+Usage:
+    python -m app.scripts.migrate_collections [--layout per_user] [--user-id ID] [--dry-run] [--keep-source]
+"""
+import argparse
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import get_settings
+from app.models.database import SessionLocal
+from app.models import user as user_models  # noqa: F401 ensure models are imported
+from app.models.file import File
+from app.services.chroma_service import ChromaService, get_chroma_service
+from app.services.ingestion_service import get_ingestion_service
+from app.services.lexical_index import get_lexical_index
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks copied per get/add round trip
+BATCH_SIZE = 500
+
+
+def _copy_chunks(
+    chroma: ChromaService,
+    source: str,
+    target: str,
+    file_id: int,
+    where: Optional[dict]
+) -> int:
+    """Copy a file's chunks (with embeddings) from one collection to another."""
+    return chroma.copy_documents(
+        source,
+        target,
+        where=where,
+        metadata_updates={"file_id": file_id},
+        batch_size=BATCH_SIZE
+    )
+
+
+def _is_in_flight(db: Session, file_record: File) -> bool:
+    """Check whether a worker may still be writing the file's chunks."""
+    db.refresh(file_record)
+    return not file_record.is_processed or \
+        file_record.processing_status not in (None, "completed", "failed") or \
+        get_ingestion_service().has_active_job(db, file_record.id)
+
+
+def migrate_file(
+    db: Session,
+    chroma: ChromaService,
+    file_record: File,
+    layout: str,
+    keep_source: bool = False,
+    dry_run: bool = False
+) -> bool:
+    """
+    Move one file's chunks into the target layout.
+
+    Returns:
+        True if the file was (or, in dry-run mode, would be) migrated
+    """
+    source = file_record.chroma_collection_id
+    source_is_shared = chroma.is_shared_collection(source)
+
+    if layout == "per_user" and source == chroma.get_user_collection_name(file_record.user_id):
+        return False
+    if layout == "per_file" and not source_is_shared:
+        return False
+
+    target = chroma.get_collection_name_for_upload(file_record.user_id, layout)
+    file_where = {"file_id": file_record.id}
+
+    if _is_in_flight(db, file_record):
+        logger.warning(
+            f"Skipping file {file_record.id}: it is still being processed")
+        return False
+
+    if dry_run:
+        logger.info(f"[dry-run] Would move file {file_record.id}: {source} -> {target}")
+        return True
+
+    # Make the copy idempotent if a previous run stopped half way
+    chroma.create_collection(target)
+    if chroma.is_shared_collection(target):
+        chroma.delete_documents(target, where=file_where)
+
+    copied = _copy_chunks(
+        chroma,
+        source,
+        target,
+        file_record.id,
+        where=file_where if source_is_shared else None
+    )
+
+    # An upload or replacement queued meanwhile would write to the source
+    if _is_in_flight(db, file_record):
+        if chroma.is_shared_collection(target):
+            chroma.delete_documents(target, where=file_where)
+        else:
+            chroma.delete_collection(target)
+        logger.warning(
+            f"Skipping file {file_record.id}: processing started during the copy")
+        return False
+
+    file_record.chroma_collection_id = target
+    db.commit()
+
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        lexical_index.move_file(file_record.id, target)
+
+    if not keep_source:
+        if source_is_shared:
+            chroma.delete_documents(source, where=file_where)
+        else:
+            chroma.delete_collection(source)
+
+    logger.info(
+        f"Moved {copied} chunks of file {file_record.id}: {source} -> {target}")
+    return True
+
+
+def migrate_collections(
+    layout: str,
+    user_id: Optional[int] = None,
+    keep_source: bool = False,
+    dry_run: bool = False
+) -> int:
+    """
+    Migrate all (or one user's) files into the target layout.
+
+    Returns:
+        Number of migrated files
+    """
+    chroma = get_chroma_service()
+    db = SessionLocal()
+    migrated = 0
+
+    try:
+        query = db.query(File)
+        if user_id is not None:
+            query = query.filter(File.user_id == user_id)
+
+        for file_record in query.order_by(File.id).all():
+            try:
+                if migrate_file(db, chroma, file_record, layout, keep_source, dry_run):
+                    migrated += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(
+                    f"Failed to migrate file {file_record.id}: {str(e)}")
+
+        return migrated
+
+    finally:
+        db.close()
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(
+        description="Re-home ChromaDB chunks into a collection layout.")
+    parser.add_argument("--layout", choices=["per_file", "per_user"],
+                        default=settings.chroma_collection_layout,
+                        help="Target layout (defaults to CHROMA_COLLECTION_LAYOUT)")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="Only migrate files owned by this user")
+    parser.add_argument("--keep-source", action="store_true",
+                        help="Do not delete the source chunks after copying")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report what would be migrated")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    migrated = migrate_collections(
+        layout=args.layout,
+        user_id=args.user_id,
+        keep_source=args.keep_source,
+        dry_run=args.dry_run
+    )
+    logger.info(f"Migrated {migrated} files to the {args.layout} layout")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from app.config.settings import get_settings
 from app.models.database import get_db
 from app.models.user import User
+from app.services.concurrency import run_io
 
 
 _password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -65,9 +66,8 @@ def get_user_by_email(email: str, db: Session) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
 
-def create_user(email: str, password: str, db: Session) -> User:
-    """Create a new user with hashed password."""
-    hashed_password = hash_password(password)
+def create_user(email: str, hashed_password: str, db: Session) -> User:
+    """Create a new user with an already hashed password (see hash_password)."""
     user = User(email=email, hashed_password=hashed_password)
     db.add(user)
     db.commit()
@@ -96,7 +96,7 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    user = get_user_by_email(email, db)
+    user = await run_io(get_user_by_email, email, db)
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
@@ -63,6 +63,45 @@ class BackblazeService:
             logger.error(f"Failed to upload file to B2: {str(e)}")
             raise
 
+    def upload_local_file_to_b2(self, file_path: str, file_name: str, content_type: str) -> tuple[str, str]:
+        """
+        Upload a local file to Backblaze B2 without loading it into memory.
+
+        The file is streamed from disk; b2sdk switches to the multi-part large
+        file API for big files automatically.
+
+        Args:
+            file_path: Path of the local file
+            file_name: Name of the file in B2
+            content_type: MIME type of the file
+
+        Returns:
+            Tuple of (file_url, file_id)
+        """
+        try:
+            bucket = self.b2_api.get_bucket_by_name(
+                settings.backblaze_bucket_name)
+
+            # Upload file
+            file_info = bucket.upload_local_file(
+                local_file=file_path,
+                file_name=file_name,
+                content_type=content_type
+            )
+
+            # Get download URL
+            download_url = self.b2_api.get_download_url_for_file_name(
+                settings.backblaze_bucket_name,
+                file_name
+            )
+
+            logger.info(f"Successfully uploaded file: {file_name}")
+            return download_url, file_info.id_
+
+        except Exception as e:
+            logger.error(f"Failed to upload file to B2: {str(e)}")
+            raise
+
     def delete_file_from_b2(self, file_id: str, file_name: str) -> bool:
         """
         Delete file from Backblaze B2.
@@ -1,7 +1,16 @@
 import chromadb
+import heapq
+import itertools
 import logging
-from typing import List, Dict, Any
+import numpy as np
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple
 from app.config.settings import get_settings
+from app.services.concurrency import run_cpu_bound
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
+from app.services.embedding_service import get_embedding_service
+from app.services.vector_store import LocalVectorStore, VectorStore
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -13,22 +22,89 @@ class ChromaService:
 
     def __init__(self):
         self.client = self._get_chroma_client()
-
-    def _get_chroma_client(self):
-        """Initialize ChromaDB cloud client."""
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=settings.chroma_query_max_workers,
+            thread_name_prefix="chroma-query"
+        )
+
+    def _get_chroma_client(self) -> VectorStore:
+        """Initialize the vector store client selected by settings.vector_backend."""
+        backend = settings.vector_backend
         try:
-            client = chromadb.CloudClient(
-                tenant=settings.chroma_tenant,
-                database=settings.chroma_database,
-                api_key=settings.chroma_api_key
-            )
-            logger.info("Successfully connected to ChromaDB Cloud")
+            if backend == "cloud":
+                client = chromadb.CloudClient(
+                    tenant=settings.chroma_tenant,
+                    database=settings.chroma_database,
+                    api_key=settings.chroma_api_key
+                )
+                logger.info("Successfully connected to ChromaDB Cloud")
+            elif backend == "local":
+                client = LocalVectorStore(settings.vector_store_path)
+            else:
+                raise ValueError(f"Unknown vector backend: {backend}")
             return client
 
         except Exception as e:
-            logger.error(f"Failed to connect to ChromaDB: {str(e)}")
+            logger.error(f"Failed to open vector store ({backend}): {str(e)}")
             raise
 
+    @staticmethod
+    def get_user_collection_name(user_id: int) -> str:
+        """Get the name of a user's shared collection."""
+        return f"user_{user_id}"
+
+    @staticmethod
+    def is_shared_collection(collection_name: str) -> bool:
+        """Check whether a collection holds chunks from several files."""
+        return collection_name.startswith("user_")
+
+    def get_collection_name_for_upload(self, user_id: int, layout: str = None) -> str:
+        """
+        Get the collection a new upload should be stored in.
+
+        Args:
+            user_id: ID of the uploading user
+            layout: Storage layout ("per_file" or "per_user"), defaults to settings
+
+        Returns:
+            Collection name
+        """
+        layout = layout or settings.chroma_collection_layout
+        if layout == "per_user":
+            return self.get_user_collection_name(user_id)
+        if layout != "per_file":
+            raise ValueError(f"Unknown collection layout: {layout}")
+        return f"file_{uuid.uuid4().hex[:16]}"
+
+    def build_collection_filters(self, file_refs: List[Tuple[str, int]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Build per-collection `where` filters for a set of files.
+
+        Per-file collections are queried without a filter; shared collections
+        are filtered down to the given file IDs.
+
+        Args:
+            file_refs: List of (chroma_collection_id, file_id) tuples
+
+        Returns:
+            Dict mapping collection name to its `where` filter (or None)
+        """
+        shared_file_ids: Dict[str, List[int]] = {}
+        filters: Dict[str, Optional[Dict[str, Any]]] = {}
+
+        for collection_id, file_id in file_refs:
+            if self.is_shared_collection(collection_id):
+                shared_file_ids.setdefault(collection_id, []).append(file_id)
+            filters[collection_id] = None
+
+        for collection_id, file_ids in shared_file_ids.items():
+            if len(file_ids) == 1:
+                filters[collection_id] = {"file_id": file_ids[0]}
+            else:
+                filters[collection_id] = {"file_id": {"$in": file_ids}}
+
+        return filters
+
     def create_collection(self, collection_name: str):
         """
         Create or get a collection in ChromaDB.
@@ -56,7 +132,8 @@ class ChromaService:
         collection_name: str,
         documents: List[str],
         metadatas: List[Dict[str, Any]],
-        ids: List[str] = None
+        ids: List[str] = None,
+        embeddings: np.ndarray = None
     ) -> bool:
         """
         Add documents to a collection.
@@ -66,6 +143,7 @@ class ChromaService:
             documents: List of document texts
             metadatas: List of metadata dicts
             ids: Optional list of IDs (will be generated if not provided)
+            embeddings: Optional precomputed embeddings (computed locally if not provided)
 
         Returns:
             True if successful
@@ -77,10 +155,14 @@ class ChromaService:
             if ids is None:
                 ids = [str(uuid.uuid4()) for _ in range(len(documents))]
 
+            if embeddings is None:
+                embeddings = self.embed_documents(documents)
+
             collection.add(
                 documents=documents,
                 metadatas=metadatas,
-                ids=ids
+                ids=ids,
+                embeddings=embeddings
             )
 
             logger.info(
@@ -91,11 +173,151 @@ class ChromaService:
             logger.error(f"Failed to add documents to ChromaDB: {str(e)}")
             raise
 
+    def get_documents(
+        self,
+        collection_name: str,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: List[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch stored documents from a collection.
+
+        Args:
+            collection_name: Name of the collection
+            where: Optional metadata filter
+            limit: Optional page size
+            offset: Optional page offset
+            include: Fields to include (defaults to documents and metadatas)
+
+        Returns:
+            Chroma get() result dict
+        """
+        try:
+            collection = self.client.get_collection(name=collection_name)
+            return collection.get(
+                where=where,
+                limit=limit,
+                offset=offset,
+                include=include or ["documents", "metadatas"]
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to get documents from ChromaDB: {str(e)}")
+            raise
+
+    def update_metadatas(self, collection_name: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the metadata of stored documents without re-embedding them.
+
+        Args:
+            collection_name: Name of the collection
+            ids: IDs of the documents
+            metadatas: New metadata dicts, one per ID
+
+        Returns:
+            True if successful
+        """
+        try:
+            collection = self.client.get_collection(name=collection_name)
+            collection.update(ids=ids, metadatas=metadatas)
+            logger.info(
+                f"Updated metadata of {len(ids)} documents in collection {collection_name}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to update documents in ChromaDB: {str(e)}")
+            raise
+
+    def delete_documents(
+        self,
+        collection_name: str,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None
+    ) -> bool:
+        """
+        Delete documents matching a metadata filter and/or IDs from a collection.
+
+        Args:
+            collection_name: Name of the collection
+            where: Metadata filter selecting the documents to delete
+            ids: IDs of the documents to delete
+
+        Returns:
+            True if successful
+        """
+        try:
+            collection = self.client.get_collection(name=collection_name)
+            collection.delete(ids=ids, where=where)
+            logger.info(
+                f"Deleted documents matching {where or f'{len(ids)} IDs'} from collection {collection_name}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete documents from ChromaDB: {str(e)}")
+            raise
+
+    def copy_documents(
+        self,
+        source: str,
+        target: str,
+        where: Optional[Dict[str, Any]] = None,
+        metadata_updates: Optional[Dict[str, Any]] = None,
+        new_ids: bool = False,
+        batch_size: int = 500
+    ) -> int:
+        """
+        Copy documents with their stored embeddings between collections.
+
+        Nothing is re-embedded. Source and target may be the same collection
+        as long as new_ids is set and metadata_updates moves the copies out
+        of the `where` filter.
+
+        Args:
+            source: Collection to copy from
+            target: Collection to copy into (created if missing)
+            where: Optional metadata filter selecting the documents to copy
+            metadata_updates: Metadata fields overwritten on every copy
+            new_ids: Generate new IDs instead of keeping the source IDs
+            batch_size: Number of documents per get/add round trip
+
+        Returns:
+            Number of copied documents
+        """
+        copied = 0
+
+        while True:
+            page = self.get_documents(
+                source,
+                where=where,
+                limit=batch_size,
+                offset=copied,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+
+            metadatas = [{**(metadata or {}), **(metadata_updates or {})}
+                         for metadata in page["metadatas"]]
+            self.add_documents(
+                collection_name=target,
+                documents=page["documents"],
+                metadatas=metadatas,
+                ids=[str(uuid.uuid4()) for _ in ids] if new_ids else ids,
+                embeddings=page["embeddings"]
+            )
+            copied += len(ids)
+
+        return copied
+
     def query_collection(
         self,
         collection_name: str,
         query_text: str,
-        n_results: int = 5
+        n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None
     ) -> Dict[str, Any]:
         """
         Query a specific collection.
@@ -104,6 +326,7 @@ class ChromaService:
             collection_name: Name of the collection to query
             query_text: Query text
             n_results: Number of results to return
+            query_embedding: Optional precomputed query vector
 
         Returns:
             Query results dict
@@ -111,8 +334,11 @@ class ChromaService:
         try:
             collection = self.client.get_collection(name=collection_name)
 
+            if query_embedding is None:
+                query_embedding = self.embed_query(query_text)
+
             results = collection.query(
-                query_texts=[query_text],
+                **self._query_input(query_text, query_embedding),
                 n_results=n_results
             )
 
@@ -124,56 +350,255 @@ class ChromaService:
             logger.error(f"Failed to query collection: {str(e)}")
             raise
 
+    def embed_documents(self, documents: List[str]) -> Optional[np.ndarray]:
+        """
+        Embed documents locally in length-sorted batches.
+
+        Vectors are looked up in the embedding cache first; only misses are
+        embedded (once per distinct text) and then added to the cache.
+
+        Returns None (letting Chroma embed the documents itself) when local
+        embeddings are disabled or the model cannot be loaded.
+        """
+        if not settings.use_local_embeddings or not documents:
+            return None
+
+        try:
+            embedding_service = get_embedding_service()
+            cache = self._get_embedding_cache()
+            if cache is None:
+                return run_cpu_bound(embedding_service.embed, documents)
+
+            keys = [cache.make_key(embedding_service.cache_namespace, document)
+                    for document in documents]
+            cached = cache.get_many(keys)
+
+            # Embed each missing text once, even if it repeats in this batch
+            missing: Dict[str, str] = {}
+            for key, document in zip(keys, documents):
+                if key not in cached and key not in missing:
+                    missing[key] = document
+
+            if missing:
+                computed = run_cpu_bound(
+                    embedding_service.embed, list(missing.values()))
+                new_vectors = dict(zip(missing.keys(), computed))
+                cache.put_many(new_vectors)
+                cached.update(new_vectors)
+
+            logger.info(
+                f"Embedded {len(missing)} of {len(documents)} chunks "
+                f"({len(documents) - len(missing)} from cache)")
+            return np.stack([cached[key] for key in keys])
+
+        except Exception as e:
+            logger.warning(
+                f"Local document embedding failed, falling back to Chroma: {str(e)}")
+            return None
+
+    @staticmethod
+    def _get_embedding_cache() -> Optional[EmbeddingCache]:
+        """Get the embedding cache, or None if it is disabled or unavailable."""
+        try:
+            return get_embedding_cache()
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {str(e)}")
+            return None
+
+    def embed_query(self, query_text: str) -> Optional[np.ndarray]:
+        """
+        Embed a query locally so it can be reused across collections.
+
+        Returns None (letting Chroma embed the text itself) when local
+        embeddings are disabled or the model cannot be loaded.
+        """
+        if not settings.use_local_embeddings:
+            return None
+
+        try:
+            return get_embedding_service().embed_query(query_text)
+        except Exception as e:
+            logger.warning(
+                f"Local query embedding failed, falling back to Chroma: {str(e)}")
+            return None
+
+    @staticmethod
+    def _query_input(query_text: str, query_embedding: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Build the query argument, preferring a precomputed embedding."""
+        if query_embedding is not None:
+            return {"query_embeddings": [query_embedding.tolist()]}
+        return {"query_texts": [query_text]}
+
+    @staticmethod
+    def _distance_key(result: Dict[str, Any]) -> float:
+        """Sort key for results (lower distance is better)."""
+        return result['distance'] if result['distance'] is not None else float('inf')
+
+    @staticmethod
+    def _format_results(results: Dict[str, Any], collection_name: str) -> List[Dict[str, Any]]:
+        """Flatten a single-query Chroma result into a list of result dicts."""
+        formatted = []
+        if results and results.get('documents'):
+            embeddings = results.get('embeddings')
+            for i in range(len(results['documents'][0])):
+                result = {
+                    'document': results['documents'][0][i],
+                    'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
+                    'distance': results['distances'][0][i] if results.get('distances') else None,
+                    'id': results['ids'][0][i] if results.get('ids') else None,
+                    'collection': collection_name
+                }
+                if embeddings is not None:
+                    result['embedding'] = np.asarray(
+                        embeddings[0][i], dtype=np.float32)
+                formatted.append(result)
+        return formatted
+
+    def _query_single_collection(
+        self,
+        collection_id: str,
+        query_text: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Query one collection and return its results sorted by distance."""
+        collection = self.client.get_collection(name=collection_id)
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = collection.query(
+            **self._query_input(query_text, query_embedding),
+            n_results=n_results,
+            where=where,
+            include=include
+        )
+        formatted = self._format_results(results, collection.name)
+        formatted.sort(key=self._distance_key)
+        return formatted
+
+    def _merge_results(
+        self,
+        per_collection_results: List[List[Dict[str, Any]]],
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Merge per-collection result lists (each already sorted by distance).
+
+        Uses a heap-based k-way merge so only the top_k results are materialized.
+        """
+        merged = heapq.merge(*per_collection_results, key=self._distance_key)
+        if top_k is not None:
+            merged = itertools.islice(merged, top_k)
+        return list(merged)
+
     def query_specific_collections(
         self,
         collection_ids: List[str],
         query_text: str,
-        n_results_per_collection: int = 3
+        n_results_per_collection: int = 3,
+        top_k: Optional[int] = None,
+        where_filters: Optional[Dict[str, Optional[Dict[str, Any]]]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        include_embeddings: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Query across specific collections (user-specific).
 
+        Collections are queried concurrently on a bounded thread pool, each
+        with its own deadline: chroma_query_timeout_seconds from when its
+        request starts, or from submission while it is still waiting for a
+        worker. Collections that fail or miss their deadline are skipped, so
+        the result may be partial. A request that has already started cannot
+        be interrupted; it keeps its worker until Chroma answers, and its
+        result is discarded.
+
         Args:
             collection_ids: List of collection IDs to query
             query_text: Query text
             n_results_per_collection: Number of results per collection
+            top_k: Optional cap on the number of merged results returned
+            where_filters: Optional mapping of collection ID to `where` filter
+                (see build_collection_filters)
+            query_embedding: Optional precomputed query vector (embedded once
+                here otherwise and reused for every collection)
+            include_embeddings: Also return each result's stored vector
+                under 'embedding' (used for reranking)
 
         Returns:
-            List of results from specified collections
+            List of results from specified collections, sorted by distance
         """
         try:
-            all_results = []
+            where_filters = where_filters or {}
+            if query_embedding is None:
+                query_embedding = self.embed_query(query_text)
+            timeout = settings.chroma_query_timeout_seconds
+            submitted_at = time.monotonic()
+            started_at: Dict[str, float] = {}
+            futures = {}
+
+            def query_collection(collection_id: str, *args) -> List[Dict[str, Any]]:
+                started_at[collection_id] = time.monotonic()
+                return self._query_single_collection(collection_id, *args)
 
             for collection_id in collection_ids:
-                try:
-                    collection = self.client.get_collection(name=collection_id)
-                    results = collection.query(
-                        query_texts=[query_text],
-                        n_results=n_results_per_collection
-                    )
-
-                    # Add collection name to metadata
-                    if results and results.get('documents'):
-                        for i in range(len(results['documents'][0])):
-                            all_results.append({
-                                'document': results['documents'][0][i],
-                                'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
-                                'distance': results['distances'][0][i] if results.get('distances') else None,
-                                'id': results['ids'][0][i] if results.get('ids') else None,
-                                'collection': collection.name
-                            })
-
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to query collection {collection_id}: {str(e)}")
-                    continue
-
-            # Sort by distance (lower is better)
-            all_results.sort(
-                key=lambda x: x['distance'] if x['distance'] is not None else float('inf'))
+                where = where_filters.get(collection_id)
+                n_results = n_results_per_collection
+                if self.is_shared_collection(collection_id):
+                    # A shared collection stands in for many files
+                    n_results = max(n_results_per_collection, top_k or 0)
+
+                future = self.query_executor.submit(
+                    query_collection,
+                    collection_id,
+                    query_text,
+                    n_results,
+                    where,
+                    query_embedding,
+                    include_embeddings
+                )
+                futures[future] = collection_id
+
+            per_collection_results = []
+            pending = set(futures)
+            answered = 0
+
+            while pending:
+                now = time.monotonic()
+                deadlines = {
+                    future: started_at.get(futures[future], submitted_at) + timeout
+                    for future in pending
+                }
+                for future, deadline in deadlines.items():
+                    # Finished futures are collected below even if late
+                    if deadline <= now and not future.done():
+                        pending.discard(future)
+                        # Only stops requests that have not started yet
+                        future.cancel()
+                        logger.warning(
+                            f"Timed out querying collection {futures[future]}")
+                if not pending:
+                    break
+
+                done, _ = wait(
+                    pending,
+                    timeout=min(deadlines[future] for future in pending) - now,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    pending.discard(future)
+                    answered += 1
+                    try:
+                        per_collection_results.append(future.result())
+                    except Exception as e:
+                        logger.warning(
+                            f"Failed to query collection {futures[future]}: {str(e)}")
+
+            all_results = self._merge_results(per_collection_results, top_k)
 
             logger.info(
-                f"Queried {len(collection_ids)} collections, found {len(all_results)} results")
+                f"Queried {answered}/{len(collection_ids)} collections, found {len(all_results)} results")
             return all_results
 
         except Exception as e:
@@ -183,7 +608,8 @@ class ChromaService:
     def query_all_collections(
         self,
         query_text: str,
-        n_results_per_collection: int = 3
+        n_results_per_collection: int = 3,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Query across all collections.
@@ -191,6 +617,7 @@ class ChromaService:
         Args:
             query_text: Query text
             n_results_per_collection: Number of results per collection
+            query_embedding: Optional precomputed query vector
 
         Returns:
             List of results from all collections
@@ -199,23 +626,19 @@ class ChromaService:
             collections = self.client.list_collections()
             all_results = []
 
+            if query_embedding is None:
+                query_embedding = self.embed_query(query_text)
+            query_input = self._query_input(query_text, query_embedding)
+
             for collection in collections:
                 try:
                     results = collection.query(
-                        query_texts=[query_text],
+                        **query_input,
                         n_results=n_results_per_collection
                     )
 
-                    # Add collection name to metadata
-                    if results and results.get('documents'):
-                        for i in range(len(results['documents'][0])):
-                            all_results.append({
-                                'document': results['documents'][0][i],
-                                'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
-                                'distance': results['distances'][0][i] if results.get('distances') else None,
-                                'id': results['ids'][0][i] if results.get('ids') else None,
-                                'collection': collection.name
-                            })
+                    all_results.extend(
+                        self._format_results(results, collection.name))
 
                 except Exception as e:
                     logger.warning(
@@ -223,8 +646,7 @@ class ChromaService:
                     continue
 
             # Sort by distance (lower is better)
-            all_results.sort(
-                key=lambda x: x['distance'] if x['distance'] is not None else float('inf'))
+            all_results.sort(key=self._distance_key)
 
             logger.info(
                 f"Queried all collections, found {len(all_results)} results")
@@ -0,0 +1,161 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, TypeVar
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+_IO_THREAD_PREFIX = "io-pool"
+_CPU_THREAD_PREFIX = "cpu-pool"
+
+# Singleton instances, created under _executor_lock
+_io_executor = None
+_cpu_executor = None
+_process_executor = None
+_executor_lock = threading.Lock()
+
+# Ingestion pipeline stage slots (see pipeline_stage)
+_stage_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_stage_lock = threading.Lock()
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Get or create the thread pool for blocking I/O (SDK clients, database)."""
+    global _io_executor
+    if _io_executor is None:
+        with _executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=settings.io_pool_max_workers,
+                    thread_name_prefix=_IO_THREAD_PREFIX
+                )
+    return _io_executor
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Get or create the thread pool for CPU-bound work."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _executor_lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(
+                    max_workers=settings.cpu_pool_max_workers or os.cpu_count() or 1,
+                    thread_name_prefix=_CPU_THREAD_PREFIX
+                )
+    return _cpu_executor
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """
+    Get or create the process pool for CPU-bound work that holds the GIL.
+
+    Workers are spawned rather than forked so they do not inherit the
+    server's threads and open clients.
+    """
+    global _process_executor
+    if _process_executor is None:
+        with _executor_lock:
+            if _process_executor is None:
+                _process_executor = ProcessPoolExecutor(
+                    max_workers=settings.process_pool_max_workers or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_executor
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking I/O call on the I/O pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-bound work on the CPU pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(func, *args, **kwargs))
+
+
+def run_cpu_bound(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run CPU-bound work on the CPU pool from synchronous code and wait for it.
+
+    Used by services running on the I/O pool so CPU-heavy steps stay bounded by
+    the CPU pool size. Runs inline when already on a CPU pool thread.
+    """
+    if threading.current_thread().name.startswith(_CPU_THREAD_PREFIX):
+        return func(*args, **kwargs)
+    return get_cpu_executor().submit(func, *args, **kwargs).result()
+
+
+def submit_cpu_bound(func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """
+    Start CPU-bound work on the CPU pool from synchronous code without waiting.
+
+    Like run_cpu_bound, runs inline (returning a completed Future) when
+    already on a CPU pool thread, so a pool thread never waits on its own pool.
+    """
+    if not threading.current_thread().name.startswith(_CPU_THREAD_PREFIX):
+        return get_cpu_executor().submit(func, *args, **kwargs)
+
+    future: "Future[T]" = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _stage_limit(stage: str) -> int:
+    """Number of slots of an ingestion pipeline stage."""
+    limits = {
+        "upload": settings.ingestion_upload_concurrency,
+        "extract": settings.ingestion_extract_concurrency or settings.cpu_pool_max_workers or os.cpu_count() or 1,
+        "embed": settings.ingestion_embed_concurrency,
+        "store": settings.ingestion_store_concurrency,
+    }
+    if stage not in limits:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+    return max(1, limits[stage])
+
+
+@contextmanager
+def pipeline_stage(stage: str) -> Iterator[None]:
+    """
+    Hold a slot of an ingestion pipeline stage while running it.
+
+    Stages are "upload" (B2), "extract", "embed" and "store" (vector
+    store and lexical index). Each admits a bounded number of files or
+    batches at once across all ingestion workers, so files at different
+    stages overlap without one stage taking over the pools.
+    """
+    with _stage_lock:
+        semaphore = _stage_semaphores.get(stage)
+        if semaphore is None:
+            semaphore = _stage_semaphores[stage] = threading.BoundedSemaphore(_stage_limit(stage))
+
+    with semaphore:
+        yield
+
+
+def shutdown_executors():
+    """Shut down the shared worker pools."""
+    global _io_executor, _cpu_executor, _process_executor
+    with _executor_lock:
+        executors = (_io_executor, _cpu_executor, _process_executor)
+        _io_executor = None
+        _cpu_executor = None
+        _process_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("Shut down worker pools")
@@ -0,0 +1,210 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.chroma_service import get_chroma_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Suffix/prefix overlap (in characters) looked for when joining adjacent chunks;
+# shorter matches are treated as coincidence
+MIN_OVERLAP_CHARS = 10
+MAX_OVERLAP_CHARS = 2000
+
+
+class ContextSelector:
+    """Pick diverse, non-redundant context passages from retrieval results."""
+
+    def select(
+        self,
+        results: List[Dict[str, Any]],
+        query_embedding: Optional[np.ndarray] = None,
+        max_chunks: int = None,
+        mmr_lambda: float = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Select context for generation from retrieved chunks.
+
+        1. Drop chunks whose text repeats an earlier (better ranked) chunk
+        2. Rerank with maximal marginal relevance so near-duplicates give way
+           to chunks that add information
+        3. Merge chunks that are adjacent in the same file (by chunk_index),
+           removing the text they overlap on
+
+        Args:
+            results: Retrieval results sorted by distance, with 'embedding' if available
+            query_embedding: Normalized query vector (MMR is skipped without it)
+            max_chunks: Number of chunks to keep (defaults to settings)
+            mmr_lambda: Relevance/diversity trade-off, 1.0 = relevance only
+
+        Returns:
+            Passages in rank order; each keeps the best chunk's id, distance
+            and metadata, and the first result is the most relevant chunk
+        """
+        max_chunks = max_chunks or settings.context_max_chunks
+        mmr_lambda = settings.context_mmr_lambda if mmr_lambda is None else mmr_lambda
+
+        candidates = self._drop_duplicates(results)
+        ranked = self._rerank_mmr(
+            candidates, query_embedding, max_chunks, mmr_lambda)
+        passages = self._merge_adjacent(ranked)
+
+        logger.info(
+            f"Selected {len(ranked)} of {len(results)} chunks as {len(passages)} passages")
+        return passages
+
+    @staticmethod
+    def _drop_duplicates(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the first occurrence of each (whitespace-normalized) chunk text."""
+        seen = set()
+        unique = []
+        for result in results:
+            text = " ".join((result.get('document') or '').split())
+            if text and text not in seen:
+                seen.add(text)
+                unique.append(result)
+        return unique
+
+    def _rerank_mmr(
+        self,
+        candidates: List[Dict[str, Any]],
+        query_embedding: Optional[np.ndarray],
+        max_chunks: int,
+        mmr_lambda: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Greedy maximal marginal relevance selection.
+
+        Each step picks the candidate maximizing
+        lambda * relevance(c) - (1 - lambda) * max(sim(c, selected)).
+        Relevance is the hybrid fusion score (scaled to 0-1) when present,
+        so lexical matches keep their rank, else the query similarity.
+        Falls back to the given order when embeddings are missing.
+        """
+        if len(candidates) <= 1 or query_embedding is None or \
+                not self._fill_embeddings(candidates):
+            return candidates[:max_chunks]
+
+        vectors = np.stack([c['embedding'] for c in candidates]).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-12
+        vectors /= norms
+
+        if all(c.get('fusion_score') is not None for c in candidates):
+            relevance = np.array([c['fusion_score'] for c in candidates], dtype=np.float32)
+            relevance /= relevance.max() or 1.0
+        else:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            relevance = vectors @ (query / (np.linalg.norm(query) or 1e-12))
+
+        selected: List[int] = []
+        # Highest similarity of each candidate to anything selected so far
+        redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+        available = np.ones(len(candidates), dtype=bool)
+
+        for _ in range(min(max_chunks, len(candidates))):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * penalty
+            scores[~available] = -np.inf
+
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+        return [candidates[i] for i in selected]
+
+    @staticmethod
+    def _fill_embeddings(candidates: List[Dict[str, Any]]) -> bool:
+        """
+        Embed candidates returned without a vector (e.g. lexical matches).
+
+        Chunk vectors are normally served from the embedding cache.
+
+        Returns:
+            True if every candidate has an embedding
+        """
+        missing = [c for c in candidates if c.get('embedding') is None]
+        if not missing:
+            return True
+
+        embeddings = get_chroma_service().embed_documents(
+            [c['document'] for c in missing])
+        if embeddings is None:
+            return False
+        for candidate, embedding in zip(missing, embeddings):
+            candidate['embedding'] = embedding
+        return True
+
+    def _merge_adjacent(self, ranked: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Join chunks with consecutive chunk_index values from the same file.
+
+        A merged passage takes the rank (and id, distance, metadata) of its
+        best-ranked chunk.
+        """
+        groups: Dict[Any, List[int]] = {}
+        for rank, result in enumerate(ranked):
+            metadata = result.get('metadata') or {}
+            if metadata.get('chunk_index') is None:
+                groups[('rank', rank)] = [rank]
+                continue
+            key = (result.get('collection'), metadata.get(
+                'file_id', metadata.get('filename')))
+            groups.setdefault(key, []).append(rank)
+
+        passages = []
+        for ranks in groups.values():
+            ranks.sort(key=lambda r: (ranked[r].get(
+                'metadata') or {}).get('chunk_index', 0))
+            run = [ranks[0]]
+            for rank in ranks[1:]:
+                previous_index = ranked[run[-1]]['metadata'].get('chunk_index')
+                if previous_index is not None and \
+                        ranked[rank]['metadata'].get('chunk_index') == previous_index + 1:
+                    run.append(rank)
+                else:
+                    passages.append(self._build_passage(ranked, run))
+                    run = [rank]
+            passages.append(self._build_passage(ranked, run))
+
+        passages.sort(key=lambda passage: passage['rank'])
+        for passage in passages:
+            del passage['rank']
+        return passages
+
+    def _build_passage(self, ranked: List[Dict[str, Any]], run: List[int]) -> Dict[str, Any]:
+        """Build one passage from a run of adjacent chunks (ordered by chunk_index)."""
+        best = min(run)
+        text = ranked[run[0]]['document']
+        for rank in run[1:]:
+            text = self._join_overlapping(text, ranked[rank]['document'])
+
+        passage = {key: value for key, value in ranked[best].items()
+                   if key != 'embedding'}
+        passage['document'] = text
+        passage['rank'] = best
+        return passage
+
+    @staticmethod
+    def _join_overlapping(first: str, second: str) -> str:
+        """Concatenate two consecutive chunks, dropping the text they share."""
+        for length in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+            if first.endswith(second[:length]):
+                return first + second[length:]
+        return f"{first}\n{second}"
+
+
+# Singleton instance
+_context_selector = None
+
+
+def get_context_selector() -> ContextSelector:
+    """Get or create ContextSelector instance."""
+    global _context_selector
+    if _context_selector is None:
+        _context_selector = ContextSelector()
+    return _context_selector
@@ -0,0 +1,216 @@
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.models.conversation import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationService:
+    """Service for managing conversations and their messages."""
+
+    def create_conversation(self, db: Session, user_id: int, title: Optional[str] = None) -> Conversation:
+        """
+        Create a new conversation.
+
+        Args:
+            db: Database session
+            user_id: ID of the owning user
+            title: Optional conversation title
+
+        Returns:
+            Conversation model instance
+        """
+        conversation = Conversation(
+            user_id=user_id,
+            title=title or "New Conversation"
+        )
+        db.add(conversation)
+        db.commit()
+        db.refresh(conversation)
+
+        logger.info(f"Created conversation {conversation.id} for user {user_id}")
+        return conversation
+
+    def list_conversations(self, db: Session, user_id: int) -> List[Tuple[Conversation, int]]:
+        """
+        List a user's conversations, most recently updated first.
+
+        Args:
+            db: Database session
+            user_id: ID of the owning user
+
+        Returns:
+            List of (conversation, message_count) tuples
+        """
+        conversations = db.query(Conversation).filter(
+            Conversation.user_id == user_id
+        ).order_by(Conversation.updated_at.desc()).all()
+
+        result = []
+        for conv in conversations:
+            message_count = db.query(Message).filter(
+                Message.conversation_id == conv.id
+            ).count()
+            result.append((conv, message_count))
+
+        return result
+
+    def get_conversation(self, db: Session, conversation_id: int, user_id: int) -> Conversation:
+        """
+        Get a conversation owned by the user.
+
+        Raises:
+            HTTPException 404 if the conversation does not exist or is not owned by the user
+        """
+        conversation = self.find_conversation(db, conversation_id, user_id)
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        return conversation
+
+    def find_conversation(self, db: Session, conversation_id: int, user_id: int) -> Optional[Conversation]:
+        """Get a conversation owned by the user, or None."""
+        return db.query(Conversation).filter(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        ).first()
+
+    def update_conversation(
+        self,
+        db: Session,
+        conversation_id: int,
+        user_id: int,
+        title: Optional[str]
+    ) -> Conversation:
+        """Update a conversation's title."""
+        conversation = self.get_conversation(db, conversation_id, user_id)
+
+        if title:
+            conversation.title = title
+
+        db.commit()
+        db.refresh(conversation)
+
+        logger.info(f"Updated conversation {conversation_id}")
+        return conversation
+
+    def delete_conversation(self, db: Session, conversation_id: int, user_id: int):
+        """Delete a conversation and all its messages."""
+        conversation = self.get_conversation(db, conversation_id, user_id)
+
+        db.delete(conversation)
+        db.commit()
+
+        logger.info(f"Deleted conversation {conversation_id}")
+
+    def get_messages(self, db: Session, conversation_id: int, user_id: int) -> List[Message]:
+        """Get all messages of a conversation owned by the user, oldest first."""
+        self.get_conversation(db, conversation_id, user_id)
+
+        return db.query(Message).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.asc()).all()
+
+    def get_recent_history(
+        self,
+        db: Session,
+        conversation_id: int,
+        user_id: int,
+        limit: int
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Get the latest messages of a conversation as chat history.
+
+        Returns:
+            Up to `limit` {"role", "content"} dicts, oldest first, or None if
+            the conversation does not exist or is not owned by the user
+        """
+        if not self.find_conversation(db, conversation_id, user_id):
+            return None
+
+        messages = db.query(Message).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.desc(), Message.id.desc()).limit(limit).all()
+
+        return [{"role": m.role, "content": m.content} for m in reversed(messages)]
+
+    def save_exchange(
+        self,
+        db: Session,
+        user_id: int,
+        conversation_id: Optional[int],
+        query: str,
+        response: str,
+        sources: Optional[List[dict]] = None,
+        intent: Optional[str] = None
+    ) -> int:
+        """
+        Save a user query and the assistant response.
+
+        Falls back to a new conversation (titled after the query) when no
+        conversation ID is given or it does not belong to the user.
+
+        Args:
+            db: Database session
+            user_id: ID of the querying user
+            conversation_id: Optional existing conversation ID
+            query: User query text
+            response: Assistant response (markdown)
+            sources: Optional list of source dicts
+            intent: Optional detected intent
+
+        Returns:
+            ID of the conversation the messages were saved to
+        """
+        if conversation_id:
+            # Verify conversation belongs to user
+            if not self.find_conversation(db, conversation_id, user_id):
+                logger.warning(
+                    f"Conversation {conversation_id} not found for user {user_id}")
+                conversation_id = None
+
+        # Create new conversation if none exists
+        if not conversation_id:
+            conversation = Conversation(
+                user_id=user_id,
+                title=query[:50] + "..." if len(query) > 50 else query
+            )
+            db.add(conversation)
+            db.commit()
+            db.refresh(conversation)
+            conversation_id = conversation.id
+            logger.info(f"Created new conversation {conversation_id}")
+
+        # Save user message
+        user_message = Message(
+            conversation_id=conversation_id,
+            role="user",
+            content=query
+        )
+        db.add(user_message)
+
+        # Save assistant message
+        assistant_message = Message(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=response,
+            sources=json.dumps(sources) if sources else None,
+            intent=intent
+        )
+        db.add(assistant_message)
+        db.commit()
+
+        logger.info(f"Saved messages to conversation {conversation_id}")
+        return conversation_id
+
+
+def get_conversation_service() -> ConversationService:
+    """Get ConversationService instance."""
+    return ConversationService()
@@ -1,51 +1,223 @@
+import codecs
+import csv
 import io
+import itertools
 import logging
-from typing import List, Tuple
+import os
+from collections import deque
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
 from PyPDF2 import PdfReader
 from docx import Document
 from openpyxl import load_workbook
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tokenizers import Tokenizer
 from app.config.settings import get_settings
+from app.services.concurrency import get_process_executor
+from app.services.text_splitter import TextSplitter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# A document can be given as raw bytes, a local file path or a binary file handle
+DocumentSource = Union[bytes, str, os.PathLike, BinaryIO]
+
+# Plain text is read in segments of this many characters
+TEXT_SEGMENT_CHARS = 64 * 1024
+
+# Streaming chunker: buffered text is split once it reaches this size
+STREAM_BUFFER_CHARS = 64 * 1024
+
+# Block size used when sniffing a file's encoding
+ENCODING_PROBE_BYTES = 1024 * 1024
+
+# Characters of a CSV file used to detect its delimiter
+CSV_SNIFF_CHARS = 64 * 1024
+
+# File types chunked by rows in tabular mode
+TABULAR_FILE_TYPES = ('csv', 'xlsx', 'xls')
+
+# Table rows as (row number, cell texts)
+TableRows = Iterator[Tuple[int, List[str]]]
+
+# Tokens the embedding model adds around every input ([CLS] and [SEP])
+SPECIAL_TOKENS = 2
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    """
+    Extract the text of pages [start, end) of a PDF.
+
+    Runs in process pool workers, so it takes a path rather than an open file.
+    """
+    pdf_reader = PdfReader(path)
+    return [pdf_reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+
+def embedding_window() -> int:
+    """Number of text tokens the embedding model reads from a chunk."""
+    return settings.embedding_max_tokens - SPECIAL_TOKENS
+
+
+# Singleton tokenizer (False once loading failed)
+_chunk_tokenizer = None
+
+
+def get_chunk_tokenizer() -> Optional[Tokenizer]:
+    """
+    Get the embedding model's tokenizer for sizing and counting chunks.
+
+    Truncation and special tokens are off, so counts are of the chunk text
+    itself. Returns None if the tokenizer cannot be loaded.
+    """
+    global _chunk_tokenizer
+    if _chunk_tokenizer is None:
+        try:
+            if settings.use_local_embeddings:
+                # Downloads the model if needed
+                from app.services.embedding_service import get_embedding_service
+                model_dir = get_embedding_service().model_dir
+            else:
+                from app.services.embedding_service import DEFAULT_MODEL_DIR
+                model_dir = settings.embedding_model_path or DEFAULT_MODEL_DIR
+
+            tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            _chunk_tokenizer = tokenizer
+        except Exception as e:
+            logger.warning(f"Chunk tokenizer unavailable: {str(e)}")
+            _chunk_tokenizer = False
+    return _chunk_tokenizer or None
+
+
+class ChunkTokenStats:
+    """Running token statistics of one document's chunks."""
+
+    def __init__(self, window: int = None):
+        self.window = window or embedding_window()
+        self.chunks = 0
+        self.tokens = 0
+        self.min_tokens = 0
+        self.max_tokens = 0
+        # Chunks longer than the embedding window, whose tail is not embedded
+        self.truncated = 0
+
+    def add(self, counts: List[int]):
+        """Record the token counts of a batch of chunks."""
+        if not counts:
+            return
+        batch_min = min(counts)
+        self.min_tokens = min(self.min_tokens, batch_min) if self.chunks else batch_min
+        self.max_tokens = max(self.max_tokens, max(counts))
+        self.chunks += len(counts)
+        self.tokens += sum(counts)
+        self.truncated += sum(1 for count in counts if count > self.window)
+
+    @property
+    def mean_tokens(self) -> float:
+        return self.tokens / self.chunks if self.chunks else 0.0
+
+    def __str__(self):
+        return (f"{self.chunks} chunks, {self.tokens} tokens "
+                f"(min {self.min_tokens}, mean {self.mean_tokens:.0f}, max {self.max_tokens} per chunk; "
+                f"{self.truncated} over the {self.window}-token window)")
+
 
 class DocumentProcessor:
     """Service for processing and extracting text from various document formats."""
 
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = self._build_text_splitter()
+
+    @staticmethod
+    def _build_text_splitter() -> TextSplitter:
+        """Create the splitter for settings.chunk_unit."""
+        if settings.chunk_unit == "tokens":
+            tokenizer = get_chunk_tokenizer()
+            if tokenizer is not None:
+                return TextSplitter(
+                    chunk_size=settings.chunk_size_tokens or embedding_window(),
+                    chunk_overlap=settings.chunk_overlap_tokens,
+                    tokenizer=tokenizer
+                )
+            logger.warning("Sizing chunks in characters: no tokenizer for token sizing")
+        elif settings.chunk_unit != "characters":
+            raise ValueError(f"Unknown chunk unit: {settings.chunk_unit}")
+
+        return TextSplitter(
             chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            chunk_overlap=settings.chunk_overlap
         )
 
-    def extract_text(self, file_content: bytes, file_type: str) -> str:
+    @staticmethod
+    def count_tokens(texts: List[str]) -> Optional[List[int]]:
+        """
+        Count the embedding model tokens of each text in one batched encode.
+
+        Returns:
+            Token counts (without special tokens), or None if the tokenizer
+            is unavailable
+        """
+        tokenizer = get_chunk_tokenizer()
+        if tokenizer is None:
+            return None
+        if not texts:
+            return []
+        return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    @staticmethod
+    @contextmanager
+    def _open_source(source: DocumentSource) -> Iterator[BinaryIO]:
+        """Open a document source as a binary file handle without copying it."""
+        if isinstance(source, (bytes, bytearray)):
+            yield io.BytesIO(source)
+        elif isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file_handle:
+                yield file_handle
+        else:
+            source.seek(0)
+            yield source
+
+    def extract_text(self, source: DocumentSource, file_type: str) -> str:
         """
         Extract text from file based on file type.
 
         Args:
-            file_content: File content as bytes
+            source: File content as bytes, a local file path or a binary file handle
             file_type: File extension (pdf, docx, txt, csv, xlsx)
 
         Returns:
             Extracted text as string
         """
+        return "".join(self.iter_text(source, file_type))
+
+    def iter_text(self, source: DocumentSource, file_type: str) -> Iterator[str]:
+        """
+        Extract text from a file as a stream of segments.
+
+        The segments (pages, paragraphs, rows or blocks of text) concatenate
+        to the document's full text, which is never held in memory at once.
+
+        Args:
+            source: File content as bytes, a local file path or a binary file handle
+            file_type: File extension (pdf, docx, txt, csv, xlsx)
+
+        Yields:
+            Text segments in document order
+        """
         file_type = file_type.lower().replace('.', '')
 
         try:
             if file_type == 'pdf':
-                return self._extract_from_pdf(file_content)
+                yield from self._extract_from_pdf(source)
             elif file_type in ['docx', 'doc']:
-                return self._extract_from_docx(file_content)
+                yield from self._extract_from_docx(source)
             elif file_type == 'txt':
-                return self._extract_from_txt(file_content)
+                yield from self._extract_from_txt(source)
             elif file_type == 'csv':
-                return self._extract_from_csv(file_content)
+                yield from self._extract_from_csv(source)
             elif file_type in ['xlsx', 'xls']:
-                return self._extract_from_xlsx(file_content)
+                yield from self._extract_from_xlsx(source)
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
 
@@ -53,73 +225,291 @@ class DocumentProcessor:
             logger.error(f"Failed to extract text from {file_type}: {str(e)}")
             raise
 
-    def _extract_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF file."""
-        pdf_file = io.BytesIO(file_content)
-        pdf_reader = PdfReader(pdf_file)
+    @staticmethod
+    def _join(parts: Iterable[str], separator: str) -> Iterator[str]:
+        """Yield non-empty parts with the separator in front of all but the first."""
+        first = True
+        for part in parts:
+            if not part:
+                continue
+            yield part if first else separator + part
+            first = False
+
+    def _extract_from_pdf(self, source: DocumentSource) -> Iterator[str]:
+        """Extract text from PDF file, one page at a time."""
+        yield from self._join(
+            (f"[Page {page_num}]\n{page_text}" if page_text else ""
+             for page_num, page_text in self._iter_pdf_pages(source)),
+            "\n\n"
+        )
 
-        text = []
-        for page_num, page in enumerate(pdf_reader.pages, 1):
-            page_text = page.extract_text()
-            if page_text:
-                text.append(f"[Page {page_num}]\n{page_text}")
+    def _iter_pdf_pages(self, source: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page number, text) for every page of a PDF, in page order.
 
-        return "\n\n".join(text)
+        Large PDFs given as a file path are extracted in parallel page ranges
+        on the process pool; others are extracted page by page in-process.
+        """
+        with self._open_source(source) as pdf_file:
+            pdf_reader = PdfReader(pdf_file)
+            page_count = len(pdf_reader.pages)
 
-    def _extract_from_docx(self, file_content: bytes) -> str:
-        """Extract text from DOCX file."""
-        docx_file = io.BytesIO(file_content)
-        doc = Document(docx_file)
+            if not isinstance(source, (str, os.PathLike)) or \
+                    page_count < settings.pdf_parallel_min_pages or \
+                    settings.pdf_max_workers_per_document <= 1:
+                for page_num, page in enumerate(pdf_reader.pages, 1):
+                    yield page_num, page.extract_text() or ""
+                return
 
-        text = []
-        for para in doc.paragraphs:
-            if para.text.strip():
-                text.append(para.text)
+        yield from self._iter_pdf_pages_parallel(os.fspath(source), page_count)
 
-        return "\n\n".join(text)
+    @staticmethod
+    def _iter_pdf_pages_parallel(path: str, page_count: int) -> Iterator[Tuple[int, str]]:
+        """
+        Extract page ranges on the process pool and yield pages in order.
 
-    def _extract_from_txt(self, file_content: bytes) -> str:
-        """Extract text from TXT file."""
+        At most settings.pdf_max_workers_per_document ranges are in flight;
+        the next range is submitted as each finished one is consumed, so
+        pages stream out while later ranges are still being extracted.
+        """
+        executor = get_process_executor()
+        shard_size = max(settings.pdf_pages_per_shard, 1)
+        shards = iter([(start, min(start + shard_size, page_count))
+                       for start in range(0, page_count, shard_size)])
+        pending = deque()
+
+        def submit_next():
+            shard = next(shards, None)
+            if shard:
+                pending.append(
+                    (shard[0], executor.submit(extract_pdf_pages, path, *shard)))
+
+        for _ in range(settings.pdf_max_workers_per_document):
+            submit_next()
+
+        logger.info(
+            f"Extracting {page_count} PDF pages in ranges of {shard_size} on the process pool")
         try:
-            # Try UTF-8 first
-            return file_content.decode('utf-8')
-        except UnicodeDecodeError:
-            # Fallback to latin-1
-            return file_content.decode('latin-1')
-
-    def _extract_from_csv(self, file_content: bytes) -> str:
-        """Extract text from CSV file."""
-        csv_text = self._extract_from_txt(file_content)
+            while pending:
+                start, future = pending.popleft()
+                page_texts = future.result()
+                submit_next()
+                for offset, page_text in enumerate(page_texts):
+                    yield start + offset + 1, page_text
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def _extract_from_docx(self, source: DocumentSource) -> Iterator[str]:
+        """Extract text from DOCX file, one paragraph at a time."""
+        with self._open_source(source) as docx_file:
+            doc = Document(docx_file)
+
+        yield from self._join(
+            (para.text if para.text.strip() else "" for para in doc.paragraphs),
+            "\n\n"
+        )
 
-        # Convert CSV to readable text format
-        lines = csv_text.split('\n')
-        formatted_lines = []
+    @staticmethod
+    def _detect_encoding(file_handle: BinaryIO) -> str:
+        """
+        Pick UTF-8 if the whole file decodes as UTF-8, else latin-1.
 
-        for i, line in enumerate(lines):
-            if i == 0:
-                formatted_lines.append(f"Headers: {line}")
-            elif line.strip():
-                formatted_lines.append(f"Row {i}: {line}")
+        Decodes block by block and discards the output, so the file is
+        never held in memory.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            while True:
+                block = file_handle.read(ENCODING_PROBE_BYTES)
+                if not block:
+                    decoder.decode(b"", final=True)
+                    return 'utf-8'
+                decoder.decode(block)
+        except UnicodeDecodeError:
+            return 'latin-1'
+        finally:
+            file_handle.seek(0)
 
-        return "\n".join(formatted_lines)
+    @contextmanager
+    def _open_text(self, source: DocumentSource, newline: str = '\n') -> Iterator[io.TextIOWrapper]:
+        """
+        Open a document source as text (UTF-8, falling back to latin-1).
 
-    def _extract_from_xlsx(self, file_content: bytes) -> str:
-        """Extract text from XLSX file."""
-        xlsx_file = io.BytesIO(file_content)
-        workbook = load_workbook(xlsx_file, read_only=True)
+        By default only "\n" ends a line and line endings are kept as they
+        are; pass newline='' for the csv module.
+        """
+        with self._open_source(source) as file_handle:
+            encoding = self._detect_encoding(file_handle)
+            text_file = io.TextIOWrapper(file_handle, encoding=encoding, newline=newline)
+            try:
+                yield text_file
+            finally:
+                text_file.detach()
+
+    def _extract_from_txt(self, source: DocumentSource) -> Iterator[str]:
+        """Extract text from TXT file in fixed-size segments."""
+        with self._open_text(source) as text_file:
+            while True:
+                segment = text_file.read(TEXT_SEGMENT_CHARS)
+                if not segment:
+                    break
+                yield segment
+
+    def _extract_from_csv(self, source: DocumentSource) -> Iterator[str]:
+        """Extract text from CSV file, one record at a time."""
+        for i, cells in self._iter_csv_rows(source):
+            if i == 0:
+                yield f"Headers: {' | '.join(cells)}"
+            elif any(cell.strip() for cell in cells):
+                yield f"\nRow {i}: {' | '.join(cells)}"
 
-        text = []
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text.append(f"[Sheet: {sheet_name}]")
+    def _iter_csv_rows(self, source: DocumentSource) -> TableRows:
+        """
+        Yield (record number, cells) for each CSV record, the header being 0.
 
-            for row_idx, row in enumerate(sheet.iter_rows(values_only=True), 1):
-                row_text = " | ".join(
-                    [str(cell) if cell is not None else "" for cell in row])
-                if row_text.strip():
-                    text.append(f"Row {row_idx}: {row_text}")
+        Records are parsed with the csv module, so quoted delimiters and
+        newlines stay inside their cell. The delimiter is detected from the
+        start of the file. Cells may be as large as an upload.
 
-        return "\n".join(text)
+        Raises:
+            ValueError: If the file is not valid CSV
+        """
+        if csv.field_size_limit() < settings.max_file_size_bytes:
+            csv.field_size_limit(settings.max_file_size_bytes)
+
+        with self._open_text(source, newline='') as text_file:
+            sample = text_file.read(CSV_SNIFF_CHARS)
+            text_file.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel
+
+            reader = csv.reader(text_file, dialect)
+            try:
+                for i, cells in enumerate(reader):
+                    yield i, cells
+            except csv.Error as e:
+                raise ValueError(f"Invalid CSV at line {reader.line_num}: {str(e)}") from e
+
+    def _extract_from_xlsx(self, source: DocumentSource) -> Iterator[str]:
+        """Extract text from XLSX file, one row at a time."""
+        lines = (
+            line
+            for sheet_name, rows in self._iter_xlsx_tables(source)
+            for line in itertools.chain(
+                [f"[Sheet: {sheet_name}]"],
+                (f"Row {row_idx}: {' | '.join(cells)}"
+                 for row_idx, cells in rows if any(cell.strip() for cell in cells))
+            )
+        )
+        yield from self._join(lines, "\n")
+
+    def _iter_xlsx_tables(self, source: DocumentSource) -> Iterator[Tuple[str, TableRows]]:
+        """Yield (sheet name, rows) for each sheet, streaming rows in read-only mode."""
+        with self._open_source(source) as xlsx_file:
+            workbook = load_workbook(xlsx_file, read_only=True)
+
+            try:
+                for sheet_name in workbook.sheetnames:
+                    yield sheet_name, self._iter_sheet_rows(workbook[sheet_name])
+            finally:
+                workbook.close()
+
+    @staticmethod
+    def _iter_sheet_rows(sheet) -> TableRows:
+        """Yield (row number, cells) for a worksheet, without trailing empty cells."""
+        for row_idx, row in enumerate(sheet.iter_rows(values_only=True), 1):
+            cells = [str(cell) if cell is not None else "" for cell in row]
+            while cells and not cells[-1]:
+                cells.pop()
+            yield row_idx, cells
+
+    def _iter_table_chunks(self, source: DocumentSource, file_type: str, metadata: dict = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Chunk a CSV or XLSX file by rows.
+
+        Each chunk holds up to settings.tabular_rows_per_chunk rows (fewer
+        if they would exceed settings.tabular_chunk_max_chars) under a copy
+        of its sheet's header row, so every chunk is readable on its own.
+        A row longer than settings.tabular_chunk_max_chars is split with the
+        text splitter into chunks of its own, each under the header.
+        Rows are streamed and no full-text string is built.
+
+        Yields:
+            (chunk_text, chunk_metadata) tuples; metadata adds row_start,
+            row_end and, for workbooks, sheet
+        """
+        if file_type == 'csv':
+            tables: Iterable[Tuple[Optional[str], TableRows]] = [
+                (None, self._iter_csv_rows(source))]
+        else:
+            tables = self._iter_xlsx_tables(source)
+
+        index = 0
+        for sheet_name, rows in tables:
+            header = None
+            group: List[Tuple[int, str]] = []
+            size = 0
+
+            for row_number, cells in rows:
+                if not any(cell.strip() for cell in cells):
+                    continue
+                if header is None:
+                    header = f"Headers: {' | '.join(cells)}"
+                    if sheet_name is not None:
+                        header = f"[Sheet: {sheet_name}]\n{header}"
+                    continue
+
+                line = f"Row {row_number}: {' | '.join(cells)}"
+                if len(line) > settings.tabular_chunk_max_chars:
+                    if group:
+                        yield self._build_table_chunk(header, group, sheet_name, metadata, index)
+                        index += 1
+                        group, size = [], 0
+                    for part in self.text_splitter.split_text(' | '.join(cells)):
+                        yield self._build_table_chunk(
+                            header, [(row_number, f"Row {row_number}: {part}")],
+                            sheet_name, metadata, index)
+                        index += 1
+                    continue
+
+                if group and (len(group) >= settings.tabular_rows_per_chunk or
+                              size + len(line) > settings.tabular_chunk_max_chars):
+                    yield self._build_table_chunk(header, group, sheet_name, metadata, index)
+                    index += 1
+                    group, size = [], 0
+
+                group.append((row_number, line))
+                size += len(line) + 1
+
+            # A sheet with only a header row still describes its columns
+            if group or header is not None:
+                yield self._build_table_chunk(header, group, sheet_name, metadata, index)
+                index += 1
+
+        logger.info(f"Split table into {index} chunks")
+
+    @staticmethod
+    def _build_table_chunk(
+        header: str,
+        group: List[Tuple[int, str]],
+        sheet_name: Optional[str],
+        metadata: Optional[dict],
+        index: int
+    ) -> Tuple[str, dict]:
+        """Build one tabular chunk from the header and a group of (row number, line)."""
+        chunk_metadata = metadata.copy() if metadata else {}
+        chunk_metadata["chunk_index"] = index
+        if group:
+            chunk_metadata["row_start"] = group[0][0]
+            chunk_metadata["row_end"] = group[-1][0]
+        if sheet_name is not None:
+            chunk_metadata["sheet"] = sheet_name
+
+        text = "\n".join([header, *(line for _, line in group)])
+        return text, chunk_metadata
 
     def chunk_text(self, text: str, metadata: dict = None) -> List[Tuple[str, dict]]:
         """
@@ -137,24 +527,78 @@ class DocumentProcessor:
 
         chunks = self.text_splitter.split_text(text)
 
-        chunked_data = []
-        for idx, chunk in enumerate(chunks):
-            chunk_metadata = metadata.copy() if metadata else {}
-            chunk_metadata.update({
-                "chunk_index": idx,
-                "chunk_total": len(chunks)
-            })
-            chunked_data.append((chunk, chunk_metadata))
+        metadata = metadata or {}
+        chunked_data = [
+            (chunk, {**metadata, "chunk_index": idx, "chunk_total": len(chunks)})
+            for idx, chunk in enumerate(chunks)
+        ]
 
         logger.info(f"Split document into {len(chunks)} chunks")
         return chunked_data
 
-    def process_document(self, file_content: bytes, file_type: str, metadata: dict = None) -> List[Tuple[str, dict]]:
+    def iter_chunks(self, segments: Iterable[str], metadata: dict = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Split a stream of text segments into chunks with metadata.
+
+        Segments are buffered until STREAM_BUFFER_CHARS, then split. The last
+        chunk of each split is held back and re-split with the following
+        text, so chunks can span segment boundaries. Every chunk respects
+        chunk_size and chunk_overlap, but near those boundaries chunks may
+        break at different points than splitting the joined text at once
+        would. Since the total is unknown while streaming, chunk metadata
+        carries chunk_index only.
+
+        Args:
+            segments: Text segments in document order
+            metadata: Base metadata to include with each chunk
+
+        Yields:
+            (chunk_text, chunk_metadata) tuples
+        """
+        buffer = ""
+        index = 0
+        metadata = metadata or {}
+
+        def emit(spans: List[Tuple[int, int]]) -> Iterator[Tuple[str, dict]]:
+            nonlocal index
+            for start, end in spans:
+                yield buffer[start:end], {**metadata, "chunk_index": index}
+                index += 1
+
+        for segment in segments:
+            buffer += segment
+            if len(buffer) < STREAM_BUFFER_CHARS:
+                continue
+
+            # Split up to the last separator so the buffer does not end in a
+            # partial paragraph (or line, or word)
+            cut = self._last_separator(buffer)
+            if cut <= 0:
+                continue
+            spans = self.text_splitter.split_spans(buffer, 0, cut)
+            if len(spans) < 2 or spans[-1][0] <= 0:
+                continue
+            yield from emit(spans[:-1])
+            buffer = buffer[spans[-1][0]:]
+
+        if buffer.strip():
+            yield from emit(self.text_splitter.split_spans(buffer))
+
+        logger.info(f"Split document into {index} chunks")
+
+    def _last_separator(self, text: str) -> int:
+        """Position of the last occurrence of the highest-priority separator in the text."""
+        for separator in self.text_splitter.separators:
+            if separator and separator in text:
+                return text.rfind(separator)
+        return -1
+
+    def process_document(self, source: DocumentSource, file_type: str, metadata: dict = None) -> List[Tuple[str, dict]]:
         """
         Orchestrate full document processing: extraction and chunking.
 
         Args:
-            file_content: File content as bytes
+            source: File content as bytes, a local file path or a binary file handle
             file_type: File extension
             metadata: Metadata to include with chunks
 
@@ -162,7 +606,7 @@ class DocumentProcessor:
             List of (chunk_text, chunk_metadata) tuples
         """
         # Extract text
-        text = self.extract_text(file_content, file_type)
+        text = self.extract_text(source, file_type)
 
         if not text.strip():
             raise ValueError("No text could be extracted from the document")
@@ -172,6 +616,38 @@ class DocumentProcessor:
 
         return chunks
 
+    def iter_document_chunks(self, source: DocumentSource, file_type: str, metadata: dict = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Stream a document's chunks: extraction feeds the chunker segment by segment.
+
+        CSV and XLSX files are chunked by rows instead when tabular chunking
+        is enabled (see _iter_table_chunks).
+
+        Args:
+            source: File content as bytes, a local file path or a binary file handle
+            file_type: File extension
+            metadata: Metadata to include with chunks
+
+        Yields:
+            (chunk_text, chunk_metadata) tuples
+
+        Raises:
+            ValueError: If no text could be extracted
+        """
+        file_type = file_type.lower().replace('.', '')
+        if settings.tabular_chunking_enabled and file_type in TABULAR_FILE_TYPES:
+            chunks = self._iter_table_chunks(source, file_type, metadata)
+        else:
+            chunks = self.iter_chunks(self.iter_text(source, file_type), metadata)
+
+        empty = True
+        for chunk in chunks:
+            empty = False
+            yield chunk
+
+        if empty:
+            raise ValueError("No text could be extracted from the document")
+
 
 def get_document_processor() -> DocumentProcessor:
     """Get DocumentProcessor instance."""
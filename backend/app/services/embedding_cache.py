@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Keys per SQL statement (stays under SQLite's bound parameter limit)
+LOOKUP_BATCH_SIZE = 500
+
+# Eviction trims the cache to this fraction of the entry limit so it does not
+# run on every insert once the cache is full
+EVICTION_TARGET_RATIO = 0.9
+
+
+class EmbeddingCache:
+    """Persistent LRU cache of chunk embeddings stored in SQLite."""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or settings.embedding_cache_path
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        self._entries = self._connection.execute(
+            "SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database and create its table."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL"
+            ") WITHOUT ROWID")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        connection.commit()
+        logger.info(f"Opened embedding cache at {self.path}")
+        return connection
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize chunk text so whitespace-only differences share a key."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def make_key(cls, namespace: str, text: str) -> str:
+        """
+        Build the cache key of a chunk.
+
+        Args:
+            namespace: Identifies the model and its settings (see EmbeddingService.cache_namespace)
+            text: Chunk text
+
+        Returns:
+            SHA-256 hex digest of the namespace and normalized text
+        """
+        hasher = hashlib.sha256(namespace.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(cls.normalize(text).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up cached vectors and mark them as recently used.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Dict mapping each cached key to its float32 vector
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._connection.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """
+        Store vectors, evicting least recently used entries beyond the limit.
+
+        Args:
+            items: Dict mapping cache key to vector
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in items.items()]
+
+        with self._lock:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+            self._entries += max(cursor.rowcount, 0)
+
+            if self._entries > self.max_entries:
+                excess = self._entries - \
+                    int(self.max_entries * EVICTION_TARGET_RATIO)
+                cursor = self._connection.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._entries -= cursor.rowcount
+                self.evictions += cursor.rowcount
+                logger.info(
+                    f"Evicted {cursor.rowcount} entries from the embedding cache")
+
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit/miss/eviction counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close the cache database."""
+        with self._lock:
+            self._connection.close()
+
+
+# Singleton instance
+_embedding_cache = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get or create the EmbeddingCache instance (None when disabled)."""
+    global _embedding_cache
+    if not settings.embedding_cache_enabled:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,160 @@
+import logging
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Encoding, Tokenizer
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Same artifacts Chroma's default embedding function (ONNXMiniLM_L6_V2) uses
+DEFAULT_MODEL_DIR = Path.home() / ".cache" / "chroma" / \
+    "onnx_models" / "all-MiniLM-L6-v2" / "onnx"
+
+
+class EmbeddingService:
+    """Service for computing text embeddings locally with ONNX Runtime."""
+
+    model_id = "all-MiniLM-L6-v2"
+
+    def __init__(self):
+        self.model_dir = Path(
+            settings.embedding_model_path) if settings.embedding_model_path else DEFAULT_MODEL_DIR
+        self._ensure_model()
+        self.tokenizer = self._load_tokenizer()
+        self.session = self._load_session()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # Identifies vectors produced by this model and settings in the embedding cache
+        self.cache_namespace = f"{self.model_id}:{self.model_dir}:{settings.embedding_max_tokens}"
+
+    def _ensure_model(self):
+        """Download the default model through Chroma if it is not cached yet."""
+        if (self.model_dir / "model.onnx").exists() and (self.model_dir / "tokenizer.json").exists():
+            return
+
+        if settings.embedding_model_path:
+            raise FileNotFoundError(
+                f"Embedding model not found in {self.model_dir}")
+
+        from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+        logger.info("Downloading embedding model")
+        ONNXMiniLM_L6_V2()._download_model_if_not_exists()
+
+    def _load_tokenizer(self) -> Tokenizer:
+        """Load the tokenizer (batches are padded in _forward)."""
+        tokenizer = Tokenizer.from_file(
+            os.path.join(self.model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=settings.embedding_max_tokens)
+        tokenizer.no_padding()
+        return tokenizer
+
+    def _load_session(self) -> ort.InferenceSession:
+        """Create the ONNX Runtime inference session."""
+        session_options = ort.SessionOptions()
+        session_options.log_severity_level = 3
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.embedding_num_threads > 0:
+            session_options.intra_op_num_threads = settings.embedding_num_threads
+
+        session = ort.InferenceSession(
+            os.path.join(self.model_dir, "model.onnx"),
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"]
+        )
+        logger.info(f"Loaded embedding model from {self.model_dir}")
+        return session
+
+    def _forward(self, encodings: List[Encoding]) -> np.ndarray:
+        """Run one batch through the model and mean-pool to normalized vectors."""
+        max_length = max(len(e.ids) for e in encodings)
+        input_ids = np.zeros((len(encodings), max_length), dtype=np.int64)
+        attention_mask = np.zeros_like(input_ids)
+
+        # Pad to the longest sequence in this batch only
+        for row, encoding in enumerate(encodings):
+            length = len(encoding.ids)
+            input_ids[row, :length] = encoding.ids
+            attention_mask[row, :length] = encoding.attention_mask
+
+        model_inputs = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask
+        }
+        if "token_type_ids" in self.input_names:
+            model_inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        last_hidden_state = self.session.run(None, model_inputs)[0]
+
+        # Mean pooling over non-padding tokens
+        mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+        summed = (last_hidden_state * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), a_min=1e-9, a_max=None)
+        embeddings = summed / counts
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-12
+        return (embeddings / norms).astype(np.float32)
+
+    def embed(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Embed a list of texts.
+
+        Texts are tokenized up front and sorted by token length so each batch
+        holds similarly sized inputs and padding waste stays small.
+
+        Args:
+            texts: Texts to embed
+            batch_size: Number of texts per model call (defaults to settings)
+
+        Returns:
+            float32 matrix of shape (len(texts), dim), in input order
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        batch_size = batch_size or settings.embedding_batch_size
+        encodings = self.tokenizer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+
+        embeddings = None
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch_embeddings = self._forward(
+                [encodings[i] for i in batch_indices])
+
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch_indices] = batch_embeddings
+
+        return embeddings
+
+    def embed_query(self, query_text: str) -> np.ndarray:
+        """
+        Embed a single query.
+
+        Args:
+            query_text: Query text
+
+        Returns:
+            float32 vector of shape (dim,)
+        """
+        return self._forward([self.tokenizer.encode(query_text)])[0]
+
+
+# Singleton instance
+_embedding_service = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Get or create EmbeddingService instance."""
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
@@ -1,19 +1,45 @@
+import contextlib
+import hashlib
+import itertools
 import logging
-from typing import List
+import threading
+import zipfile
+from collections import deque
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.orm import Session
 import uuid
 import mimetypes
+import os
 
 from app.models.file import File
 from app.services.backblaze_service import get_backblaze_service
-from app.services.document_processor import get_document_processor
+from app.services.document_processor import ChunkTokenStats, get_document_processor
 from app.services.chroma_service import get_chroma_service
+from app.services.concurrency import get_io_executor, pipeline_stage, submit_cpu_bound
+from app.services.ingestion_service import get_ingestion_service
+from app.services.query_cache import get_query_cache
+from app.services.lexical_index import get_lexical_index
+from app.services.warm_index import get_warm_index
 from app.config.settings import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Uploads are streamed to the spool file in blocks of this size
+SPOOL_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Stored chunks fetched, and stale chunks deleted, per round trip when
+# replacing a file's content
+REPLACE_LOAD_BATCH_SIZE = 500
+REPLACE_DELETE_BATCH_SIZE = 500
+
+# Taking a reference to a shared B2 object and deleting its last reference
+# are serialized by a lock picked from this many by object ID
+B2_OBJECT_LOCK_STRIPES = 64
+
 
 class FileService:
     """Service for orchestrating file operations across multiple services."""
@@ -22,17 +48,20 @@ class FileService:
         self.backblaze = get_backblaze_service()
         self.doc_processor = get_document_processor()
         self.chroma = get_chroma_service()
+        self._b2_object_locks = [threading.Lock() for _ in range(B2_OBJECT_LOCK_STRIPES)]
+
+    def _b2_object_lock(self, backblaze_file_id: str) -> threading.Lock:
+        """Get the lock guarding references to a B2 object."""
+        return self._b2_object_locks[hash(backblaze_file_id) % B2_OBJECT_LOCK_STRIPES]
 
     def upload_file(self, upload_file: UploadFile, db: Session, user_id: int) -> File:
         """
-        Upload file and process it through the complete pipeline.
+        Accept an upload and queue it for background processing.
 
-        Pipeline:
-        1. Validate file
-        2. Upload to Backblaze B2
-        3. Extract text and chunk
-        4. Store in ChromaDB
-        5. Save metadata to database
+        The file is validated, streamed to a local spool file (its only copy)
+        while its SHA-256 is computed, and recorded with is_processed=False;
+        an ingestion worker then runs process_file, which reads from the
+        spool file instead of memory.
 
         Args:
             upload_file: FastAPI UploadFile object
@@ -40,109 +69,963 @@ class FileService:
             user_id: ID of the user uploading the file
 
         Returns:
-            File model instance
+            File model instance (processing_status "queued")
         """
-        backblaze_file_id = None
-        collection_name = None
+        self._validate_file(upload_file)
+        return self._accept_upload(
+            db, user_id, upload_file.filename, upload_file.file, upload_file.content_type)
 
-        try:
-            # Step 1: Validate file
-            self._validate_file(upload_file)
+    def upload_files(self, upload_files: List[UploadFile], db: Session, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Accept a batch of uploads, expanding zip archives into their files.
+
+        Every file is validated and queued on its own, so one bad file does
+        not reject the batch; queued files are processed by the ingestion
+        workers, whose stages overlap across files. At most
+        settings.batch_upload_max_files files are accepted.
+
+        Args:
+            upload_files: FastAPI UploadFile objects (documents or .zip archives)
+            db: Database session
+            user_id: ID of the user uploading the files
+
+        Returns:
+            Manifest with one dict per file (filename, status "queued" or
+            "rejected", file_id, error), archive members named
+            "<archive>/<path>"
+        """
+        manifest: List[Dict[str, Any]] = []
+        queued = 0
+
+        def accept(label: str, original_name: str, size: int, open_source, content_type: str = None):
+            nonlocal queued
+            entry = {"filename": label, "status": "rejected", "file_id": None, "error": None}
+            manifest.append(entry)
+            if queued >= settings.batch_upload_max_files:
+                entry["error"] = f"Batch limit of {settings.batch_upload_max_files} files reached"
+                return
+            try:
+                self._validate_name(original_name)
+                self._validate_size(size)
+                with open_source() as source:
+                    file_record = self._accept_upload(
+                        db, user_id, original_name, source, content_type,
+                        max_bytes=settings.max_file_size_bytes)
+                entry["status"] = "queued"
+                entry["file_id"] = file_record.id
+                queued += 1
+            except HTTPException as e:
+                entry["error"] = e.detail
+
+        for upload_file in upload_files:
+            if not upload_file.filename.lower().endswith(".zip"):
+                upload_file.file.seek(0, 2)
+                size = upload_file.file.tell()
+                accept(upload_file.filename, upload_file.filename, size,
+                       lambda: contextlib.nullcontext(upload_file.file), upload_file.content_type)
+                continue
 
-            # Read file content
-            file_content = upload_file.file.read()
-            upload_file.file.seek(0)  # Reset file pointer
+            try:
+                archive = zipfile.ZipFile(upload_file.file)
+            except zipfile.BadZipFile:
+                manifest.append({"filename": upload_file.filename, "status": "rejected",
+                                 "file_id": None, "error": "Not a valid zip archive"})
+                continue
+
+            with archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    # Skip directories and OS metadata (__MACOSX/, .DS_Store)
+                    if info.is_dir() or not name or name.startswith(".") or \
+                            info.filename.startswith("__MACOSX/"):
+                        continue
+                    accept(f"{upload_file.filename}/{info.filename}", name, info.file_size,
+                           lambda: archive.open(info))
+
+        logger.info(
+            f"Accepted {queued} of {len(manifest)} files in batch upload for user {user_id}")
+        return manifest
+
+    def _accept_upload(
+        self,
+        db: Session,
+        user_id: int,
+        original_name: str,
+        source: BinaryIO,
+        content_type: str = None,
+        max_bytes: int = None
+    ) -> File:
+        """
+        Spool a validated upload, record it and queue it for processing.
+
+        Args:
+            db: Database session
+            user_id: ID of the user uploading the file
+            original_name: Name of the uploaded file
+            source: Binary stream of the content
+            content_type: MIME type (guessed from the name if not given)
+            max_bytes: Reject the content once it exceeds this size (for
+                sources whose size is not known up front)
 
+        Returns:
+            File model instance (processing_status "queued")
+        """
+        spool_path = None
+
+        try:
             # Extract file info
-            file_type = upload_file.filename.split('.')[-1].lower()
-            original_name = upload_file.filename
-            file_size = len(file_content)
+            file_type = original_name.split('.')[-1].lower()
 
             # Generate unique filename
             unique_filename = f"{uuid.uuid4()}_{original_name}"
 
             # Determine content type
+            content_type = content_type or mimetypes.guess_type(
+                original_name)[0] or 'application/octet-stream'
+
+            # Spool the upload to disk for the ingestion worker
+            os.makedirs(settings.upload_spool_dir, exist_ok=True)
+            spool_path = os.path.join(
+                settings.upload_spool_dir, unique_filename)
+            content_hash = self._spool_upload(source, spool_path, max_bytes)
+            file_size = os.path.getsize(spool_path)
+            self._validate_size(file_size)
+
+            # Save metadata to database (B2 fields are filled in by the worker)
+            file_record = File(
+                filename=unique_filename,
+                original_name=original_name,
+                file_type=file_type,
+                file_size=file_size,
+                backblaze_url="",
+                backblaze_file_id="",
+                chroma_collection_id=self.chroma.get_collection_name_for_upload(
+                    user_id),
+                is_processed=False,
+                processing_status="queued",
+                content_hash=content_hash,
+                user_id=user_id
+            )
+            db.add(file_record)
+            db.flush()
+
+            get_ingestion_service().enqueue(
+                db, file_record, spool_path, content_type)
+            db.refresh(file_record)
+            self._invalidate_query_cache(user_id)
+
+            logger.info(f"Accepted upload {original_name} as file {file_record.id}")
+            return file_record
+
+        except HTTPException:
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise
+        except Exception as e:
+            logger.error(f"Error accepting file upload: {str(e)}")
+            db.rollback()
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise HTTPException(
+                status_code=500, detail=f"Failed to upload file: {str(e)}")
+
+    def replace_file(self, file_id: int, upload_file: UploadFile, db: Session, user_id: int) -> File:
+        """
+        Accept new content for a processed file and queue its re-ingestion.
+
+        The File row (and so its ID, conversation references and chunk
+        collection) is kept. An ingestion worker runs replace_content, which
+        only embeds chunks whose text changed. The swap is not atomic for
+        vector search: new chunks become searchable batch by batch and
+        removed chunks are deleted only at the end, so queries made while
+        it runs can see both old and new content.
+
+        Args:
+            file_id: Database file ID
+            upload_file: FastAPI UploadFile with the new content (same file type)
+            db: Database session
+            user_id: ID of the user replacing the file
+
+        Returns:
+            File model instance (processing_status "queued", or unchanged
+            if the content is identical)
+        """
+        file_record = self.get_file(file_id, db, user_id)
+        spool_path = None
+
+        try:
+            ingestion_service = get_ingestion_service()
+            if not file_record.is_processed or ingestion_service.has_active_job(db, file_record.id):
+                raise HTTPException(
+                    status_code=409,
+                    detail="File is still being processed, try again once it has completed"
+                )
+
+            self._validate_file(upload_file)
+            original_name = upload_file.filename
+            file_type = original_name.split('.')[-1].lower()
+            if file_type != file_record.file_type:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Replacement must be a {file_record.file_type} file"
+                )
+
             content_type = upload_file.content_type or mimetypes.guess_type(
                 original_name)[0] or 'application/octet-stream'
 
-            # Step 2: Upload to Backblaze B2
-            logger.info(f"Uploading file to B2: {unique_filename}")
-            backblaze_url, backblaze_file_id = self.backblaze.upload_file_to_b2(
-                file_content=file_content,
-                file_name=unique_filename,
-                content_type=content_type
+            os.makedirs(settings.upload_spool_dir, exist_ok=True)
+            spool_path = os.path.join(
+                settings.upload_spool_dir, f"{uuid.uuid4()}_{original_name}")
+            content_hash = self._spool_upload(upload_file.file, spool_path)
+
+            if content_hash == file_record.content_hash:
+                os.remove(spool_path)
+                logger.info(f"Replacement of file {file_record.id} is identical, nothing to do")
+                return file_record
+
+            file_record.processing_status = "queued"
+            ingestion_service.enqueue(
+                db, file_record, spool_path, content_type,
+                operation="replace",
+                original_name=original_name,
+                content_hash=content_hash
             )
+            db.refresh(file_record)
 
-            # Step 3: Process document (extract and chunk text)
-            logger.info(f"Processing document: {unique_filename}")
-            metadata = {
-                "filename": original_name,
-                "file_type": file_type,
-                "file_size": file_size
-            }
+            logger.info(f"Accepted replacement {original_name} for file {file_record.id}")
+            return file_record
 
-            chunks = self.doc_processor.process_document(
-                file_content=file_content,
-                file_type=file_type,
-                metadata=metadata
+        except HTTPException:
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise
+        except Exception as e:
+            logger.error(f"Error accepting file replacement: {str(e)}")
+            db.rollback()
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise HTTPException(
+                status_code=500, detail=f"Failed to replace file: {str(e)}")
+
+    def _spool_upload(self, source: BinaryIO, spool_path: str, max_bytes: int = None) -> str:
+        """
+        Copy an upload to the spool file and return its SHA-256 hex digest.
+
+        Raises:
+            HTTPException if the content exceeds max_bytes
+        """
+        hasher = hashlib.sha256()
+        if source.seekable():
+            source.seek(0)
+        size = 0
+        with open(spool_path, 'wb') as spool_file:
+            while True:
+                block = source.read(SPOOL_COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large. Maximum size: {settings.max_file_size_mb}MB"
+                    )
+                hasher.update(block)
+                spool_file.write(block)
+        return hasher.hexdigest()
+
+    def find_duplicate(self, db: Session, file_record: File) -> Optional[File]:
+        """
+        Find a processed file with the same content and type.
+
+        Any user's file qualifies: only its B2 object and chunk vectors are
+        reused, never its database row.
+
+        Args:
+            db: Database session
+            file_record: File looking for a duplicate
+
+        Returns:
+            Oldest matching File, or None
+        """
+        if not file_record.content_hash:
+            return None
+        return db.query(File).filter(
+            File.content_hash == file_record.content_hash,
+            File.file_type == file_record.file_type,
+            File.is_processed == True,
+            File.backblaze_file_id != "",
+            File.id != file_record.id
+        ).order_by(File.id).first()
+
+    def process_file(
+        self,
+        file_id: int,
+        db: Session,
+        spool_path: str,
+        content_type: str = None,
+        is_retry: bool = False
+    ) -> File:
+        """
+        Process a queued upload through the complete pipeline.
+
+        Pipeline (stages overlap, each bounded by pipeline_stage):
+        1. Stream the spooled file to Backblaze B2 on the I/O pool, alongside
+           the following steps (skipped on retry if already uploaded)
+        2. Extract text and chunk it as a stream, the next batch while the
+           current one is embedded and stored
+        3. Embed and store in ChromaDB (tagged with the file ID) in batches of
+           settings.ingestion_batch_size chunks as they are produced
+
+        If a processed file with the same content hash exists, its B2 object
+        is shared and its chunk vectors are copied instead (see _reuse_duplicate).
+
+        Each stage is recorded in File.processing_status. Safe to retry: chunks
+        left by a failed attempt are removed before storing.
+
+        Args:
+            file_id: Database file ID
+            db: Database session
+            spool_path: Local path of the uploaded content
+            content_type: MIME type of the file
+            is_retry: Whether an earlier attempt may have left chunks behind
+
+        Returns:
+            File model instance
+        """
+        file_record = db.query(File).filter(File.id == file_id).first()
+        if not file_record:
+            raise ValueError(f"File {file_id} no longer exists")
+
+        duplicate = self.find_duplicate(db, file_record)
+        if duplicate and self._reuse_duplicate(db, file_record, duplicate, is_retry):
+            return file_record
+
+        # Step 1: Upload to Backblaze B2 while the document is processed
+        upload = None
+        if not file_record.backblaze_file_id:
+            upload = get_io_executor().submit(
+                self._upload_to_b2, spool_path, file_record.filename, content_type)
+
+        try:
+            self._ingest_chunks(db, file_record, spool_path, is_retry)
+        except Exception:
+            # Keep a finished upload so a retry does not repeat it and a
+            # permanent failure releases it
+            if upload is not None:
+                try:
+                    db.rollback()
+                    self._record_upload(db, file_record, upload)
+                except Exception:
+                    pass
+            raise
+
+        if upload is not None:
+            self._record_upload(db, file_record, upload)
+        self._mark_completed(db, file_record)
+
+        logger.info(
+            f"Successfully processed file: {file_record.original_name}")
+        return file_record
+
+    def _ingest_chunks(self, db: Session, file_record: File, spool_path: str, is_retry: bool):
+        """Extract, chunk, embed and store a file's content (steps 2 and 3 of process_file)."""
+        # Step 2: Process document (extract and chunk text)
+        self._set_status(db, file_record, "extracting")
+        logger.info(f"Processing document: {file_record.filename}")
+        metadata = {
+            "filename": file_record.original_name,
+            "file_type": file_record.file_type,
+            "file_size": file_record.file_size,
+            "file_id": file_record.id
+        }
+
+        chunks = self.doc_processor.iter_document_chunks(
+            source=spool_path,
+            file_type=file_record.file_type,
+            metadata=metadata
+        )
+
+        # Remove chunks left behind by an earlier failed attempt
+        if is_retry:
+            try:
+                self._delete_chunks(file_record)
+            except Exception:
+                pass
+
+        # Step 3: Embed and store in ChromaDB batch by batch as chunks are extracted
+        collection_name = file_record.chroma_collection_id
+        logger.info(f"Storing in ChromaDB collection: {collection_name}")
+        stored = 0
+        token_stats = ChunkTokenStats()
+
+        for batch in self._iter_chunk_batches(chunks, token_stats):
+            if not stored:
+                self._set_status(db, file_record, "embedding")
+
+            self._store_chunks(file_record, collection_name, batch)
+            stored += len(batch)
+
+        logger.info(f"Stored {stored} chunks of file {file_record.id}")
+        self._record_chunk_stats(file_record, stored, token_stats)
+
+    def _upload_to_b2(self, spool_path: str, file_name: str, content_type: str = None) -> Tuple[str, str]:
+        """
+        Upload spooled content to B2 within the upload stage's concurrency limit.
+
+        Returns:
+            Tuple of (url, backblaze_file_id)
+        """
+        with pipeline_stage("upload"):
+            logger.info(f"Uploading file to B2: {file_name}")
+            return self.backblaze.upload_local_file_to_b2(
+                file_path=spool_path,
+                file_name=file_name,
+                content_type=content_type or 'application/octet-stream'
+            )
+
+    @staticmethod
+    def _record_upload(db: Session, file_record: File, upload: Future):
+        """Wait for a file's concurrent B2 upload and save its location."""
+        backblaze_url, backblaze_file_id = upload.result()
+        file_record.backblaze_url = backblaze_url
+        file_record.backblaze_file_id = backblaze_file_id
+        file_record.backblaze_file_name = file_record.filename
+        db.commit()
+
+    def replace_content(
+        self,
+        file_id: int,
+        db: Session,
+        spool_path: str,
+        content_type: str = None,
+        original_name: str = None,
+        content_hash: str = None
+    ) -> File:
+        """
+        Re-ingest a processed file from new content, embedding only changed chunks.
+
+        The new content is chunked as a stream and each chunk's hash is
+        matched against the file's stored chunks:
+        1. Chunks with a stored twin keep their ID and vector (only their
+           metadata is updated if it changed, e.g. a shifted chunk_index)
+        2. New chunks are embedded and added
+        3. Stored chunks left unmatched are deleted
+        The new content is then uploaded to B2 and the File row switched to
+        it. Retrying after a failure is safe: chunks added by the failed
+        attempt are matched like any other stored chunk.
+
+        Args:
+            file_id: Database file ID
+            db: Database session
+            spool_path: Local path of the new content
+            content_type: MIME type of the new content
+            original_name: Name of the new content (defaults to the current name)
+            content_hash: SHA-256 of the new content
+
+        Returns:
+            File model instance
+        """
+        file_record = db.query(File).filter(File.id == file_id).first()
+        if not file_record:
+            raise ValueError(f"File {file_id} no longer exists")
+
+        original_name = original_name or file_record.original_name
+        collection_name = file_record.chroma_collection_id
+
+        self._set_status(db, file_record, "extracting")
+        logger.info(f"Replacing content of file {file_record.id} with {original_name}")
+
+        # Stored chunks by hash; duplicates of a text are matched in order
+        stored_chunks = self._load_stored_chunks(file_record)
+        metadata = {
+            "filename": original_name,
+            "file_type": file_record.file_type,
+            "file_size": os.path.getsize(spool_path),
+            "file_id": file_record.id
+        }
+        chunks = self.doc_processor.iter_document_chunks(
+            source=spool_path,
+            file_type=file_record.file_type,
+            metadata=metadata
+        )
+
+        # The lexical index is rebuilt from the new chunks (nothing to embed
+        # there): they are staged, then swapped in once the stale chunks are
+        # gone, so a failed replacement leaves the current entries searchable
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.discard_staged(file_record.id)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to discard staged lexical chunks of file {file_record.id}: {str(e)}")
+
+        total = added = updated = 0
+        token_stats = ChunkTokenStats()
+
+        for batch in self._iter_chunk_batches(chunks, token_stats):
+            if not total:
+                self._set_status(db, file_record, "embedding")
+
+            ids, new_chunks, changed_ids, changed_metadatas = [], [], [], []
+            for text, chunk_metadata in batch:
+                matches = stored_chunks.get(chunk_metadata["chunk_hash"])
+                if matches:
+                    chunk_id, stored_metadata = matches.popleft()
+                    if stored_metadata != chunk_metadata:
+                        changed_ids.append(chunk_id)
+                        changed_metadatas.append(chunk_metadata)
+                else:
+                    chunk_id = str(uuid.uuid4())
+                    new_chunks.append((chunk_id, text, chunk_metadata))
+                ids.append(chunk_id)
+
+            if new_chunks:
+                self._add_to_vector_store(
+                    collection_name,
+                    [text for _, text, _ in new_chunks],
+                    [chunk_metadata for _, _, chunk_metadata in new_chunks],
+                    [chunk_id for chunk_id, _, _ in new_chunks]
+                )
+            with pipeline_stage("store"):
+                if changed_ids:
+                    self.chroma.update_metadatas(collection_name, changed_ids, changed_metadatas)
+                self._index_lexical(
+                    file_record, collection_name,
+                    [text for text, _ in batch], [chunk_metadata for _, chunk_metadata in batch], ids,
+                    staged=True)
+
+            total += len(batch)
+            added += len(new_chunks)
+            updated += len(changed_ids)
+
+        stale_ids = [chunk_id for matches in stored_chunks.values() for chunk_id, _ in matches]
+        for start in range(0, len(stale_ids), REPLACE_DELETE_BATCH_SIZE):
+            self.chroma.delete_documents(
+                collection_name, ids=stale_ids[start:start + REPLACE_DELETE_BATCH_SIZE])
+
+        if lexical_index:
+            try:
+                lexical_index.commit_staged(file_record.id)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to swap in lexical chunks of file {file_record.id}: {str(e)}")
+
+        logger.info(
+            f"Replaced chunks of file {file_record.id}: {total} chunks, {added} embedded, "
+            f"{total - added} reused ({updated} with new metadata), {len(stale_ids)} removed")
+
+        # Upload the new content, then release the old object once nothing points to it
+        previous_object = (file_record.backblaze_file_id, file_record.storage_name)
+        object_name = f"{uuid.uuid4()}_{original_name}"
+        backblaze_url, backblaze_file_id = self._upload_to_b2(
+            spool_path, object_name, content_type)
+
+        file_record.backblaze_url = backblaze_url
+        file_record.backblaze_file_id = backblaze_file_id
+        file_record.backblaze_file_name = object_name
+        file_record.original_name = original_name
+        file_record.file_size = metadata["file_size"]
+        file_record.content_hash = content_hash
+        self._record_chunk_stats(file_record, total, token_stats)
+
+        # Reload the file's vectors in the warm index of its owner
+        warm_index = get_warm_index()
+        if warm_index:
+            warm_index.remove_file(file_record.user_id, file_record.id)
+        self._mark_completed(db, file_record)
+
+        if previous_object[0]:
+            try:
+                self._release_b2_object_id(db, *previous_object)
+            except Exception as e:
+                logger.warning(f"Failed to delete replaced content from B2: {str(e)}")
+
+        logger.info(f"Successfully replaced content of file {file_record.id}")
+        return file_record
+
+    def _load_stored_chunks(self, file_record: File) -> Dict[str, deque]:
+        """
+        Get a file's stored chunks grouped by chunk hash.
+
+        Returns:
+            Dict of chunk hash to a deque of (chunk ID, metadata); chunks
+            stored before chunk hashes existed are hashed from their text
+        """
+        collection_name = file_record.chroma_collection_id
+        where = {"file_id": file_record.id} if self.chroma.is_shared_collection(collection_name) else None
+        stored_chunks: Dict[str, List[Tuple[str, dict]]] = {}
+        offset = 0
+
+        while True:
+            page = self.chroma.get_documents(
+                collection_name,
+                where=where,
+                limit=REPLACE_LOAD_BATCH_SIZE,
+                offset=offset
             )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for chunk_id, document, chunk_metadata in zip(ids, page["documents"], page["metadatas"]):
+                chunk_metadata = chunk_metadata or {}
+                chunk_hash = chunk_metadata.get("chunk_hash") or self._chunk_hash(document or "")
+                stored_chunks.setdefault(chunk_hash, []).append((chunk_id, chunk_metadata))
+            offset += len(ids)
 
-            # Step 4: Store in ChromaDB
-            collection_name = f"file_{uuid.uuid4().hex[:16]}"
-            logger.info(f"Storing in ChromaDB collection: {collection_name}")
+        # Repeated texts are matched in document order
+        return {
+            chunk_hash: deque(sorted(matches, key=lambda match: match[1].get("chunk_index", 0)))
+            for chunk_hash, matches in stored_chunks.items()
+        }
 
-            chunk_texts = [chunk[0] for chunk in chunks]
-            chunk_metadatas = [chunk[1] for chunk in chunks]
+    def fail_replace(self, file_id: int, db: Session, error: str):
+        """
+        Record that replacing a file's content failed permanently.
+
+        The file keeps its current B2 object and lexical index entries, and
+        its old chunks stay searchable alongside any chunks the failed
+        replacement already added or updated; replacing the file again
+        reconciles them.
+        """
+        file_record = db.query(File).filter(File.id == file_id).first()
+        if not file_record:
+            return
+
+        file_record.processing_status = "failed"
+        file_record.processing_error = error
+        db.commit()
+        self._invalidate_query_cache(file_record.user_id)
+
+        # Reloaded from the vector store on the owner's next query
+        warm_index = get_warm_index()
+        if warm_index:
+            warm_index.remove_file(file_record.user_id, file_record.id)
+
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.discard_staged(file_record.id)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to discard staged lexical chunks of file {file_record.id}: {str(e)}")
+
+    def _iter_chunk_batches(
+        self,
+        chunks: Iterator[Tuple[str, dict]],
+        token_stats: ChunkTokenStats
+    ) -> Iterator[List[Tuple[str, dict]]]:
+        """
+        Group a stream of chunks into batches of settings.ingestion_batch_size.
+
+        Extraction, hashing and token counting run on the CPU pool, one
+        batch ahead: the next batch is extracted while the caller embeds
+        and stores the current one. Each chunk's metadata gets its
+        chunk_hash and, if the tokenizer is available, its token_count
+        (recorded in token_stats).
+        """
+        def next_batch() -> Tuple[List[Tuple[str, dict]], Optional[List[int]]]:
+            with pipeline_stage("extract"):
+                batch = list(itertools.islice(chunks, settings.ingestion_batch_size))
+                for text, chunk_metadata in batch:
+                    chunk_metadata["chunk_hash"] = self._chunk_hash(text)
+                return batch, self.doc_processor.count_tokens([text for text, _ in batch])
+
+        pending = submit_cpu_bound(next_batch)
+        try:
+            while True:
+                batch, token_counts = pending.result()
+                if not batch:
+                    return
+                pending = submit_cpu_bound(next_batch)
+
+                if token_counts is not None:
+                    for (_, chunk_metadata), token_count in zip(batch, token_counts):
+                        chunk_metadata["token_count"] = token_count
+                    token_stats.add(token_counts)
+                yield batch
+        finally:
+            # The source must not be released while a prefetch still reads it
+            futures.wait([pending])
+
+    @staticmethod
+    def _chunk_hash(text: str) -> str:
+        """Identify a chunk by its text (SHA-256 hex digest)."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _record_chunk_stats(file_record: File, stored: int, token_stats: ChunkTokenStats):
+        """Save a processed file's chunk count and token statistics."""
+        if token_stats.chunks:
+            logger.info(f"Token statistics of file {file_record.id}: {token_stats}")
+        file_record.chunk_count = stored
+        file_record.token_count = token_stats.tokens if token_stats.chunks else None
+        file_record.max_chunk_tokens = token_stats.max_tokens if token_stats.chunks else None
+        file_record.truncated_chunk_count = token_stats.truncated if token_stats.chunks else None
 
+    def _store_chunks(self, file_record: File, collection_name: str, chunks: List[Tuple[str, dict]]):
+        """Embed and store a batch of chunks and index them for lexical search."""
+        documents = [chunk[0] for chunk in chunks]
+        metadatas = [chunk[1] for chunk in chunks]
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        self._add_to_vector_store(collection_name, documents, metadatas, ids)
+
+        # Index the same chunks for lexical (BM25) search
+        with pipeline_stage("store"):
+            self._index_lexical(file_record, collection_name, documents, metadatas, ids)
+
+    def _add_to_vector_store(
+        self,
+        collection_name: str,
+        documents: List[str],
+        metadatas: List[dict],
+        ids: List[str]
+    ):
+        """Embed chunks and add them to the vector store, each step within its stage's limit."""
+        with pipeline_stage("embed"):
+            embeddings = self.chroma.embed_documents(documents)
+        with pipeline_stage("store"):
             self.chroma.add_documents(
                 collection_name=collection_name,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=embeddings
             )
 
-            # Step 5: Save to database
-            logger.info(f"Saving file metadata to database")
-            file_record = File(
-                filename=unique_filename,
-                original_name=original_name,
-                file_type=file_type,
-                file_size=file_size,
-                backblaze_url=backblaze_url,
-                backblaze_file_id=backblaze_file_id,
-                chroma_collection_id=collection_name,
-                is_processed=True,
-                user_id=user_id
-            )
+    @staticmethod
+    def _index_lexical(
+        file_record: File,
+        collection_name: str,
+        documents: List[str],
+        metadatas: List[dict],
+        ids: List[str],
+        staged: bool = False
+    ):
+        """Add stored chunks to the lexical (BM25) index."""
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.add_chunks(
+                    file_record.user_id, file_record.id, collection_name,
+                    documents, metadatas, ids, staged=staged)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to index file {file_record.id} for lexical search: {str(e)}")
 
-            db.add(file_record)
-            db.commit()
-            db.refresh(file_record)
+    def _reuse_duplicate(
+        self,
+        db: Session,
+        file_record: File,
+        duplicate: File,
+        is_retry: bool = False
+    ) -> bool:
+        """
+        Complete a file from an already processed copy of the same content.
 
-            logger.info(
-                f"Successfully uploaded and processed file: {original_name}")
-            return file_record
+        Points the file at the duplicate's B2 object and copies the
+        duplicate's chunks with their embeddings, re-tagged with this file's
+        ID and name. Nothing is uploaded, extracted or embedded.
 
-        except Exception as e:
-            logger.error(f"Error during file upload pipeline: {str(e)}")
+        Returns:
+            True if the file was completed, False to fall back to full processing
+        """
+        logger.info(
+            f"File {file_record.id} duplicates file {duplicate.id}, reusing its storage")
 
-            # Rollback: Clean up resources
+        if is_retry:
             try:
-                if backblaze_file_id:
-                    logger.info("Rolling back: Deleting file from B2")
-                    self.backblaze.delete_file_from_b2(
-                        backblaze_file_id, unique_filename)
-            except:
+                self._delete_chunks(file_record)
+            except Exception:
                 pass
 
+        self._set_status(db, file_record, "embedding")
+        try:
+            copied = self.chroma.copy_documents(
+                source=duplicate.chroma_collection_id,
+                target=file_record.chroma_collection_id,
+                where={"file_id": duplicate.id} if self.chroma.is_shared_collection(
+                    duplicate.chroma_collection_id) else None,
+                metadata_updates={
+                    "file_id": file_record.id,
+                    "filename": file_record.original_name
+                },
+                new_ids=True
+            )
+        except Exception as e:
+            logger.warning(
+                f"Failed to copy chunks of file {duplicate.id}, processing normally: {str(e)}")
             try:
-                if collection_name:
-                    logger.info("Rolling back: Deleting ChromaDB collection")
-                    self.chroma.delete_collection(collection_name)
-            except:
+                self._delete_chunks(file_record)
+            except Exception:
                 pass
+            return False
 
-            raise HTTPException(
-                status_code=500, detail=f"Failed to upload file: {str(e)}")
+        if not copied:
+            return False
+
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.copy_file(
+                    duplicate.id,
+                    file_record.user_id,
+                    file_record.id,
+                    file_record.chroma_collection_id,
+                    metadata_updates={
+                        "file_id": file_record.id,
+                        "filename": file_record.original_name
+                    }
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Failed to index file {file_record.id} for lexical search: {str(e)}")
+
+        # Release a B2 object uploaded by an earlier attempt before sharing
+        object_id = duplicate.backblaze_file_id
+        if file_record.backblaze_file_id and file_record.backblaze_file_id != object_id:
+            self._release_b2_object(db, file_record)
+
+        # Take the reference only while another file still holds the object,
+        # so it cannot be deleted between the check and the commit
+        with self._b2_object_lock(object_id):
+            still_referenced = db.query(File.id).filter(
+                File.backblaze_file_id == object_id,
+                File.id != file_record.id
+            ).with_for_update().first()
+            if still_referenced is None:
+                logger.info(
+                    f"B2 object of file {duplicate.id} was released meanwhile, processing normally")
+                try:
+                    self._delete_chunks(file_record)
+                except Exception:
+                    pass
+                return False
+
+            file_record.backblaze_url = duplicate.backblaze_url
+            file_record.backblaze_file_id = object_id
+            file_record.backblaze_file_name = duplicate.storage_name
+            db.commit()
+
+        file_record.chunk_count = copied
+        file_record.token_count = duplicate.token_count
+        file_record.max_chunk_tokens = duplicate.max_chunk_tokens
+        file_record.truncated_chunk_count = duplicate.truncated_chunk_count
+        self._mark_completed(db, file_record)
+
+        logger.info(
+            f"Reused {copied} chunks of file {duplicate.id} for file {file_record.id}")
+        return True
+
+    def _mark_completed(self, db: Session, file_record: File):
+        """Record that a file finished processing."""
+        file_record.is_processed = True
+        file_record.processing_status = "completed"
+        file_record.processing_error = None
+        db.commit()
+        db.refresh(file_record)
+        self._invalidate_query_cache(file_record.user_id)
+
+        warm_index = get_warm_index()
+        if warm_index:
+            warm_index.add_file(
+                file_record.user_id, file_record.chroma_collection_id, file_record.id)
+
+    @staticmethod
+    def _invalidate_query_cache(user_id: int):
+        """Drop a user's cached query responses after their files changed."""
+        query_cache = get_query_cache()
+        if query_cache:
+            query_cache.invalidate_user(user_id)
+
+    def fail_file(self, file_id: int, db: Session, error: str):
+        """
+        Mark a file as permanently failed and roll back its partial state.
+
+        Deletes the B2 object (unless other files share it) and any stored
+        chunks, keeping the File row so the failure can be reported.
+        """
+        file_record = db.query(File).filter(File.id == file_id).first()
+        if not file_record:
+            return
+
+        # Rollback: Clean up resources
+        if file_record.backblaze_file_id:
+            try:
+                logger.info("Rolling back: Releasing B2 object")
+                self._release_b2_object(db, file_record)
+                file_record.backblaze_url = ""
+                file_record.backblaze_file_id = ""
+                file_record.backblaze_file_name = None
+            except Exception as e:
+                logger.warning(f"Failed to delete from B2: {str(e)}")
+
+        try:
+            logger.info("Rolling back: Deleting ChromaDB chunks")
+            self._delete_chunks(file_record)
+        except Exception:
+            pass
+
+        file_record.is_processed = False
+        file_record.processing_status = "failed"
+        file_record.processing_error = error
+        db.commit()
+
+    def _release_b2_object(self, db: Session, file_record: File) -> bool:
+        """
+        Delete a file's B2 object unless another file still references it.
+
+        Returns:
+            True if the object was deleted
+        """
+        return self._release_b2_object_id(
+            db, file_record.backblaze_file_id, file_record.storage_name, exclude_file_id=file_record.id)
+
+    def _release_b2_object_id(
+        self,
+        db: Session,
+        backblaze_file_id: str,
+        file_name: str,
+        exclude_file_id: Optional[int] = None
+    ) -> bool:
+        """
+        Delete a B2 object unless a file (other than exclude_file_id) references it.
+
+        Serialized with _reuse_duplicate taking a reference: the remaining
+        reference is cleared and committed together with the delete, so a
+        duplicate upload either shares the object before it is checked here
+        or no longer finds it.
+
+        Returns:
+            True if the object was deleted
+        """
+        with self._b2_object_lock(backblaze_file_id):
+            referencing = db.query(File.id).filter(
+                File.backblaze_file_id == backblaze_file_id
+            ).with_for_update().all()
+            references = sum(1 for (file_id,) in referencing if file_id != exclude_file_id)
+            if references:
+                logger.info(
+                    f"Keeping B2 object {file_name}: still used by {references} other files")
+                return False
+
+            db.query(File).filter(
+                File.backblaze_file_id == backblaze_file_id
+            ).update({File.backblaze_file_id: ""}, synchronize_session="fetch")
+            try:
+                logger.info(f"Deleting file from B2: {file_name}")
+                self.backblaze.delete_file_from_b2(
+                    file_id=backblaze_file_id,
+                    file_name=file_name
+                )
+            finally:
+                db.commit()
+            return True
+
+    def _set_status(self, db: Session, file_record: File, processing_status: str):
+        """Record the current ingestion stage of a file."""
+        file_record.processing_status = processing_status
+        db.commit()
 
     def delete_file(self, file_id: int, db: Session, user_id: int) -> File:
         """
@@ -168,27 +1051,32 @@ class FileService:
                     detail="File not found or you don't have permission to delete it"
                 )
 
-            # Delete from Backblaze
-            logger.info(f"Deleting file from B2: {file_record.filename}")
-            try:
-                self.backblaze.delete_file_from_b2(
-                    file_id=file_record.backblaze_file_id,
-                    file_name=file_record.filename
+            # Drop queued ingestion jobs and their spooled uploads; a running
+            # job would keep writing chunks and B2 objects for a deleted file
+            if not get_ingestion_service().cancel_jobs(db, file_record.id):
+                db.rollback()
+                raise HTTPException(
+                    status_code=409,
+                    detail="File is being processed, try again once processing has finished"
                 )
-            except Exception as e:
-                logger.warning(f"Failed to delete from B2: {str(e)}")
+
+            # Delete from Backblaze (shared objects are kept for their other files)
+            if file_record.backblaze_file_id:
+                try:
+                    self._release_b2_object(db, file_record)
+                except Exception as e:
+                    logger.warning(f"Failed to delete from B2: {str(e)}")
 
             # Delete from ChromaDB
-            logger.info(
-                f"Deleting ChromaDB collection: {file_record.chroma_collection_id}")
             try:
-                self.chroma.delete_collection(file_record.chroma_collection_id)
+                self._delete_chunks(file_record)
             except Exception as e:
                 logger.warning(f"Failed to delete from ChromaDB: {str(e)}")
 
             # Delete from database
             db.delete(file_record)
             db.commit()
+            self._invalidate_query_cache(user_id)
 
             logger.info(
                 f"Successfully deleted file: {file_record.original_name}")
@@ -201,6 +1089,30 @@ class FileService:
             raise HTTPException(
                 status_code=500, detail=f"Failed to delete file: {str(e)}")
 
+    def _delete_chunks(self, file_record: File):
+        """Delete a file's chunks, dropping the collection if it is not shared."""
+        warm_index = get_warm_index()
+        if warm_index:
+            warm_index.remove_file(file_record.user_id, file_record.id)
+
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.remove_file(file_record.id)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to remove file {file_record.id} from lexical index: {str(e)}")
+
+        collection_name = file_record.chroma_collection_id
+        if self.chroma.is_shared_collection(collection_name):
+            logger.info(
+                f"Deleting chunks of file {file_record.id} from ChromaDB collection: {collection_name}")
+            self.chroma.delete_documents(
+                collection_name, where={"file_id": file_record.id})
+        else:
+            logger.info(f"Deleting ChromaDB collection: {collection_name}")
+            self.chroma.delete_collection(collection_name)
+
     def get_file(self, file_id: int, db: Session, user_id: int) -> File:
         """
         Get file by ID.
@@ -249,24 +1161,33 @@ class FileService:
         Raises:
             HTTPException if validation fails
         """
+        self._validate_name(upload_file.filename)
+
+        # Check file size
+        upload_file.file.seek(0, 2)  # Seek to end
+        file_size = upload_file.file.tell()
+        upload_file.file.seek(0)  # Reset
+        self._validate_size(file_size)
+
+    @staticmethod
+    def _validate_name(filename: str):
+        """Check that a file name has an allowed extension."""
         # Check if file has an extension
-        if '.' not in upload_file.filename:
+        if '.' not in filename:
             raise HTTPException(
                 status_code=400, detail="File must have an extension")
 
         # Check file extension
-        file_ext = upload_file.filename.split('.')[-1].lower()
+        file_ext = filename.split('.')[-1].lower()
         if file_ext not in settings.allowed_extensions_list:
             raise HTTPException(
                 status_code=400,
                 detail=f"File type .{file_ext} not allowed. Allowed types: {', '.join(settings.allowed_extensions_list)}"
             )
 
-        # Check file size
-        upload_file.file.seek(0, 2)  # Seek to end
-        file_size = upload_file.file.tell()
-        upload_file.file.seek(0)  # Reset
-
+    @staticmethod
+    def _validate_size(file_size: int):
+        """Check that a file is neither empty nor over the size limit."""
         if file_size > settings.max_file_size_bytes:
             raise HTTPException(
                 status_code=400,
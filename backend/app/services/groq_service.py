@@ -1,12 +1,15 @@
 from groq import Groq
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 from app.config.settings import get_settings
+from app.services.prompt_builder import get_prompt_builder
 import json
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+NO_CONTEXT_RESPONSE = "I couldn't find any relevant information in your documents to answer that question."
+
 
 class GroqService:
     """Service for LLM operations using Groq API."""
@@ -15,7 +18,7 @@ class GroqService:
         self.client = Groq(api_key=settings.groq_api_key)
         self.model = settings.groq_model
 
-    def detect_query_intent(self, query: str, available_files: List[str]) -> Dict[str, Any]:
+    def detect_query_intent(self, query: str, available_files: List[str]) -> Optional[Dict[str, Any]]:
         """
         Detect user's intent from query using Groq LLM.
 
@@ -24,7 +27,9 @@ class GroqService:
             available_files: List of available filenames
 
         Returns:
-            Dict with 'intent' (file_retrieval or information_query) and 'target_file' if applicable
+            Dict with 'intent' (file_retrieval or information_query) and
+            'target_file' if applicable, or None if the request failed or
+            the response is not a valid classification
         """
         try:
             files_list = "\n".join(
@@ -69,17 +74,19 @@ Response: {{"intent": "file_retrieval", "target_file": "contract.docx"}}
             try:
                 result = json.loads(result_text)
             except json.JSONDecodeError:
-                # Fallback to information_query if parsing fails
                 logger.warning(f"Failed to parse intent JSON: {result_text}")
-                result = {"intent": "information_query", "target_file": None}
+                return None
+            if not isinstance(result, dict) or \
+                    result.get("intent") not in ("file_retrieval", "information_query"):
+                logger.warning(f"Unexpected intent response: {result_text}")
+                return None
 
             logger.info(f"Detected intent: {result}")
             return result
 
         except Exception as e:
             logger.error(f"Failed to detect query intent: {str(e)}")
-            # Default to information query on error
-            return {"intent": "information_query", "target_file": None}
+            return None
 
     def generate_rag_response(
         self,
@@ -114,22 +121,17 @@ Response: {{"intent": "file_retrieval", "target_file": "contract.docx"}}
             logger.error(f"Failed to generate RAG response: {str(e)}")
             raise
 
-    def _generate_file_retrieval_response(
+    def _build_file_retrieval_request(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         file_urls: Dict[str, str],
         chat_history: List[Dict[str, str]]
-    ) -> str:
-        """Generate response for file retrieval intent with download links."""
-        try:
-            # Use only the most relevant source (first chunk)
-            context_text = ""
-            if context_chunks:
-                most_relevant = context_chunks[0]
-                context_text = most_relevant.get('document', '')
+    ) -> Dict[str, Any]:
+        """Build completion arguments for the file retrieval intent."""
+        passages = [chunk.get('document', '') for chunk in context_chunks]
 
-            system_prompt = """You are a helpful assistant. The user is asking for a file.
+        system_prompt = """You are a helpful assistant. The user is asking for a file.
 Based on the context provided, generate a natural, friendly response that includes download links for the relevant files.
 
 Format the response in markdown with clickable download links like this:
@@ -137,58 +139,36 @@ Format the response in markdown with clickable download links like this:
 
 Be conversational and helpful. DO NOT mention sources, chunk numbers, or document metadata in your response."""
 
-            user_prompt = f"""User query: {query}
+        user_template = """User query: {query}
 
 Available files and URLs:
-{chr(10).join([f"- {name}: {url}" for name, url in file_urls.items()])}
+{files}
 
-Context from relevant document:
-{context_text}
+Context from relevant documents:
+{context}
 
 Generate a friendly response with download links in markdown format."""
 
-            # Build messages with chat history
-            messages = [{"role": "system", "content": system_prompt}]
-
-            # Add chat history if provided
-            if chat_history:
-                messages.extend(chat_history)
-
-            # Add current user query
-            messages.append({"role": "user", "content": user_prompt})
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-
-            return response.choices[0].message.content.strip()
+        # Fit chat history and context into the prompt token budget
+        messages = get_prompt_builder().build_messages(
+            system_prompt, user_template, chat_history, passages,
+            values={
+                "query": query,
+                "files": "\n".join([f"- {name}: {url}" for name, url in file_urls.items()])
+            })
 
-        except Exception as e:
-            logger.error(
-                f"Failed to generate file retrieval response: {str(e)}")
-            # Fallback response
-            links = "\n".join(
-                [f"- [{name}]({url})" for name, url in file_urls.items()])
-            return f"Here are the files you requested:\n\n{links}"
+        return {"messages": messages, "temperature": 0.7, "max_tokens": 500}
 
-    def _generate_information_response(
+    def _build_information_request(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         chat_history: List[Dict[str, str]]
-    ) -> str:
-        """Generate response for information query intent."""
-        try:
-            if not context_chunks:
-                return "I couldn't find any relevant information in your documents to answer that question."
-
-            # Use only the most relevant source (first chunk)
-            context_text = context_chunks[0].get('document', '')
+    ) -> Dict[str, Any]:
+        """Build completion arguments for the information query intent."""
+        passages = [chunk.get('document', '') for chunk in context_chunks]
 
-            system_prompt = """You are a helpful AI assistant that answers questions based on the user's documents.
+        system_prompt = """You are a helpful AI assistant that answers questions based on the user's documents.
 
 Your task:
 1. Answer the user's question using ONLY the information provided in the context
@@ -202,28 +182,65 @@ DO NOT:
 - Mention source documents, filenames, or chunk numbers in your response
 - Include any metadata or technical information about the documents"""
 
-            user_prompt = f"""User question: {query}
+        user_template = """User question: {query}
 
 Context from documents:
-{context_text}
+{context}
 
 Please answer the question based on the context above."""
 
-            # Build messages with chat history
-            messages = [{"role": "system", "content": system_prompt}]
+        # Fit chat history and context into the prompt token budget
+        messages = get_prompt_builder().build_messages(
+            system_prompt, user_template, chat_history, passages,
+            values={"query": query})
 
-            # Add chat history if provided
-            if chat_history:
-                messages.extend(chat_history)
+        return {"messages": messages, "temperature": 0.5, "max_tokens": 1000}
 
-            # Add current user query
-            messages.append({"role": "user", "content": user_prompt})
+    @staticmethod
+    def _file_links_fallback(file_urls: Dict[str, str]) -> str:
+        """Plain markdown response listing download links."""
+        links = "\n".join(
+            [f"- [{name}]({url})" for name, url in file_urls.items()])
+        return f"Here are the files you requested:\n\n{links}"
 
+    def _generate_file_retrieval_response(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        file_urls: Dict[str, str],
+        chat_history: List[Dict[str, str]]
+    ) -> str:
+        """Generate response for file retrieval intent with download links."""
+        try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
-                temperature=0.5,
-                max_tokens=1000
+                **self._build_file_retrieval_request(
+                    query, context_chunks, file_urls, chat_history)
+            )
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            logger.error(
+                f"Failed to generate file retrieval response: {str(e)}")
+            # Fallback response
+            return self._file_links_fallback(file_urls)
+
+    def _generate_information_response(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        chat_history: List[Dict[str, str]]
+    ) -> str:
+        """Generate response for information query intent."""
+        try:
+            if not context_chunks:
+                return NO_CONTEXT_RESPONSE
+
+            response = self.client.chat.completions.create(
+                model=self.model,
+                **self._build_information_request(
+                    query, context_chunks, chat_history)
             )
 
             return response.choices[0].message.content.strip()
@@ -232,6 +249,56 @@ Please answer the question based on the context above."""
             logger.error(f"Failed to generate information response: {str(e)}")
             raise
 
+    def stream_rag_response(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        intent: str,
+        chat_history: List[Dict[str, str]],
+        file_urls: Dict[str, str] = None
+    ) -> Iterator[str]:
+        """
+        Stream a RAG response as it is generated.
+
+        Same arguments as generate_rag_response.
+
+        Yields:
+            Markdown text deltas
+        """
+        if intent == "file_retrieval" and file_urls:
+            request = self._build_file_retrieval_request(
+                query, context_chunks, file_urls, chat_history)
+        elif not context_chunks:
+            yield NO_CONTEXT_RESPONSE
+            return
+        else:
+            request = self._build_information_request(
+                query, context_chunks, chat_history)
+
+        streamed_any = False
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                stream=True,
+                **request
+            )
+
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    streamed_any = True
+                    yield delta
+
+        except Exception as e:
+            logger.error(f"Failed to stream RAG response: {str(e)}")
+            # Same fallback as the non-streaming path, if nothing was sent yet
+            if intent == "file_retrieval" and file_urls and not streamed_any:
+                yield self._file_links_fallback(file_urls)
+                return
+            raise
+
 
 def get_groq_service() -> GroqService:
     """Get GroqService instance."""
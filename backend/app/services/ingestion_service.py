@@ -0,0 +1,299 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config.settings import get_settings
+from app.models.database import SessionLocal
+from app.models.file import File
+from app.models.ingestion_job import IngestionJob
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class IngestionService:
+    """Service for running file ingestion jobs on background workers."""
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+    def start(self):
+        """Recover interrupted jobs and start the worker threads."""
+        if self._workers:
+            return
+
+        self._recover_interrupted_jobs()
+        self._stop.clear()
+
+        for i in range(settings.ingestion_max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"ingestion-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        logger.info(
+            f"Started {len(self._workers)} ingestion workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Signal the workers to stop and wait briefly for them."""
+        self._stop.set()
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+        logger.info("Stopped ingestion workers")
+
+    def enqueue(
+        self,
+        db: Session,
+        file_record: File,
+        spool_path: str,
+        content_type: Optional[str] = None,
+        operation: str = "process",
+        original_name: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> IngestionJob:
+        """
+        Queue a file for background processing.
+
+        Args:
+            db: Database session (committed here)
+            file_record: File to process
+            spool_path: Local path of the uploaded content
+            content_type: MIME type of the upload
+            operation: "process" for a new upload, "replace" for new content
+                of an already processed file
+            original_name: Name of the replacement content (replace only)
+            content_hash: SHA-256 of the replacement content (replace only)
+
+        Returns:
+            IngestionJob model instance
+        """
+        job = IngestionJob(
+            file_id=file_record.id,
+            status="queued",
+            operation=operation,
+            max_attempts=settings.ingestion_max_attempts,
+            spool_path=spool_path,
+            content_type=content_type,
+            original_name=original_name,
+            content_hash=content_hash,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        logger.info(f"Queued ingestion job {job.id} for file {file_record.id}")
+        self._wakeup.set()
+        return job
+
+    def cancel_jobs(self, db: Session, file_id: int) -> bool:
+        """
+        Delete a file's jobs and their spooled content (not committed).
+
+        A job a worker has already claimed cannot be stopped: its chunks and
+        B2 object would be orphaned once the file is gone. If one is running,
+        nothing is deleted and the caller should roll back and retry later.
+
+        Returns:
+            False if a job of the file is running, True otherwise
+        """
+        if db.query(IngestionJob.id).filter(
+            IngestionJob.file_id == file_id,
+            IngestionJob.status == "running"
+        ).first() is not None:
+            return False
+
+        spool_paths = [spool_path for (spool_path,) in db.query(IngestionJob.spool_path).filter(
+            IngestionJob.file_id == file_id).all()]
+        deleted = db.query(IngestionJob).filter(
+            IngestionJob.file_id == file_id,
+            IngestionJob.status != "running"
+        ).delete(synchronize_session=False)
+        if deleted != len(spool_paths):
+            # A worker claimed a queued job in the meantime
+            return False
+
+        for spool_path in spool_paths:
+            self._remove_spool(spool_path)
+        return True
+
+    def get_latest_job(self, db: Session, file_id: int) -> Optional[IngestionJob]:
+        """Get the most recent ingestion job of a file."""
+        return db.query(IngestionJob).filter(
+            IngestionJob.file_id == file_id
+        ).order_by(IngestionJob.id.desc()).first()
+
+    def has_active_job(self, db: Session, file_id: int) -> bool:
+        """Check whether a file has a queued or running job."""
+        return db.query(IngestionJob.id).filter(
+            IngestionJob.file_id == file_id,
+            IngestionJob.status.in_(("queued", "running"))
+        ).first() is not None
+
+    def _recover_interrupted_jobs(self):
+        """Requeue jobs left running by a previous process."""
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.status == "running")
+                .values(status="queued", next_attempt_at=datetime.utcnow())
+            )
+            db.commit()
+            if result.rowcount:
+                logger.info(
+                    f"Requeued {result.rowcount} interrupted ingestion jobs")
+        finally:
+            db.close()
+
+    def _worker_loop(self):
+        """Claim and run jobs until stopped."""
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim_next_job()
+            except Exception as e:
+                logger.error(f"Failed to claim ingestion job: {str(e)}")
+                job_id = None
+
+            if job_id is None:
+                self._wakeup.wait(settings.ingestion_poll_interval_seconds)
+                self._wakeup.clear()
+                continue
+
+            self._run_job(job_id)
+
+    def _claim_next_job(self) -> Optional[int]:
+        """Atomically move the next due job from queued to running."""
+        db = SessionLocal()
+        try:
+            candidates = db.query(IngestionJob.id).filter(
+                IngestionJob.status == "queued",
+                IngestionJob.next_attempt_at <= datetime.utcnow()
+            ).order_by(IngestionJob.next_attempt_at, IngestionJob.id).limit(5).all()
+
+            for (job_id,) in candidates:
+                # Conditional update so concurrent workers/processes claim each job once
+                result = db.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                    .values(status="running", attempts=IngestionJob.attempts + 1)
+                )
+                db.commit()
+                if result.rowcount == 1:
+                    return job_id
+
+            return None
+        finally:
+            db.close()
+
+    def _run_job(self, job_id: int):
+        """Process a claimed job and record the outcome."""
+        # Imported here to avoid a circular import (FileService enqueues jobs)
+        from app.services.file_service import get_file_service
+
+        db = SessionLocal()
+        try:
+            job = db.query(IngestionJob).filter(
+                IngestionJob.id == job_id).first()
+            if not job:
+                return
+
+            file_service = get_file_service()
+
+            try:
+                if job.operation == "replace":
+                    file_service.replace_content(
+                        job.file_id,
+                        db,
+                        job.spool_path,
+                        job.content_type,
+                        job.original_name,
+                        job.content_hash
+                    )
+                else:
+                    file_service.process_file(
+                        job.file_id,
+                        db,
+                        job.spool_path,
+                        job.content_type,
+                        is_retry=job.attempts > 1
+                    )
+            except Exception as e:
+                db.rollback()
+                self._handle_failure(db, job, file_service, e)
+                return
+
+            job.status = "succeeded"
+            job.last_error = None
+            db.commit()
+            self._remove_spool(job.spool_path)
+            logger.info(f"Ingestion job {job.id} succeeded")
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} crashed: {str(e)}")
+        finally:
+            db.close()
+
+    def _handle_failure(self, db: Session, job: IngestionJob, file_service, error: Exception):
+        """Schedule a retry with exponential backoff, or fail the file."""
+        job.last_error = str(error)
+
+        if job.attempts < job.max_attempts:
+            delay = settings.ingestion_retry_backoff_seconds * \
+                (2 ** (job.attempts - 1))
+            job.status = "queued"
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            db.commit()
+            logger.warning(
+                f"Ingestion job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), "
+                f"retrying in {delay:.0f}s: {str(error)}")
+            return
+
+        job.status = "failed"
+        db.commit()
+        logger.error(
+            f"Ingestion job {job.id} failed permanently: {str(error)}")
+
+        try:
+            if job.operation == "replace":
+                file_service.fail_replace(job.file_id, db, str(error))
+            else:
+                file_service.fail_file(job.file_id, db, str(error))
+        except Exception as e:
+            logger.error(
+                f"Failed to clean up after ingestion job {job.id}: {str(e)}")
+        self._remove_spool(job.spool_path)
+
+    @staticmethod
+    def _remove_spool(spool_path: Optional[str]):
+        """Remove a spooled upload if it still exists."""
+        if spool_path and os.path.exists(spool_path):
+            try:
+                os.remove(spool_path)
+            except OSError as e:
+                logger.warning(
+                    f"Failed to remove spooled upload {spool_path}: {str(e)}")
+
+
+# Singleton instance
+_ingestion_service = None
+
+
+def get_ingestion_service() -> IngestionService:
+    """Get or create IngestionService instance."""
+    global _ingestion_service
+    if _ingestion_service is None:
+        _ingestion_service = IngestionService()
+    return _ingestion_service
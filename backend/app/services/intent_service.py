@@ -0,0 +1,236 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.embedding_service import get_embedding_service
+from app.services.groq_service import get_groq_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FILE_RETRIEVAL = "file_retrieval"
+INFORMATION_QUERY = "information_query"
+
+# Requests for the file itself ("give me the resume", "download contract.pdf")
+RETRIEVAL_PATTERN = re.compile(
+    r"^(?:(?:can|could|would) you\s+)?(?:please\s+)?"
+    r"(?:give|send|get|fetch|share|attach|forward|email|download|open|pull up)\b"
+    r"|\b(?:download|downloadable|download link|link to)\b"
+)
+
+# Questions about the content ("what does my resume say", "summarize the contract")
+INFORMATION_PATTERN = re.compile(
+    r"^(?:what|which|who|whom|whose|when|where|why|how|is|are|does|do|did|list|explain|describe|compare)\b"
+    r"|\b(?:summar\w*|explain\w*|overview|tell me about|details? (?:of|about|on)|"
+    r"information|info|insights?|key points|mention\w*|say|says|said|about)\b"
+)
+
+# Prototype queries for the embedding-similarity tier
+INTENT_EXAMPLES = {
+    FILE_RETRIEVAL: [
+        "give me the resume",
+        "send me the contract",
+        "download my invoice",
+        "I need the file",
+        "share the document with me",
+        "can I get a copy of the report",
+        "where can I download the spreadsheet",
+        "open the pdf",
+    ],
+    INFORMATION_QUERY: [
+        "what does my resume say about my skills",
+        "summarize the contract",
+        "what is the total amount on the invoice",
+        "explain the main points of the report",
+        "how many years of experience are listed",
+        "when does the agreement expire",
+        "list the action items from the meeting notes",
+        "compare the numbers in the spreadsheet",
+    ],
+}
+
+
+class IntentService:
+    """Tiered query intent classifier that only calls the LLM when unsure."""
+
+    def __init__(self):
+        self._cache: "OrderedDict[Tuple[str, Tuple[str, ...]], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._prototypes: Optional[Dict[str, np.ndarray]] = None
+        self.tier_counts = {"cache": 0, "rules": 0, "embedding": 0, "llm": 0, "llm_failed": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query: lowercase, punctuation and extra whitespace removed."""
+        return " ".join(re.sub(r"[^\w\s.]", " ", query.lower()).split())
+
+    @staticmethod
+    def match_target_file(query: str, available_files: List[str]) -> Optional[str]:
+        """
+        Find the file a query names.
+
+        Matches the full filename or its stem (at least 3 characters) inside
+        the query and prefers the longest match.
+        """
+        query_lower = query.lower()
+        best_match, best_length = None, 0
+
+        for filename in available_files:
+            name = filename.lower()
+            stem = name.rsplit('.', 1)[0]
+            for candidate in (name, stem):
+                if len(candidate) >= 3 and candidate in query_lower and len(candidate) > best_length:
+                    best_match, best_length = filename, len(candidate)
+
+        return best_match
+
+    def detect_query_intent(
+        self,
+        query: str,
+        available_files: List[str],
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """
+        Detect a query's intent, cheapest tier first.
+
+        Tiers:
+        1. LRU cache of earlier decisions for the same query and file list
+        2. Keyword/regex rules
+        3. Similarity to embedded example queries
+        4. Groq LLM (GroqService.detect_query_intent)
+
+        A file_retrieval decision is only accepted locally when the query
+        names one of the files; otherwise the LLM picks the target file. If
+        the LLM fails, the query falls back to information_query and that
+        fallback is not cached.
+
+        Args:
+            query: User's query text
+            available_files: List of available filenames
+            query_embedding: Optional precomputed normalized query vector
+
+        Returns:
+            Dict with 'intent' (file_retrieval or information_query) and 'target_file' if applicable
+        """
+        normalized = self.normalize(query)
+        cache_key = (normalized, tuple(sorted(available_files)))
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self.tier_counts["cache"] += 1
+                return dict(cached)
+
+        result, tier = None, None
+        if settings.intent_local_classifier_enabled:
+            target_file = self.match_target_file(query, available_files)
+
+            intent = self._classify_by_rules(normalized)
+            if intent:
+                tier = "rules"
+            else:
+                intent = self._classify_by_similarity(query, query_embedding)
+                tier = "embedding" if intent else None
+
+            if intent == INFORMATION_QUERY:
+                result = {"intent": intent, "target_file": None}
+            elif intent == FILE_RETRIEVAL and target_file:
+                result = {"intent": intent, "target_file": target_file}
+
+        if result is None:
+            tier = "llm"
+            result = get_groq_service().detect_query_intent(query, available_files)
+        else:
+            logger.info(f"Detected intent locally ({tier}): {result}")
+
+        if result is None:
+            # Not cached, so the next identical query asks the LLM again
+            with self._lock:
+                self.tier_counts["llm_failed"] += 1
+            return {"intent": INFORMATION_QUERY, "target_file": None}
+
+        with self._lock:
+            self.tier_counts[tier] += 1
+            self._cache[cache_key] = dict(result)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > settings.intent_cache_max_entries:
+                self._cache.popitem(last=False)
+
+        return result
+
+    @staticmethod
+    def _classify_by_rules(normalized_query: str) -> Optional[str]:
+        """Classify with keyword rules, or None if they match both intents or neither."""
+        is_retrieval = bool(RETRIEVAL_PATTERN.search(normalized_query))
+        is_information = bool(INFORMATION_PATTERN.search(normalized_query))
+
+        if is_retrieval and not is_information:
+            return FILE_RETRIEVAL
+        if is_information and not is_retrieval:
+            return INFORMATION_QUERY
+        return None
+
+    def _classify_by_similarity(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Optional[str]:
+        """
+        Classify by cosine similarity to the example queries of each intent.
+
+        Returns None when embeddings are unavailable or the best intent does
+        not beat the other by at least intent_similarity_margin.
+        """
+        if not settings.use_local_embeddings:
+            return None
+
+        try:
+            prototypes = self._get_prototypes()
+            if query_embedding is None:
+                query_embedding = get_embedding_service().embed_query(query)
+        except Exception as e:
+            logger.warning(f"Embedding intent classification unavailable: {str(e)}")
+            return None
+
+        scores = {
+            intent: float(np.max(examples @ query_embedding))
+            for intent, examples in prototypes.items()
+        }
+        (best, best_score), (_, runner_up_score) = sorted(
+            scores.items(), key=lambda item: item[1], reverse=True)
+
+        if best_score - runner_up_score < settings.intent_similarity_margin:
+            return None
+        return best
+
+    def _get_prototypes(self) -> Dict[str, np.ndarray]:
+        """Embed the example queries once."""
+        if self._prototypes is None:
+            embedding_service = get_embedding_service()
+            self._prototypes = {
+                intent: embedding_service.embed(examples)
+                for intent, examples in INTENT_EXAMPLES.items()
+            }
+        return self._prototypes
+
+    def stats(self) -> Dict[str, Any]:
+        """Get how many decisions each tier made and the cache size."""
+        return {**self.tier_counts, "cache_entries": len(self._cache)}
+
+
+# Singleton instance
+_intent_service = None
+
+
+def get_intent_service() -> IntentService:
+    """Get or create IntentService instance."""
+    global _intent_service
+    if _intent_service is None:
+        _intent_service = IntentService()
+    return _intent_service
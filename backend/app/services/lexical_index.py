@@ -0,0 +1,366 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Words (with internal . _ - / joins kept, e.g. "inv-2023-001", "resume.pdf")
+TOKEN_PATTERN = re.compile(r"\w+(?:[._\-/]\w+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i in is it its me my of on or
+our so that the their them then there these this to was were what when where which
+who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+
+    Compound tokens such as IDs, filenames and decimals are indexed whole and
+    also by their parts, so "INV-2023-001" matches both itself and "2023".
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        parts = re.split(r"[._\-/]", token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(part for part in parts if part and part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """Per-user BM25 inverted index of document chunks, stored in SQLite."""
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.lexical_index_path
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index database and create its tables."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                chunk_index INTEGER,
+                chunk_id TEXT,
+                collection TEXT NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                staged INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_chunks_user_id ON chunks (user_id);
+            CREATE INDEX IF NOT EXISTS ix_chunks_file_id ON chunks (file_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                user_id INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                chunk_rowid INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (user_id, term, chunk_rowid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_chunk_rowid ON postings (chunk_rowid);
+        """)
+        # Indexes created before staging existed
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(chunks)")}
+        if "staged" not in columns:
+            connection.execute(
+                "ALTER TABLE chunks ADD COLUMN staged INTEGER NOT NULL DEFAULT 0")
+        connection.commit()
+        logger.info(f"Opened lexical index at {self.path}")
+        return connection
+
+    def add_chunks(
+        self,
+        user_id: int,
+        file_id: int,
+        collection: str,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        staged: bool = False
+    ) -> int:
+        """
+        Index a file's chunks.
+
+        Args:
+            user_id: Owner of the file
+            file_id: Database file ID
+            collection: Chroma collection holding the chunks
+            documents: Chunk texts
+            metadatas: Chunk metadata dicts (chunk_index is used to match vector results)
+            ids: Optional Chroma IDs of the chunks
+            staged: Keep the chunks out of searches until commit_staged
+
+        Returns:
+            Number of indexed chunks
+        """
+        ids = ids or [None] * len(documents)
+
+        with self._lock:
+            try:
+                for document, metadata, chunk_id in zip(documents, metadatas, ids):
+                    terms = Counter(tokenize(document))
+                    cursor = self._connection.execute(
+                        "INSERT INTO chunks (user_id, file_id, chunk_index, chunk_id, collection, document, metadata, length, staged) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, file_id, metadata.get("chunk_index"), chunk_id, collection,
+                         document, json.dumps(metadata), sum(terms.values()), int(staged))
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO postings (user_id, term, chunk_rowid, tf) VALUES (?, ?, ?, ?)",
+                        [(user_id, term, cursor.lastrowid, tf)
+                         for term, tf in terms.items()]
+                    )
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+
+        logger.info(
+            f"Indexed {len(documents)} chunks of file {file_id} for lexical search")
+        return len(documents)
+
+    def remove_file(self, file_id: int):
+        """Remove a file's chunks (live and staged) from the index."""
+        with self._lock:
+            self._delete_chunks("file_id = ?", (file_id,))
+            self._connection.commit()
+
+    def move_file(self, file_id: int, collection: str):
+        """Record that a file's chunks now live in another collection (same IDs)."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE chunks SET collection = ? WHERE file_id = ?", (collection, file_id))
+            self._connection.commit()
+
+    def discard_staged(self, file_id: int):
+        """Remove a file's staged chunks, leaving its live chunks searchable."""
+        with self._lock:
+            self._delete_chunks("file_id = ? AND staged = 1", (file_id,))
+            self._connection.commit()
+
+    def commit_staged(self, file_id: int):
+        """Atomically replace a file's live chunks with its staged chunks."""
+        with self._lock:
+            try:
+                self._delete_chunks("file_id = ? AND staged = 0", (file_id,))
+                self._connection.execute(
+                    "UPDATE chunks SET staged = 0 WHERE file_id = ?", (file_id,))
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+
+    def _delete_chunks(self, condition: str, parameters: tuple):
+        """Delete the chunks matching a condition and their postings (not committed)."""
+        self._connection.execute(
+            f"DELETE FROM postings WHERE chunk_rowid IN (SELECT id FROM chunks WHERE {condition})",
+            parameters
+        )
+        self._connection.execute(
+            f"DELETE FROM chunks WHERE {condition}", parameters)
+
+    def copy_file(
+        self,
+        source_file_id: int,
+        user_id: int,
+        file_id: int,
+        collection: str,
+        metadata_updates: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """
+        Index another file's chunks under a new file (used for duplicate uploads).
+
+        Returns:
+            Number of copied chunks
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT document, metadata FROM chunks WHERE file_id = ? AND staged = 0 ORDER BY id",
+                (source_file_id,)
+            ).fetchall()
+
+        documents = [document for document, _ in rows]
+        metadatas = [{**json.loads(metadata), **(metadata_updates or {})}
+                     for _, metadata in rows]
+        if not documents:
+            return 0
+        return self.add_chunks(user_id, file_id, collection, documents, metadatas)
+
+    def has_file(self, file_id: int) -> bool:
+        """Check whether a file has indexed chunks."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM chunks WHERE file_id = ? AND staged = 0 LIMIT 1", (file_id,)
+            ).fetchone() is not None
+
+    def search(
+        self,
+        user_id: int,
+        query: str,
+        top_k: int = 20,
+        file_ids: Optional[Iterable[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank a user's chunks against a query with BM25.
+
+        Args:
+            user_id: Owner of the chunks
+            query: Query text
+            top_k: Number of results
+            file_ids: Optional set of file IDs to restrict the search to
+
+        Returns:
+            Result dicts shaped like ChromaService results ('document',
+            'metadata', 'id', 'collection', 'distance' None, 'score'), best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        # IDF and the average length are taken over the searched files only
+        chunk_filter, posting_filter, file_parameters = "", "", []
+        if file_ids is not None:
+            file_parameters = list(set(file_ids))
+            if not file_parameters:
+                return []
+            file_placeholders = ",".join("?" * len(file_parameters))
+            chunk_filter = f" AND file_id IN ({file_placeholders})"
+            posting_filter = f" AND c.file_id IN ({file_placeholders})"
+
+        # One locked read, so a concurrent delete or replacement cannot
+        # remove chunks between scoring them and loading them
+        with self._lock:
+            chunk_count, total_length = self._connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks "
+                f"WHERE user_id = ? AND staged = 0{chunk_filter}",
+                [user_id, *file_parameters]
+            ).fetchone()
+            if not chunk_count:
+                return []
+
+            placeholders = ",".join("?" * len(terms))
+            postings = self._connection.execute(
+                f"SELECT p.term, p.chunk_rowid, p.tf, c.length FROM postings p "
+                f"JOIN chunks c ON c.id = p.chunk_rowid "
+                f"WHERE p.user_id = ? AND p.term IN ({placeholders}) AND c.staged = 0{posting_filter}",
+                [user_id, *terms, *file_parameters]
+            ).fetchall()
+
+            average_length = total_length / chunk_count
+            document_frequency = Counter(term for term, *_ in postings)
+            scores: Dict[int, float] = {}
+
+            for term, chunk_rowid, tf, length in postings:
+                df = document_frequency[term]
+                idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[chunk_rowid] = scores.get(chunk_rowid, 0.0) + \
+                    idf * tf * (BM25_K1 + 1) / norm
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            if not best:
+                return []
+
+            placeholders = ",".join("?" * len(best))
+            rows = {row[0]: row for row in self._connection.execute(
+                f"SELECT id, chunk_id, collection, document, metadata, file_id, chunk_index "
+                f"FROM chunks WHERE id IN ({placeholders})",
+                [rowid for rowid, _ in best]
+            ).fetchall()}
+
+        results = []
+        for rowid, score in best:
+            _, chunk_id, collection, document, metadata, file_id, chunk_index = rows[rowid]
+            results.append({
+                'document': document,
+                'metadata': json.loads(metadata),
+                'distance': None,
+                'id': chunk_id or f"{file_id}:{chunk_index}",
+                'collection': collection,
+                'score': score
+            })
+        return results
+
+    def close(self):
+        """Close the index database."""
+        with self._lock:
+            self._connection.close()
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]],
+    k: int = 60,
+    top_k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists by reciprocal rank (sum of 1 / (k + rank)).
+
+    Results are matched by (file_id, chunk_index), falling back to their ID;
+    the first list's version of a result is kept when it appears in several
+    (pass the vector results first so embeddings and distances survive).
+    Each fused result carries its score under 'fusion_score'.
+
+    Args:
+        result_lists: Ranked result lists, best first
+        k: RRF damping constant
+        top_k: Optional cap on the number of fused results
+
+    Returns:
+        Fused results, best first
+    """
+    scores: Dict[Any, float] = {}
+    chosen: Dict[Any, Dict[str, Any]] = {}
+
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            metadata = result.get('metadata') or {}
+            if metadata.get('file_id') is not None and metadata.get('chunk_index') is not None:
+                key = (metadata['file_id'], metadata['chunk_index'])
+            else:
+                key = ('id', result.get('id'))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            chosen.setdefault(key, result)
+
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    if top_k is not None:
+        ranked = ranked[:top_k]
+    return [{**chosen[key], 'fusion_score': scores[key]} for key in ranked]
+
+
+# Singleton instance
+_lexical_index = None
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Get or create the LexicalIndex instance (None when hybrid search is disabled)."""
+    global _lexical_index
+    if not settings.hybrid_search_enabled:
+        return None
+    if _lexical_index is None:
+        _lexical_index = LexicalIndex()
+    return _lexical_index
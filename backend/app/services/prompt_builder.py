@@ -0,0 +1,235 @@
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from tokenizers import Tokenizer
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Tokens the chat format adds around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Each earlier question kept in the history summary is cut to this length
+SUMMARY_QUESTION_MAX_TOKENS = 40
+
+# Separates context passages in the prompt
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+# "{name}" placeholders in user prompt templates
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+class PromptBuilder:
+    """Assemble chat prompts that fit a token budget."""
+
+    def __init__(self):
+        self.tokenizer = self._load_tokenizer()
+
+    def _load_tokenizer(self) -> Optional[Tokenizer]:
+        """
+        Load the tokenizer used for counting prompt tokens.
+
+        Uses PROMPT_TOKENIZER_PATH (e.g. the chat model's tokenizer.json) or
+        the local embedding model's tokenizer as an approximation. Falls back
+        to a characters-per-token estimate if neither can be loaded.
+        """
+        if settings.prompt_tokenizer_path:
+            path = settings.prompt_tokenizer_path
+        else:
+            from app.services.embedding_service import DEFAULT_MODEL_DIR
+            model_dir = settings.embedding_model_path or DEFAULT_MODEL_DIR
+            path = os.path.join(model_dir, "tokenizer.json")
+
+        try:
+            tokenizer = Tokenizer.from_file(str(path))
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            return tokenizer
+        except Exception as e:
+            logger.warning(
+                f"Prompt tokenizer unavailable, estimating token counts: {str(e)}")
+            return None
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of a text."""
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return len(text) // 4 + 1
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut a text to at most max_tokens tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is None:
+            return text[:max_tokens * 4]
+
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        return text[:offsets[max_tokens - 1][1]]
+
+    def fit_history(self, chat_history: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+        """
+        Keep the most recent turns that fit the budget.
+
+        Older turns that do not fit are rolled into a single system message
+        listing the user's earlier questions, if there is room for it.
+
+        Args:
+            chat_history: Messages [{"role": ..., "content": ...}], oldest first
+            max_tokens: Token budget for the history
+
+        Returns:
+            Trimmed history, oldest first
+        """
+        kept: List[Dict[str, str]] = []
+        used = 0
+
+        for index in range(len(chat_history) - 1, -1, -1):
+            message = chat_history[index]
+            tokens = self.count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+            if used + tokens > max_tokens:
+                # Always keep part of the latest turn rather than nothing
+                if not kept:
+                    content = self.truncate(
+                        message.get("content", ""), max_tokens - MESSAGE_OVERHEAD_TOKENS)
+                    if content:
+                        kept.append({**message, "content": content})
+                        used = max_tokens
+                    index -= 1
+
+                summary = self._summarize(chat_history[:index + 1], max_tokens - used)
+                if summary:
+                    kept.append(summary)
+                break
+
+            kept.append(message)
+            used += tokens
+
+        kept.reverse()
+        return kept
+
+    def _summarize(self, dropped: List[Dict[str, str]], max_tokens: int) -> Optional[Dict[str, str]]:
+        """Condense dropped turns into a list of the user's questions, newest kept first."""
+        header = "Earlier in this conversation the user asked:"
+        used = self.count_tokens(header) + MESSAGE_OVERHEAD_TOKENS
+        questions: List[str] = []
+
+        for message in reversed(dropped):
+            if message.get("role") != "user":
+                continue
+            line = "- " + self.truncate(
+                " ".join(message.get("content", "").split()), SUMMARY_QUESTION_MAX_TOKENS)
+            tokens = self.count_tokens(line) + 1
+            if used + tokens > max_tokens:
+                break
+            questions.append(line)
+            used += tokens
+
+        if not questions:
+            return None
+        questions.reverse()
+        return {"role": "system", "content": "\n".join([header, *questions])}
+
+    def pack_passages(self, passages: List[str], max_tokens: int) -> str:
+        """
+        Join as many passages as fit the budget, in order.
+
+        Passages that do not fit are skipped (later, shorter ones may still
+        fit); if not even the first fits, it is truncated.
+        """
+        packed: List[str] = []
+        used = 0
+        separator_tokens = self.count_tokens(PASSAGE_SEPARATOR)
+
+        for passage in passages:
+            if not passage:
+                continue
+            tokens = self.count_tokens(passage) + (separator_tokens if packed else 0)
+            if used + tokens <= max_tokens:
+                packed.append(passage)
+                used += tokens
+
+        if not packed and passages:
+            return self.truncate(passages[0], max_tokens)
+        return PASSAGE_SEPARATOR.join(packed)
+
+    @staticmethod
+    def fill_template(template: str, values: Dict[str, str]) -> str:
+        """
+        Substitute "{name}" placeholders in one pass over the template.
+
+        Substituted values are not scanned again, so a query or passage
+        containing "{context}" is left as written. Unknown placeholders are kept.
+        """
+        return PLACEHOLDER_PATTERN.sub(
+            lambda match: values.get(match.group(1), match.group(0)), template)
+
+    def build_messages(
+        self,
+        system_prompt: str,
+        user_template: str,
+        chat_history: List[Dict[str, str]],
+        context_passages: List[str] = None,
+        values: Dict[str, str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build chat messages within settings.prompt_max_tokens.
+
+        The system prompt and the question are always included. History gets
+        up to settings.prompt_history_max_tokens, and context passages are
+        packed into the rest of the budget (at most
+        settings.prompt_context_max_tokens).
+
+        Args:
+            system_prompt: System message
+            user_template: Final user message; "{context}" is replaced by the
+                packed context and other placeholders by values
+            chat_history: Previous messages, oldest first
+            context_passages: Retrieved passages, most useful first
+            values: Placeholder values for the template, e.g. the user's query
+
+        Returns:
+            Messages for the chat completion request
+        """
+        values = dict(values or {})
+        values["context"] = ""
+        fixed_tokens = self.count_tokens(system_prompt) + \
+            self.count_tokens(self.fill_template(user_template, values)) + \
+            2 * MESSAGE_OVERHEAD_TOKENS
+        available = max(settings.prompt_max_tokens - fixed_tokens, 0)
+
+        history = self.fit_history(
+            chat_history or [], min(settings.prompt_history_max_tokens, available))
+        history_tokens = sum(
+            self.count_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in history)
+
+        context_text = self.pack_passages(
+            context_passages or [],
+            min(available - history_tokens, settings.prompt_context_max_tokens))
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history)
+        values["context"] = context_text
+        messages.append(
+            {"role": "user", "content": self.fill_template(user_template, values)})
+        return messages
+
+
+# Singleton instance
+_prompt_builder = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """Get or create PromptBuilder instance."""
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder()
+    return _prompt_builder
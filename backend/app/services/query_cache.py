@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.models.file import File
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class QueryCache:
+    """In-memory per-user cache of query responses with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = None,
+        max_entries: int = None,
+        similarity_threshold: float = None
+    ):
+        self.ttl_seconds = ttl_seconds or settings.query_cache_ttl_seconds
+        self.max_entries = max_entries or settings.query_cache_max_entries
+        self.similarity_threshold = settings.query_cache_similarity_threshold \
+            if similarity_threshold is None else similarity_threshold
+        self._entries: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query: lowercase, punctuation and extra whitespace removed."""
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    @staticmethod
+    def file_set_version(user_files: List[File]) -> str:
+        """
+        Get a version string of the files a query searches.
+
+        Changes whenever a file is added, removed or re-processed, so cached
+        responses never outlive the documents they were generated from.
+        """
+        hasher = hashlib.sha1()
+        for file in sorted(user_files, key=lambda f: f.id):
+            hasher.update(
+                f"{file.id}:{file.content_hash}:{file.chroma_collection_id};".encode("utf-8"))
+        return hasher.hexdigest()
+
+    def lookup(
+        self,
+        user_id: int,
+        file_set_version: str,
+        query: str,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for a query.
+
+        Tries the normalized query text first, then (if a query embedding is
+        given and semantic matching is enabled) the most similar cached query
+        of the same user and file set above the similarity threshold.
+
+        Args:
+            user_id: ID of the querying user
+            file_set_version: Version of the user's file set (see file_set_version)
+            query: Query text
+            query_embedding: Optional normalized query vector
+
+        Returns:
+            Cached response dict, or None
+        """
+        now = time.time()
+        key = (user_id, self.normalize(query))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_valid(entry, file_set_version, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"]
+
+            if query_embedding is not None and self.similarity_threshold > 0:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate_key, candidate in self._entries.items():
+                    if candidate_key[0] != user_id or candidate["embedding"] is None:
+                        continue
+                    if not self._is_valid(candidate, file_set_version, now):
+                        continue
+                    score = float(np.dot(candidate["embedding"], query_embedding))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    logger.info(
+                        f"Query cache matched '{best_key[1]}' (similarity {best_score:.3f})")
+                    return self._entries[best_key]["response"]
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        user_id: int,
+        file_set_version: str,
+        query: str,
+        response: Dict[str, Any],
+        query_embedding: Optional[np.ndarray] = None
+    ):
+        """
+        Cache a response, evicting the least recently used entries beyond the limit.
+
+        Args:
+            user_id: ID of the querying user
+            file_set_version: Version of the user's file set
+            query: Query text
+            response: Response payload to return on later hits
+            query_embedding: Optional normalized query vector for semantic matching
+        """
+        key = (user_id, self.normalize(query))
+
+        with self._lock:
+            self._entries[key] = {
+                "version": file_set_version,
+                "embedding": query_embedding,
+                "response": response,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop all cached responses of a user (their files changed)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    @staticmethod
+    def _is_valid(entry: Dict[str, Any], file_set_version: str, now: float) -> bool:
+        """Check that an entry is unexpired and built from the same file set."""
+        return entry["version"] == file_set_version and entry["expires_at"] > now
+
+
+# Singleton instance
+_query_cache = None
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """Get or create the QueryCache instance (None when disabled)."""
+    global _query_cache
+    if not settings.query_cache_enabled:
+        return None
+    if _query_cache is None:
+        _query_cache = QueryCache()
+    return _query_cache
@@ -0,0 +1,211 @@
+import bisect
+import itertools
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from tokenizers import Tokenizer
+
+# Chunk boundaries are looked for in this order
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# A chunk as [start, end) offsets into the source text
+Span = Tuple[int, int]
+
+# Token-sized splits encode the text in a batch of segments of about this
+# many characters, cut at whitespace (parallel and faster than one long input)
+TOKENIZE_SEGMENT_CHARS = 4096
+
+
+class TextSplitter:
+    """
+    Recursive separator-based text splitter that works on offsets.
+
+    Produces the same chunks as langchain's RecursiveCharacterTextSplitter
+    (separators kept at the start of the piece they begin, whitespace
+    stripped), but pieces are (start, end) offsets into the source string:
+    nothing is copied while splitting and merging, and only the final
+    chunks are sliced out.
+
+    With a tokenizer, lengths are token counts: the text is encoded once
+    per split and a piece's length is the number of tokens starting inside
+    it, found by bisecting the token offsets.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: Sequence[str] = None,
+        length_function: Optional[Callable[[str], int]] = None,
+        tokenizer: Optional[Tokenizer] = None
+    ):
+        """
+        Args:
+            chunk_size: Maximum chunk length
+            chunk_overlap: Length of the trailing pieces repeated at the start
+                of the next chunk
+            separators: Boundaries to split on, coarsest first ("" splits
+                between characters)
+            length_function: Optional length measure of a text (e.g. a token
+                count); character counts are taken from offsets otherwise
+            tokenizer: Optional tokenizer (without truncation) whose token
+                counts are the lengths; takes precedence over length_function
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators or SEPARATORS)
+        self.length_function = length_function
+        self.tokenizer = tokenizer
+
+    def split_text(self, text: str) -> List[str]:
+        """Split a text into chunks."""
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str, start: int = 0, end: int = None) -> List[Span]:
+        """
+        Split text[start:end] into chunks.
+
+        Returns:
+            Chunk offsets into text, in order
+        """
+        end = len(text) if end is None else end
+        if self.tokenizer is not None:
+            token_starts = self._token_starts(text, start, end)
+
+            def length(span_start: int, span_end: int) -> int:
+                return bisect.bisect_left(token_starts, span_end) - \
+                    bisect.bisect_left(token_starts, span_start)
+        elif self.length_function is None:
+            def length(span_start: int, span_end: int) -> int:
+                return span_end - span_start
+        else:
+            def length(span_start: int, span_end: int) -> int:
+                return self.length_function(text[span_start:span_end])
+
+        chunks: List[Span] = []
+        self._split(text, start, end, self.separators, length, chunks)
+        return chunks
+
+    def _token_starts(self, text: str, start: int, end: int) -> List[int]:
+        """Offsets in text of the tokens of text[start:end], in order."""
+        segments, bounds = [], []
+        position = start
+        while position < end:
+            limit = min(position + TOKENIZE_SEGMENT_CHARS, end)
+            if limit < end:
+                cut = max(text.rfind(" ", position, limit), text.rfind("\n", position, limit))
+                if cut > position:
+                    limit = cut + 1
+            segments.append(text[position:limit])
+            bounds.append(position)
+            position = limit
+
+        token_starts = []
+        for offset, encoding in zip(bounds, self.tokenizer.encode_batch(segments, add_special_tokens=False)):
+            token_starts.extend(offset + token_start for token_start, _ in encoding.offsets)
+        return token_starts
+
+    def _split(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        separators: List[str],
+        length: Callable[[int, int], int],
+        chunks: List[Span]
+    ):
+        """Split a span on the coarsest separator it contains, recursing into pieces that are too long."""
+        separator, finer = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator, finer = candidate, separators[i + 1:]
+                break
+
+        pieces = self._pieces(text, start, end, separator)
+        if self.length_function is None and self.tokenizer is None:
+            lengths = [piece_end - piece_start for piece_start, piece_end in pieces]
+        else:
+            lengths = [length(piece_start, piece_end) for piece_start, piece_end in pieces]
+
+        # Runs of pieces shorter than chunk_size are merged; longer pieces
+        # are split further
+        run_start = 0
+        for index, piece_length in enumerate(lengths):
+            if piece_length < self.chunk_size:
+                continue
+
+            if index > run_start:
+                self._merge(text, pieces[run_start:index], lengths[run_start:index], chunks)
+            piece_start, piece_end = pieces[index]
+            if finer:
+                self._split(text, piece_start, piece_end, finer, length, chunks)
+            else:
+                # Nothing finer to split on: kept as is, like langchain does
+                chunks.append((piece_start, piece_end))
+            run_start = index + 1
+
+        if len(pieces) > run_start:
+            self._merge(text, pieces[run_start:], lengths[run_start:], chunks)
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Span]:
+        """Cut a span before each occurrence of the separator (or between characters)."""
+        if not separator:
+            return list(zip(range(start, end), range(start + 1, end + 1)))
+
+        # Offsets are accumulated from the part lengths str.split reports
+        parts = text[start:end].split(separator)
+        first_end = start + len(parts[0])
+        separator_length = len(separator)
+        boundaries = list(itertools.accumulate(
+            (len(part) + separator_length for part in parts[1:]), initial=first_end))
+        pieces = list(zip(boundaries, boundaries[1:]))
+        if first_end > start:
+            pieces.insert(0, (start, first_end))
+        return pieces
+
+    def _merge(self, text: str, pieces: List[Span], lengths: List[int], chunks: List[Span]):
+        """
+        Greedily combine consecutive short pieces into chunks up to chunk_size.
+
+        When a chunk is emitted, its trailing pieces (up to chunk_overlap)
+        start the next one. Chunk ends and overlap starts are found by
+        bisecting the running length totals instead of piece by piece.
+        """
+        totals = list(itertools.accumulate(lengths, initial=0))
+        count = len(pieces)
+        # The current chunk is pieces[first:following]
+        first, following = 0, 1
+
+        while True:
+            # The first piece that would push the chunk past chunk_size
+            overflow = bisect.bisect_right(
+                totals, totals[first] + self.chunk_size, lo=following + 1) - 1
+            if overflow >= count:
+                break
+
+            self._append(text, pieces[first][0], pieces[overflow - 1][1], chunks)
+
+            # Drop leading pieces until at most chunk_overlap remains and the
+            # overflowing piece fits after it
+            threshold = max(totals[overflow] - self.chunk_overlap,
+                            min(totals[overflow], totals[overflow + 1] - self.chunk_size))
+            first = bisect.bisect_left(totals, threshold, lo=first, hi=overflow)
+            following = overflow + 1
+
+        self._append(text, pieces[first][0], pieces[count - 1][1], chunks)
+
+    @staticmethod
+    def _append(text: str, start: int, end: int, chunks: List[Span]):
+        """Add a span to the chunks with surrounding whitespace trimmed (empty spans are dropped)."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            chunks.append((start, end))
@@ -0,0 +1,434 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.embedding_service import get_embedding_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rewrite a collection's vector file once this share of its rows is deleted
+COMPACTION_RATIO = 0.5
+
+
+class VectorCollection(Protocol):
+    """Collection operations ChromaService relies on (a subset of Chroma's Collection)."""
+
+    name: str
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None): ...
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]: ...
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None) -> Dict[str, Any]: ...
+
+    def update(self, ids, metadatas=None): ...
+
+    def delete(self, ids=None, where=None): ...
+
+    def count(self) -> int: ...
+
+
+class VectorStore(Protocol):
+    """Client operations ChromaService relies on (a subset of Chroma's ClientAPI)."""
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection: ...
+
+    def get_collection(self, name: str) -> VectorCollection: ...
+
+    def delete_collection(self, name: str): ...
+
+    def list_collections(self) -> Sequence[VectorCollection]: ...
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style metadata filter ($and, $or, $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte)."""
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > operand:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+                    if operator == "$lte" and not value <= operand:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
+
+
+class LocalCollection:
+    """A collection of the local store: rows in SQLite, vectors in a memory-mapped file."""
+
+    def __init__(self, store: "LocalVectorStore", name: str):
+        self._store = store
+        self.name = name
+
+    def count(self) -> int:
+        return len(self._store._load(self.name)["ids"])
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        self._store._add(self.name, ids, documents, metadatas, embeddings)
+
+    upsert = add
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas"]
+        state = self._store._load(self.name)
+        positions = self._store._select(state, ids, where)
+        positions = positions[offset or 0:]
+        if limit is not None:
+            positions = positions[:limit]
+        return self._store._build_result(state, positions, include)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None) -> Dict[str, Any]:
+        include = include if include is not None else [
+            "documents", "metadatas", "distances"]
+        if query_embeddings is None:
+            query_embeddings = self._store._embed(query_texts)
+
+        state = self._store._load(self.name)
+        candidates = np.array(self._store._select(
+            state, None, where), dtype=np.int64)
+
+        result: Dict[str, Any] = {"ids": [], "documents": [],
+                                  "metadatas": [], "distances": [], "embeddings": []}
+        for query_embedding in query_embeddings:
+            positions, distances = self._store._top_k(
+                state, candidates, np.asarray(query_embedding, dtype=np.float32), n_results)
+            single = self._store._build_result(state, positions, include)
+            for key in ("ids", "documents", "metadatas", "embeddings"):
+                result[key].append(single.get(key))
+            result["distances"].append(distances.tolist())
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                result[key] = None
+        return result
+
+    def update(self, ids, metadatas=None):
+        self._store._update(self.name, ids, metadatas)
+
+    def delete(self, ids=None, where=None):
+        self._store._delete(self.name, ids, where)
+
+
+class LocalVectorStore:
+    """
+    Embedded vector store for single-node deployments and offline use.
+
+    Implements the part of the Chroma client API ChromaService uses. Each
+    collection keeps its rows (id, document, metadata) in SQLite and its
+    normalized float32 vectors in an append-only file that is memory-mapped
+    and searched in place for cosine top-k by matrix product. Deleted rows
+    are tombstoned and the vector file is compacted once half of it is dead.
+
+    Single process only: writes are serialized by an in-process lock, so
+    several processes (e.g. uvicorn workers) must not share a store path.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.vector_store_path
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            os.path.join(self.path, "store.db"), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                dim INTEGER,
+                version INTEGER NOT NULL DEFAULT 0,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                collection TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                id TEXT NOT NULL,
+                document TEXT,
+                metadata TEXT,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (collection, row)
+            );
+            CREATE INDEX IF NOT EXISTS ix_records_collection_id ON records (collection, id);
+        """)
+        self._connection.commit()
+        # Loaded collection state, keyed by name: (version, state)
+        self._cache: Dict[str, Any] = {}
+        logger.info(f"Opened local vector store at {self.path}")
+
+    # Client API
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None, **kwargs) -> LocalCollection:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO collections (name, metadata) VALUES (?, ?)",
+                (name, json.dumps(metadata or {}))
+            )
+            self._connection.commit()
+        return LocalCollection(self, name)
+
+    def get_collection(self, name: str, **kwargs) -> LocalCollection:
+        if not self._collection_row(name):
+            raise ValueError(f"Collection {name} does not exist.")
+        return LocalCollection(self, name)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            if not self._collection_row(name):
+                raise ValueError(f"Collection {name} does not exist.")
+            self._connection.execute(
+                "DELETE FROM records WHERE collection = ?", (name,))
+            self._connection.execute(
+                "DELETE FROM collections WHERE name = ?", (name,))
+            self._connection.commit()
+            self._cache.pop(name, None)
+            if os.path.exists(self._vector_path(name)):
+                os.remove(self._vector_path(name))
+
+    def list_collections(self) -> List[LocalCollection]:
+        with self._lock:
+            names = [row[0] for row in self._connection.execute(
+                "SELECT name FROM collections ORDER BY name")]
+        return [LocalCollection(self, name) for name in names]
+
+    # Storage
+
+    def _vector_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.f32")
+
+    def _collection_row(self, name: str):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT dim, version FROM collections WHERE name = ?", (name,)).fetchone()
+
+    @staticmethod
+    def _embed(texts: List[str]) -> np.ndarray:
+        """Embed texts for callers that did not pass vectors."""
+        return get_embedding_service().embed(list(texts))
+
+    def _add(self, name: str, ids, documents, metadatas, embeddings):
+        if not ids:
+            return
+        if embeddings is None:
+            embeddings = self._embed(documents)
+
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-12
+        vectors = vectors / norms
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+
+        with self._lock:
+            collection = self._collection_row(name)
+            if collection is None:
+                raise ValueError(f"Collection {name} does not exist.")
+            dim, _ = collection
+            if dim is None:
+                dim = vectors.shape[1]
+                self._connection.execute(
+                    "UPDATE collections SET dim = ? WHERE name = ?", (dim, name))
+            elif dim != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {dim}")
+
+            # Rows are numbered by position in the vector file, so vectors
+            # left by an add that failed before committing are skipped over
+            # rather than shifting later rows; a partial row is cut off
+            path = self._vector_path(name)
+            row_bytes = dim * 4
+            next_row = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+            try:
+                # Existing IDs are replaced (upsert semantics)
+                self._mark_deleted(name, "id IN ({})".format(
+                    ",".join("?" * len(ids))), list(ids))
+                with open(path, "ab") as vector_file:
+                    vector_file.truncate(next_row * row_bytes)
+                    vector_file.write(vectors.tobytes())
+                self._connection.executemany(
+                    "INSERT INTO records (collection, row, id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [(name, next_row + i, record_id, document, json.dumps(metadata or {}))
+                     for i, (record_id, document, metadata) in enumerate(zip(ids, documents, metadatas))]
+                )
+                self._bump_version(name)
+            except Exception:
+                self._connection.rollback()
+                with open(path, "ab") as vector_file:
+                    vector_file.truncate(next_row * row_bytes)
+                raise
+
+    def _update(self, name: str, ids, metadatas):
+        """Replace the metadata of existing records (vectors and documents are kept)."""
+        if not ids or metadatas is None:
+            return
+        with self._lock:
+            if self._collection_row(name) is None:
+                raise ValueError(f"Collection {name} does not exist.")
+            self._connection.executemany(
+                "UPDATE records SET metadata = ? WHERE collection = ? AND id = ? AND deleted = 0",
+                [(json.dumps(metadata or {}), name, record_id)
+                 for record_id, metadata in zip(ids, metadatas)]
+            )
+            self._bump_version(name)
+
+    def _delete(self, name: str, ids, where):
+        with self._lock:
+            state = self._load(name)
+            positions = self._select(state, ids, where)
+            if not positions:
+                return
+            rows = [int(state["rows"][p]) for p in positions]
+            self._mark_deleted(name, "row IN ({})".format(
+                ",".join("?" * len(rows))), rows)
+            self._bump_version(name)
+
+            total, dead = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM records WHERE collection = ?",
+                (name,)
+            ).fetchone()
+            if total and dead / total >= COMPACTION_RATIO:
+                self._compact(name)
+
+    def _mark_deleted(self, name: str, condition: str, params: List[Any]):
+        self._connection.execute(
+            f"UPDATE records SET deleted = 1 WHERE collection = ? AND deleted = 0 AND {condition}",
+            [name, *params]
+        )
+
+    def _bump_version(self, name: str):
+        self._connection.execute(
+            "UPDATE collections SET version = version + 1 WHERE name = ?", (name,))
+        self._connection.commit()
+
+    def _compact(self, name: str):
+        """Rewrite the vector file without deleted rows and renumber the rows."""
+        state = self._load(name)
+        path = self._vector_path(name)
+        temporary_path = f"{path}.tmp"
+
+        with open(temporary_path, "wb") as vector_file:
+            vector_file.write(np.ascontiguousarray(state["matrix"][state["rows"]]).tobytes())
+
+        self._connection.execute(
+            "DELETE FROM records WHERE collection = ? AND deleted = 1", (name,))
+        self._connection.executemany(
+            "UPDATE records SET row = ? WHERE collection = ? AND row = ?",
+            [(-(new_row + 1), name, int(old_row))
+             for new_row, old_row in enumerate(state["rows"])]
+        )
+        self._connection.execute(
+            "UPDATE records SET row = -row - 1 WHERE collection = ? AND row < 0", (name,))
+        self._cache.pop(name, None)
+        os.replace(temporary_path, path)
+        self._bump_version(name)
+        logger.info(f"Compacted local collection {name}")
+
+    def _load(self, name: str) -> Dict[str, Any]:
+        """
+        Get a collection's live rows and vectors, reloading after writes.
+
+        "matrix" maps the whole vector file (dead rows included) without
+        copying it; "rows" gives the file row of each live position.
+        """
+        with self._lock:
+            collection = self._collection_row(name)
+            if collection is None:
+                raise ValueError(f"Collection {name} does not exist.")
+            dim, version = collection
+
+            cached = self._cache.get(name)
+            if cached and cached[0] == version:
+                return cached[1]
+
+            records = self._connection.execute(
+                "SELECT row, id, document, metadata FROM records "
+                "WHERE collection = ? AND deleted = 0 ORDER BY row",
+                (name,)
+            ).fetchall()
+
+            rows = np.array([r[0] for r in records], dtype=np.int64)
+            if records and dim:
+                # Whole rows only, in case an interrupted add left a partial one
+                file_rows = os.path.getsize(self._vector_path(name)) // (dim * 4)
+                matrix = np.memmap(self._vector_path(name), dtype=np.float32,
+                                   mode="r", shape=(file_rows, dim))
+            else:
+                matrix = np.zeros((0, dim or 0), dtype=np.float32)
+
+            state = {
+                "rows": rows,
+                "ids": [r[1] for r in records],
+                "documents": [r[2] for r in records],
+                "metadatas": [json.loads(r[3]) if r[3] else {} for r in records],
+                "matrix": matrix
+            }
+            self._cache[name] = (version, state)
+            return state
+
+    @staticmethod
+    def _select(state: Dict[str, Any], ids, where) -> List[int]:
+        """Positions of live rows matching the IDs and metadata filter."""
+        wanted = set(ids) if ids is not None else None
+        return [
+            position for position, (record_id, metadata) in enumerate(zip(state["ids"], state["metadatas"]))
+            if (wanted is None or record_id in wanted) and matches_where(metadata, where)
+        ]
+
+    @staticmethod
+    def _top_k(state: Dict[str, Any], candidates: np.ndarray, query: np.ndarray, k: int):
+        """Cosine top-k among candidate positions; returns (positions, distances)."""
+        if not len(candidates) or k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        query = query / (np.linalg.norm(query) or 1e-12)
+        if len(candidates) < len(state["ids"]):
+            similarities = state["matrix"][state["rows"][candidates]] @ query
+        else:
+            # Scan the mapped file in place and pick out the live rows
+            similarities = (state["matrix"] @ query)[state["rows"]]
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return candidates[top].tolist(), 1.0 - similarities[top]
+
+    @staticmethod
+    def _build_result(state: Dict[str, Any], positions: List[int], include: List[str]) -> Dict[str, Any]:
+        return {
+            "ids": [state["ids"][p] for p in positions],
+            "documents": [state["documents"][p] for p in positions] if "documents" in include else None,
+            "metadatas": [state["metadatas"][p] for p in positions] if "metadatas" in include else None,
+            "embeddings": state["matrix"][state["rows"][positions]] if "embeddings" in include else None
+        }
@@ -0,0 +1,315 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.chroma_service import get_chroma_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Chunks fetched per get() round trip while loading a file's vectors
+LOAD_BATCH_SIZE = 500
+
+
+class UserIndex:
+    """One user's chunk vectors as a contiguous normalized matrix plus row data."""
+
+    def __init__(self):
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.file_ids = np.zeros(0, dtype=np.int64)
+        self.rows: List[Tuple[str, str, Dict[str, Any], str]] = []
+        # Includes files without chunks, so they are not fetched again
+        self.loaded_file_ids = set()
+        self.nbytes = 0
+
+    def add(self, file_id: int, vectors: np.ndarray, rows: List[Tuple[str, str, Dict[str, Any], str]]):
+        """Append a file's rows (rebuilds the matrix so it stays contiguous)."""
+        self.loaded_file_ids.add(file_id)
+        if not rows:
+            return
+        if self.matrix.size and vectors.shape[1] != self.matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.matrix.shape[1]}")
+
+        self.matrix = np.ascontiguousarray(np.vstack([self.matrix, vectors])) \
+            if self.matrix.size else np.ascontiguousarray(vectors)
+        self.file_ids = np.concatenate(
+            [self.file_ids, np.full(len(rows), file_id, dtype=np.int64)])
+        self.rows = self.rows + rows
+        self._measure()
+
+    def remove(self, file_id: int):
+        """Drop a file's rows."""
+        self.loaded_file_ids.discard(file_id)
+        keep = self.file_ids != file_id
+        if keep.all():
+            return
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.file_ids = self.file_ids[keep]
+        self.rows = [row for row, kept in zip(self.rows, keep) if kept]
+        self._measure()
+
+    def _measure(self):
+        # Vectors plus a rough allowance for the documents and metadata
+        self.nbytes = self.matrix.nbytes + self.file_ids.nbytes + \
+            sum(len(row[1]) for row in self.rows) + 200 * len(self.rows)
+
+
+class WarmIndex:
+    """
+    In-process cache of active users' chunk vectors for exact top-k search.
+
+    A user's vectors are fetched from the vector store on their first query
+    (files concurrently, on the Chroma query pool) and searched by matrix
+    product afterwards, so repeat queries skip collection.query.
+    FileService keeps resident users in sync on upload and delete; users
+    are evicted least recently used beyond the memory budget. Users whose
+    vectors exceed the budget or fail to load are skipped for
+    warm_index_retry_seconds rather than refetched on every query.
+    """
+
+    def __init__(self, max_bytes: int = None, retry_seconds: float = None):
+        self.max_bytes = max_bytes or settings.warm_index_max_mb * 1024 * 1024
+        self.retry_seconds = settings.warm_index_retry_seconds \
+            if retry_seconds is None else retry_seconds
+        self._indexes: "OrderedDict[int, UserIndex]" = OrderedDict()
+        # Users not to load until the given time.monotonic()
+        self._skipped: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[int, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.evictions = 0
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def search(
+        self,
+        user_id: int,
+        file_refs: List[Tuple[str, int]],
+        query_embedding: np.ndarray,
+        top_k: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Find a user's nearest chunks by cosine similarity.
+
+        Loads the user (or files they gained since loading) on demand; rows
+        of files not in file_refs are ignored, so deleted files never match.
+
+        Args:
+            user_id: Owner of the files
+            file_refs: List of (chroma_collection_id, file_id) tuples to search
+            query_embedding: Normalized query vector
+            top_k: Number of results
+
+        Returns:
+            Results shaped like ChromaService results (with 'embedding'),
+            sorted by distance, or None if the user's vectors could not be
+            cached or are skipped (callers then query the vector store)
+        """
+        with self._user_lock(user_id):
+            with self._lock:
+                index = self._indexes.get(user_id)
+                loaded = set(index.loaded_file_ids) if index else set()
+                skipped_until = self._skipped.get(user_id)
+
+            missing = [(collection, file_id)
+                       for collection, file_id in file_refs if file_id not in loaded]
+            if index is None or missing:
+                if skipped_until is not None:
+                    if time.monotonic() < skipped_until:
+                        self.skips += 1
+                        return None
+                    with self._lock:
+                        self._skipped.pop(user_id, None)
+                self.misses += 1
+                index = self._load(user_id, index, missing)
+                if index is None:
+                    return None
+            else:
+                self.hits += 1
+
+            with self._lock:
+                if user_id in self._indexes:
+                    self._indexes.move_to_end(user_id)
+                matrix, file_ids, rows = index.matrix, index.file_ids, index.rows
+
+        wanted = np.isin(file_ids, [file_id for _, file_id in file_refs])
+        if not wanted.any():
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        similarities = matrix @ (query / (np.linalg.norm(query) or 1e-12))
+        similarities[~wanted] = -np.inf
+
+        k = min(top_k, int(wanted.sum()))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+
+        results = []
+        for position in top:
+            chunk_id, document, metadata, collection = rows[position]
+            results.append({
+                'document': document,
+                'metadata': metadata,
+                'distance': float(1.0 - similarities[position]),
+                'id': chunk_id,
+                'collection': collection,
+                'embedding': matrix[position]
+            })
+        return results
+
+    def _load(
+        self,
+        user_id: int,
+        index: Optional[UserIndex],
+        file_refs: List[Tuple[str, int]]
+    ) -> Optional[UserIndex]:
+        """
+        Fetch files' vectors into a user's index and apply the memory budget.
+
+        Files are fetched concurrently. Fetching stops as soon as the index
+        is over budget; on that or any fetch error the user is skipped for
+        retry_seconds. Files already added to a resident index stay valid,
+        so a later retry fetches only the rest.
+        """
+        index = index or UserIndex()
+        query_executor = get_chroma_service().query_executor
+        futures = {
+            query_executor.submit(self._fetch_file, collection, file_id): file_id
+            for collection, file_id in file_refs
+        }
+
+        try:
+            for future in as_completed(futures):
+                vectors, rows = future.result()
+                index.add(futures[future], vectors, rows)
+                if index.nbytes > self.max_bytes:
+                    logger.info(
+                        f"Vectors of user {user_id} exceed the warm index budget, "
+                        f"not caching for {self.retry_seconds:.0f}s")
+                    self.drop_user(user_id)
+                    self._skip_user(user_id)
+                    return None
+        except Exception as e:
+            logger.warning(
+                f"Failed to load warm index for user {user_id}, "
+                f"retrying in {self.retry_seconds:.0f}s: {str(e)}")
+            self._skip_user(user_id)
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            self._evict()
+
+        logger.info(
+            f"Loaded {len(file_refs)} files into warm index for user {user_id} ({len(index.rows)} chunks)")
+        return index
+
+    @staticmethod
+    def _fetch_file(collection: str, file_id: int) -> Tuple[np.ndarray, List[Tuple[str, str, Dict[str, Any], str]]]:
+        """Read a file's chunks and stored vectors from the vector store."""
+        chroma_service = get_chroma_service()
+        where = {"file_id": file_id} if chroma_service.is_shared_collection(collection) else None
+        vectors, rows = [], []
+
+        while True:
+            page = chroma_service.get_documents(
+                collection,
+                where=where,
+                limit=LOAD_BATCH_SIZE,
+                offset=len(rows),
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            rows.extend(zip(ids, page["documents"], [m or {} for m in page["metadatas"]],
+                            [collection] * len(ids)))
+
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32), rows
+
+        matrix = np.vstack(vectors)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-12
+        return matrix / norms, rows
+
+    def _evict(self):
+        """Drop least recently used users until within the memory budget (lock held)."""
+        total = sum(index.nbytes for index in self._indexes.values())
+        while total > self.max_bytes and len(self._indexes) > 1:
+            user_id, index = self._indexes.popitem(last=False)
+            total -= index.nbytes
+            self.evictions += 1
+            logger.info(f"Evicted user {user_id} from warm index")
+
+    def add_file(self, user_id: int, collection: str, file_id: int):
+        """Load a newly processed file if its owner is resident."""
+        with self._user_lock(user_id):
+            with self._lock:
+                index = self._indexes.get(user_id)
+            if index is None or file_id in index.loaded_file_ids:
+                return
+            self._load(user_id, index, [(collection, file_id)])
+
+    def remove_file(self, user_id: int, file_id: int):
+        """Drop a file's vectors from its owner's index."""
+        with self._user_lock(user_id):
+            with self._lock:
+                index = self._indexes.get(user_id)
+                if index is not None:
+                    index.remove(file_id)
+
+    def drop_user(self, user_id: int):
+        """Forget a user's index."""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def _skip_user(self, user_id: int):
+        """Send a user's queries to the vector store for retry_seconds."""
+        with self._lock:
+            self._skipped[user_id] = time.monotonic() + self.retry_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Get residency and hit/miss counters."""
+        with self._lock:
+            return {
+                "users": len(self._indexes),
+                "chunks": sum(len(index.rows) for index in self._indexes.values()),
+                "bytes": sum(index.nbytes for index in self._indexes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skips": self.skips,
+                "skipped_users": len(self._skipped),
+                "evictions": self.evictions
+            }
+
+
+# Singleton instance
+_warm_index = None
+
+
+def get_warm_index() -> Optional[WarmIndex]:
+    """Get or create the WarmIndex instance (None when disabled)."""
+    global _warm_index
+    if not settings.warm_index_enabled:
+        return None
+    if _warm_index is None:
+        _warm_index = WarmIndex()
+    return _warm_index
@@ -0,0 +1,11 @@
+import os
+
+# Settings without defaults; the tests never reach these services
+for name in (
+    "GROQ_API_KEY",
+    "BACKBLAZE_APPLICATION_KEY",
+    "BACKBLAZE_KEY_ID",
+    "BACKBLAZE_KEY_NAME",
+    "BACKBLAZE_BUCKET_NAME",
+):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,58 @@
+import csv
+
+import pytest
+
+from app.services import document_processor
+from app.services.document_processor import DocumentProcessor
+from app.services.text_splitter import TextSplitter
+
+
+@pytest.fixture
+def processor(monkeypatch) -> DocumentProcessor:
+    monkeypatch.setattr(document_processor.settings, "chunk_unit", "characters")
+    monkeypatch.setattr(document_processor.settings, "tabular_rows_per_chunk", 20)
+    monkeypatch.setattr(document_processor.settings, "tabular_chunk_max_chars", 100)
+    processor = DocumentProcessor()
+    processor.text_splitter = TextSplitter(chunk_size=60, chunk_overlap=0)
+    return processor
+
+
+def test_oversized_row_is_split_under_the_header(processor):
+    note = " ".join(f"word{i}" for i in range(40))
+    data = f"id,note\n1,short\n2,{note}\n3,after\n".encode()
+
+    chunks = list(processor._iter_table_chunks(data, "csv"))
+
+    assert chunks[0][0] == "Headers: id | note\nRow 1: 1 | short"
+    long_parts = chunks[1:-1]
+    assert len(long_parts) > 1
+    for text, metadata in long_parts:
+        header, line = text.split("\n")
+        assert header == "Headers: id | note"
+        assert line.startswith("Row 2: ")
+        assert len(line) <= 100
+        assert (metadata["row_start"], metadata["row_end"]) == (2, 2)
+    assert " ".join(text.split("Row 2: ")[1] for text, _ in long_parts) == f"2 | {note}"
+    assert chunks[-1][0] == "Headers: id | note\nRow 3: 3 | after"
+    assert [metadata["chunk_index"] for _, metadata in chunks] == list(range(len(chunks)))
+
+
+def test_fields_past_the_csv_default_limit_are_read(processor):
+    note = "x" * 200_000
+    data = f"id,note\n1,\"{note}\"\n".encode()
+
+    chunks = list(processor._iter_table_chunks(data, "csv"))
+
+    assert sum(text.count("x") for text, _ in chunks) == len(note)
+
+
+def test_field_past_the_limit_raises_value_error(processor, monkeypatch):
+    monkeypatch.setattr(document_processor.settings, "max_file_size_mb", 0)
+    limit = csv.field_size_limit(1000)
+    data = f"id,note\n1,{'x' * 2000}\n".encode()
+
+    try:
+        with pytest.raises(ValueError):
+            list(processor._iter_table_chunks(data, "csv"))
+    finally:
+        csv.field_size_limit(limit)
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import groq_service, intent_service
+from app.services.intent_service import IntentService
+
+RETRIEVAL = {"intent": "file_retrieval", "target_file": "report.pdf"}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """LLM tier answering from a queue of responses (None is a failed request)."""
+    responses = []
+    monkeypatch.setattr(intent_service.settings, "intent_local_classifier_enabled", False)
+    monkeypatch.setattr(
+        intent_service, "get_groq_service",
+        lambda: SimpleNamespace(detect_query_intent=lambda query, files: responses.pop(0)))
+    return responses
+
+
+def test_llm_failure_is_not_cached(llm):
+    service = IntentService()
+    llm.extend([None, RETRIEVAL])
+
+    assert service.detect_query_intent("the quarterly thing", ["report.pdf"]) == \
+        {"intent": "information_query", "target_file": None}
+    assert service.detect_query_intent("the quarterly thing", ["report.pdf"]) == RETRIEVAL
+    assert service.tier_counts["llm_failed"] == 1
+    assert service.tier_counts["llm"] == 1
+
+
+def test_llm_classification_is_cached(llm):
+    service = IntentService()
+    llm.append(RETRIEVAL)
+
+    service.detect_query_intent("the quarterly thing", ["report.pdf"])
+
+    assert service.detect_query_intent("The quarterly thing?", ["report.pdf"]) == RETRIEVAL
+    assert service.tier_counts["cache"] == 1
+
+
+@pytest.mark.parametrize("reply", ["not json", '{"intent": "smalltalk"}', RuntimeError("groq down")])
+def test_groq_signals_failed_classification(monkeypatch, reply):
+    def create(**kwargs):
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(groq_service, "Groq", lambda api_key: client)
+
+    assert groq_service.GroqService().detect_query_intent("send me the report", ["report.pdf"]) is None
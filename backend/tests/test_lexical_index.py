@@ -0,0 +1,53 @@
+import pytest
+
+from app.services.lexical_index import LexicalIndex
+
+
+@pytest.fixture
+def index(tmp_path) -> LexicalIndex:
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    index.add_chunks(1, 10, "user_1", ["invoice total due", "invoice paid"],
+                     [{"chunk_index": 0}, {"chunk_index": 1}], ["a", "b"])
+    index.add_chunks(1, 20, "user_1", ["shipping invoice", "warehouse stock"],
+                     [{"chunk_index": 0}, {"chunk_index": 1}], ["c", "d"])
+    yield index
+    index.close()
+
+
+def test_search_ranks_matching_chunks(index):
+    results = index.search(1, "invoice total")
+
+    assert [result["id"] for result in results][0] == "a"
+    assert {result["id"] for result in results} == {"a", "b", "c"}
+    assert index.search(2, "invoice") == []
+
+
+def test_file_restriction_scores_over_searched_files(index):
+    restricted = index.search(1, "warehouse", file_ids=[20])
+    unrestricted = index.search(1, "warehouse")
+
+    assert [result["id"] for result in restricted] == ["d"]
+    # Two chunks searched instead of four, so the term is less rare
+    assert restricted[0]["score"] < unrestricted[0]["score"]
+    assert index.search(1, "invoice", file_ids=[]) == []
+
+
+def test_staged_chunks_replace_live_ones_on_commit(index):
+    index.add_chunks(1, 10, "user_1", ["refund issued"], [{"chunk_index": 0}], ["e"], staged=True)
+
+    assert index.search(1, "refund") == []
+    assert {result["id"] for result in index.search(1, "invoice", file_ids=[10])} == {"a", "b"}
+
+    index.commit_staged(10)
+
+    assert [result["id"] for result in index.search(1, "refund")] == ["e"]
+    assert index.search(1, "invoice", file_ids=[10]) == []
+
+
+def test_discarded_staged_chunks_leave_live_ones(index):
+    index.add_chunks(1, 10, "user_1", ["refund issued"], [{"chunk_index": 0}], ["e"], staged=True)
+
+    index.discard_staged(10)
+
+    assert index.search(1, "refund") == []
+    assert {result["id"] for result in index.search(1, "invoice", file_ids=[10])} == {"a", "b"}
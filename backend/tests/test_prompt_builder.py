@@ -0,0 +1,38 @@
+import pytest
+
+from app.services import prompt_builder
+from app.services.prompt_builder import PromptBuilder
+
+TEMPLATE = "Question: {query}\n\nContext:\n{context}"
+
+
+@pytest.fixture
+def builder(monkeypatch) -> PromptBuilder:
+    """Builder estimating four characters per token."""
+    monkeypatch.setattr(PromptBuilder, "_load_tokenizer", lambda self: None)
+    monkeypatch.setattr(prompt_builder.settings, "prompt_max_tokens", 1000)
+    return PromptBuilder()
+
+
+def test_query_placeholders_are_not_substituted(builder):
+    query = "what does {context} mean in {query}?"
+
+    messages = builder.build_messages(
+        "system", TEMPLATE, [], ["passage one"], values={"query": query})
+
+    assert messages[-1] == {
+        "role": "user",
+        "content": "Question: what does {context} mean in {query}?\n\nContext:\npassage one",
+    }
+
+
+def test_query_counts_against_the_context_budget(builder, monkeypatch):
+    monkeypatch.setattr(prompt_builder.settings, "prompt_max_tokens", 60)
+    monkeypatch.setattr(prompt_builder.settings, "prompt_context_max_tokens", 60)
+    passages = ["a" * 60, "b" * 60]
+
+    short = builder.build_messages("system", TEMPLATE, [], passages, values={"query": "why"})
+    long = builder.build_messages("system", TEMPLATE, [], passages, values={"query": "w" * 80})
+
+    assert "b" * 60 in short[-1]["content"]
+    assert "b" * 60 not in long[-1]["content"]
@@ -0,0 +1,82 @@
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from app.services.text_splitter import TextSplitter
+
+
+@pytest.fixture
+def word_tokenizer() -> Tokenizer:
+    """One token per word or run of punctuation ("world!" is two tokens)."""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    return tokenizer
+
+
+def test_character_chunks_prefer_coarse_separators():
+    text = "The quick brown fox.\n\nIt jumped over the lazy dog\nand ran away."
+    splitter = TextSplitter(chunk_size=24, chunk_overlap=0)
+
+    assert splitter.split_text(text) == [
+        "The quick brown fox.",
+        "It jumped over the lazy",
+        "dog",
+        "and ran away.",
+    ]
+
+
+def test_overlap_repeats_trailing_pieces():
+    text = "one two three four five six seven eight nine ten"
+    splitter = TextSplitter(chunk_size=15, chunk_overlap=6)
+
+    assert splitter.split_text(text) == [
+        "one two three",
+        "three four",
+        "four five six",
+        "six seven",
+        "seven eight",
+        "eight nine ten",
+    ]
+
+
+def test_text_without_separators_is_split_between_characters():
+    splitter = TextSplitter(chunk_size=10, chunk_overlap=3)
+
+    assert splitter.split_text("abcdefghijklmnopqrstuvwxyz") == [
+        "abcdefghij",
+        "hijklmnopq",
+        "opqrstuvwx",
+        "vwxyz",
+    ]
+
+
+def test_token_chunks_are_sized_in_tokens(word_tokenizer):
+    text = "Hello, world! This is a test.\n\nTokens, not characters, set the size."
+    splitter = TextSplitter(chunk_size=5, chunk_overlap=2, tokenizer=word_tokenizer)
+
+    chunks = splitter.split_text(text)
+
+    assert chunks == [
+        "Hello, world! This",
+        "This is a test.",
+        "Tokens, not characters,",
+        "characters, set the",
+        "set the size.",
+    ]
+    assert all(len(word_tokenizer.encode(chunk).ids) <= 5 for chunk in chunks)
+
+
+def test_spans_are_offsets_into_the_source_text():
+    text = "skip this|one two three four"
+    splitter = TextSplitter(chunk_size=11, chunk_overlap=0)
+
+    spans = splitter.split_spans(text, start=text.index("|") + 1)
+
+    assert spans == [(10, 17), (18, 28)]
+    assert [text[start:end] for start, end in spans] == ["one two", "three four"]
+
+
+def test_overlap_larger_than_chunk_size_is_rejected():
+    with pytest.raises(ValueError):
+        TextSplitter(chunk_size=5, chunk_overlap=6)
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import vector_store
+from app.services.vector_store import LocalVectorStore
+
+
+def vector(*values: float) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32)
+
+
+@pytest.fixture
+def store(tmp_path) -> LocalVectorStore:
+    return LocalVectorStore(str(tmp_path))
+
+
+@pytest.fixture
+def collection(store):
+    collection = store.get_or_create_collection("user_1")
+    collection.add(
+        ids=["a", "b", "c"],
+        documents=["alpha", "beta", "gamma"],
+        metadatas=[{"file_id": 1, "chunk_index": 0},
+                   {"file_id": 1, "chunk_index": 1},
+                   {"file_id": 2, "chunk_index": 0}],
+        embeddings=[vector(1, 0, 0), vector(0, 1, 0), vector(0, 0, 1)]
+    )
+    return collection
+
+
+def test_add_with_existing_id_overwrites(collection):
+    collection.upsert(
+        ids=["b"],
+        documents=["beta v2"],
+        metadatas=[{"file_id": 1, "chunk_index": 1, "version": 2}],
+        embeddings=[vector(0, 0, 1)]
+    )
+
+    assert collection.count() == 3
+    result = collection.get(ids=["b"], include=["documents", "metadatas", "embeddings"])
+    assert result["documents"] == ["beta v2"]
+    assert result["metadatas"][0]["version"] == 2
+    np.testing.assert_allclose(result["embeddings"][0], [0, 0, 1])
+
+    nearest = collection.query(query_embeddings=[vector(0, 0, 1)], n_results=2)
+    assert sorted(nearest["ids"][0]) == ["b", "c"]
+    assert nearest["distances"][0] == pytest.approx([0.0, 0.0], abs=1e-6)
+
+
+def test_where_filters_get_and_query(collection):
+    assert collection.get(where={"file_id": 1})["ids"] == ["a", "b"]
+    assert collection.get(where={"$and": [{"file_id": 1}, {"chunk_index": {"$gt": 0}}]})["ids"] == ["b"]
+    assert collection.get(where={"file_id": {"$in": [2, 3]}})["ids"] == ["c"]
+
+    nearest = collection.query(
+        query_embeddings=[vector(0, 0, 1)], n_results=5, where={"file_id": 1})
+    assert sorted(nearest["ids"][0]) == ["a", "b"]
+
+
+def test_delete_by_where(collection):
+    collection.delete(where={"file_id": 1})
+
+    assert collection.count() == 1
+    assert collection.get()["ids"] == ["c"]
+    assert collection.query(query_embeddings=[vector(1, 0, 0)], n_results=3)["ids"] == [["c"]]
+
+
+def test_compaction_drops_deleted_vectors(store, collection):
+    vector_path = os.path.join(store.path, "user_1.f32")
+    row_bytes = 3 * 4
+
+    collection.delete(ids=["a"])
+    assert os.path.getsize(vector_path) == 3 * row_bytes
+
+    # Two of three rows dead crosses COMPACTION_RATIO
+    assert vector_store.COMPACTION_RATIO <= 2 / 3
+    collection.delete(ids=["b"])
+    assert os.path.getsize(vector_path) == 1 * row_bytes
+
+    collection.add(ids=["d"], documents=["delta"], metadatas=[{"file_id": 3}],
+                   embeddings=[vector(1, 1, 0)])
+    result = collection.query(query_embeddings=[vector(0, 0, 1)], n_results=2)
+    assert result["ids"] == [["c", "d"]]
+    assert result["documents"] == [["gamma", "delta"]]
+
+    reopened = LocalVectorStore(store.path).get_collection("user_1")
+    assert reopened.query(query_embeddings=[vector(0, 0, 1)], n_results=2)["ids"] == [["c", "d"]]
+
+
+def test_reopen_keeps_rows_and_vectors(tmp_path, collection):
+    collection.delete(ids=["a"])
+    collection.update(ids=["c"], metadatas=[{"file_id": 2, "chunk_index": 5}])
+
+    reopened = LocalVectorStore(str(tmp_path))
+
+    assert [c.name for c in reopened.list_collections()] == ["user_1"]
+    collection = reopened.get_collection("user_1")
+    assert collection.get()["ids"] == ["b", "c"]
+    assert collection.get(ids=["c"])["metadatas"] == [{"file_id": 2, "chunk_index": 5}]
+    assert collection.query(query_embeddings=[vector(0, 1, 0)], n_results=1)["ids"] == [["b"]]
+
+
+def test_failed_add_leaves_vectors_aligned(store, collection):
+    vector_path = os.path.join(store.path, "user_1.f32")
+    size = os.path.getsize(vector_path)
+
+    with pytest.raises(TypeError):
+        # Metadata that cannot be serialized fails after the vectors are written
+        collection.add(ids=["x"], documents=["bad"], metadatas=[{"value": object()}],
+                       embeddings=[vector(1, 1, 1)])
+    assert os.path.getsize(vector_path) == size
+    assert collection.count() == 3
+
+    # A partial row, as left by a process killed mid-write, is skipped over
+    with open(vector_path, "ab") as vector_file:
+        vector_file.write(b"\x00" * 5)
+    collection.add(ids=["d"], documents=["delta"], metadatas=[{"file_id": 3}],
+                   embeddings=[vector(1, 1, 0)])
+
+    result = collection.get(ids=["c", "d"], include=["embeddings"])
+    np.testing.assert_allclose(result["embeddings"][0], [0, 0, 1])
+    np.testing.assert_allclose(result["embeddings"][1], [2 ** -0.5, 2 ** -0.5, 0], rtol=1e-6)
+    assert collection.query(query_embeddings=[vector(0, 0, 1)], n_results=1)["ids"] == [["c"]]
+
+
+def test_missing_collection_raises(store):
+    with pytest.raises(ValueError):
+        store.get_collection("missing")
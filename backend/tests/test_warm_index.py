@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import warm_index
+from app.services.warm_index import WarmIndex
+
+DIM = 4
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Serve each file as `rows` chunks from a fake vector store, recording fetches."""
+    calls = []
+    executor = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(
+        warm_index, "get_chroma_service",
+        lambda: SimpleNamespace(query_executor=executor))
+
+    def fetch_file(collection, file_id):
+        calls.append(file_id)
+        if file_id < 0:
+            raise ConnectionError("vector store unavailable")
+        vectors = np.eye(DIM, dtype=np.float32)[[file_id % DIM]].repeat(10, axis=0)
+        rows = [(f"{file_id}-{i}", "text", {"file_id": file_id, "chunk_index": i}, collection)
+                for i in range(10)]
+        return vectors, rows
+
+    monkeypatch.setattr(WarmIndex, "_fetch_file", staticmethod(fetch_file))
+    yield calls
+    executor.shutdown()
+
+
+def search(index, file_ids):
+    return index.search(1, [("user_1", file_id) for file_id in file_ids],
+                        np.eye(DIM, dtype=np.float32)[1], top_k=3)
+
+
+def test_loads_files_and_serves_hits(fetches):
+    index = WarmIndex(max_bytes=1024 * 1024, retry_seconds=60)
+
+    results = search(index, [1, 2])
+    assert [result["metadata"]["file_id"] for result in results] == [1, 1, 1]
+    assert sorted(fetches) == [1, 2]
+
+    search(index, [1, 2])
+    assert sorted(fetches) == [1, 2]
+    assert index.stats()["hits"] == 1
+
+
+def test_over_budget_user_is_skipped_until_retry(fetches, monkeypatch):
+    index = WarmIndex(max_bytes=100, retry_seconds=60)
+
+    assert search(index, [1, 2, 3]) is None
+    fetched = len(fetches)
+    assert index.stats()["users"] == 0
+
+    # Later queries go straight to the vector store without refetching
+    assert search(index, [1, 2, 3]) is None
+    assert len(fetches) == fetched
+    assert index.stats()["skips"] == 1
+
+    now = warm_index.time.monotonic()
+    monkeypatch.setattr(warm_index.time, "monotonic", lambda: now + 61)
+    assert search(index, [1, 2, 3]) is None
+    assert len(fetches) > fetched
+
+
+def test_failed_load_is_retried_after_the_skip(fetches, monkeypatch):
+    index = WarmIndex(max_bytes=1024 * 1024, retry_seconds=60)
+
+    assert search(index, [1, -1]) is None
+    assert search(index, [1, -1]) is None
+    assert index.stats()["skips"] == 1
+
+    now = warm_index.time.monotonic()
+    monkeypatch.setattr(warm_index.time, "monotonic", lambda: now + 61)
+    assert search(index, [1, 2]) is not None
+    assert index.stats()["users"] == 1
@@ -319,6 +319,7 @@ function FilesDashboard({ onMenuClick }) {
                 </FileInfo>
                 <FileActions>
                   <SmallButton
+                    disabled={!file.backblaze_url}
                     onClick={() => window.open(file.backblaze_url, "_blank")}
                   >
                     Download